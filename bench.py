@@ -0,0 +1,201 @@
+# coding:utf-8
+# bench.py: measure the per-tick cost of the hardware-stats stages, to compare implementations
+import argparse
+import importlib
+import io
+import time
+
+import sensors
+
+
+def measure(func, iterations: int) -> float:
+    # Mean wall time of one call, in microseconds
+    func()  # warm up: first readings open files, prime counters...
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1000000
+
+
+def bench_backends(iterations: int):
+    # GPU is left out: the procfs backend reads it like the psutil backend
+    print("%-16s %-10s %12s" % ("backend", "stats", "us/tick"))
+    for module_name in ["sensors_python", "sensors_procfs"]:
+        try:
+            backend = importlib.import_module(module_name)
+        except Exception as e:
+            print("%-16s skipped: %s" % (module_name, e))
+            continue
+        subsystems = {
+            "Cpu": backend.Cpu.collect,
+            "Memory": backend.Memory.collect,
+            "Disk": backend.Disk.collect,
+            "Net": backend.Net.collect,
+            "CpuCores": backend.CpuCores.collect,
+            "DiskIO": backend.DiskIO.collect,
+            "Interfaces": backend.Interfaces.collect,
+            "Processes": backend.Processes.collect,
+        }
+        total = 0
+        for name, collect in subsystems.items():
+            cost = measure(collect, iterations)
+            total += cost
+            print("%-16s %-10s %12.1f" % (module_name, name, cost))
+        print("%-16s %-10s %12.1f" % (module_name, "total", total))
+
+
+def sample_snapshot() -> dict:
+    # Same shape as the data written by main.run()
+    data = {
+        "Cpu": sensors.CpuStats(12.5, 3.4, 48.0, 1200).as_dict(),
+        "Gpu": sensors.GpuStats(True, 1500, 35.0, 20.5, 8192.0, 1680.0, 55.0).as_dict(),
+        "Memory": sensors.MemoryStats(42.1, 6790000000, 9340000000, 1.2, 51000000, 4240000000).as_dict(),
+        "Disk": sensors.DiskStats(63.2, 301000000000, 175000000000).as_dict(),
+        "Net": sensors.NetStats(10240.5, 123456789, 204800.25, 987654321).as_dict(),
+        "Tick": {"sequence": 1234, "time": 1700000000.5, "monotonic": 5678.25, "missed_ticks": 0},
+    }
+    data["Collectors"] = {
+        name: {"period": 0.5, "age": 0.001, "stale": False, "timeouts": 0, "failures": 0}
+        for name in ["Cpu", "Gpu", "Memory", "Disk", "Net"]
+    }
+    return data
+
+
+def bench_serializers(iterations: int):
+    import ruamel.yaml
+    from serializers import SERIALIZERS, get_serializer
+
+    data = sample_snapshot()
+
+    def yaml_new_emitter():
+        # Serialization before the serializers: a new YAML object per tick
+        ruamel.yaml.YAML().dump(data, io.StringIO())
+
+    print("%-24s %12s %8s" % ("format", "us/tick", "bytes"))
+    print("%-24s %12.1f" % ("yaml (new emitter/tick)", measure(yaml_new_emitter, iterations)))
+    for name in SERIALIZERS:
+        serializer = get_serializer(name)
+        cost = measure(lambda: serializer.dumps(data), iterations)
+        print("%-24s %12.1f %8d" % (name, cost, len(serializer.dumps(data))))
+
+
+def bench_readers(iterations: int):
+    # Cost of one poll for a consumer: parse the state file, or copy the shared memory snapshot
+    import os
+    import tempfile
+
+    import ruamel.yaml
+    from serializers import get_serializer
+    from sinks import SharedMemorySink
+    from shm import ShmReader
+
+    data = sample_snapshot()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        yaml_path = os.path.join(temp_dir, "hardware-stats.yaml")
+        with open(yaml_path, "w", encoding="utf-8") as f:
+            f.write(get_serializer("yaml").dumps(data))
+        yaml = ruamel.yaml.YAML(typ="safe")
+
+        def read_yaml():
+            with open(yaml_path, encoding="utf-8") as f:
+                yaml.load(f)
+
+        sink = SharedMemorySink(os.path.join(temp_dir, "hardware-stats.shm"))
+        sink.publish(data)
+        reader = ShmReader(sink.writer.path)
+        print("%-24s %12s" % ("reader", "us/poll"))
+        print("%-24s %12.1f" % ("yaml file", measure(read_yaml, iterations)))
+        print("%-24s %12.1f" % ("shared memory", measure(reader.read, iterations)))
+        reader.close()
+        sink.close()
+
+
+def bench_lhm(iterations: int):
+    # Reading of the CPU metrics of a 16 cores LHM CPU: scan of the sensor names at every reading, as before the
+    # sensor index, against the indexed sensors. Plain objects stand for the .NET ones, str() of their names is
+    # cheaper than through pythonnet: the actual gain on Windows is larger
+    from types import SimpleNamespace
+
+    from lhm_index import Metric, Rule, SensorIndex
+
+    def sensor(sensor_type, name, value):
+        return SimpleNamespace(SensorType=sensor_type, Name=name, Value=value)
+
+    sensor_list = [sensor("Load", "CPU Total", 12.5)]
+    for core in range(1, 17):
+        sensor_list += [
+            sensor("Load", "CPU Core #%d" % core, 10.0),
+            sensor("Clock", "Core #%d" % core, 3400.0),
+            sensor("Clock", "Core #%d (Effective)" % core, 1200.0),
+            sensor("Temperature", "CPU Core #%d" % core, 45.0),
+            sensor("Voltage", "Core #%d VID" % core, 1.2),
+        ]
+    sensor_list += [sensor("Temperature", "CPU Package", 50.0), sensor("Power", "CPU Package", 35.0)]
+    cpu = SimpleNamespace(Identifier="/intelcpu/0", Sensors=sensor_list, SubHardware=[])
+
+    def scan():
+        percentage = -1
+        frequencies = []
+        for s in cpu.Sensors:
+            if s.SensorType == "Load" and str(s.Name).startswith("CPU Total") and s.Value is not None:
+                percentage = float(s.Value)
+            if s.SensorType == "Clock" and "Core #" in str(s.Name) and "Effective" not in str(s.Name):
+                frequencies.append(float(s.Value))
+        # Temperature: one pass per fallback, no "Core Average" nor "Core Max" sensor here
+        temperature = -1
+        for prefix in ["Core Average", "Core Max", "CPU Package", "Core"]:
+            for s in cpu.Sensors:
+                if s.SensorType == "Temperature" and str(s.Name).startswith(prefix) and s.Value is not None:
+                    temperature = float(s.Value)
+                    break
+            if temperature != -1:
+                break
+        return percentage, sum(frequencies) / len(frequencies), temperature
+
+    index = SensorIndex(
+        {
+            "percentage": Metric([Rule("Load", prefix="CPU Total")]),
+            "frequency": Metric([Rule("Clock", contains="Core #", excludes="Effective")], average=True),
+            "temperature": Metric(
+                [
+                    Rule("Temperature", prefix="Core Average"),
+                    Rule("Temperature", prefix="Core Max"),
+                    Rule("Temperature", prefix="CPU Package"),
+                    Rule("Temperature", prefix="Core"),
+                ]
+            ),
+        }
+    )
+
+    def indexed():
+        resolved = index.resolve(cpu)
+        return resolved.value("percentage"), resolved.value("frequency"), resolved.value("temperature")
+
+    assert scan() == indexed()
+    print("%-24s %12s" % ("cpu sensors (%d)" % len(sensor_list), "us/tick"))
+    print("%-24s %12.1f" % ("name scan", measure(scan, iterations)))
+    print("%-24s %12.1f" % ("sensor index", measure(indexed, iterations)))
+    print("%-24s %12.1f" % ("index build", measure(lambda: index.invalidate() or indexed(), iterations)))
+
+
+BENCHMARKS = {
+    "backends": bench_backends,
+    "serializers": bench_serializers,
+    "readers": bench_readers,
+    "lhm": bench_lhm,
+}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the hardware-stats stages")
+    parser.add_argument(
+        "benchmarks",
+        nargs="*",
+        help="Benchmarks to run, among: %s (default: all)" % ", ".join(BENCHMARKS),
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    for name in args.benchmarks or BENCHMARKS:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: %s" % name)
+        print("== %s" % name)
+        BENCHMARKS[name](args.iterations)
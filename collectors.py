@@ -0,0 +1,131 @@
+# coding:utf-8
+# Collectors: one per subsystem, each with its own sampling period, keeping its latest good record
+# Each collector runs on its own worker thread with a deadline: a slow or hung query (GPU driver, dead network
+# mount...) only makes its own value stale, the other collectors and the write of the tick are not blocked
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Type
+
+from log import logger
+from sensors import Stats
+
+
+class Collector:
+    def __init__(
+        self,
+        name: str,
+        collect: Callable[[], Stats],
+        period: float,
+        timeout: Optional[float],
+        empty: Type[Stats],
+    ):
+        self.name = name
+        self.collect = collect
+        self.period = period  # In seconds
+        # In seconds. None: the tick does not wait for the reading, its record is published once it completes
+        # (slow scans); it is stale when still busy at its next due time
+        self.timeout = timeout
+        # Latest good record and its monotonic sampling time, replaced as a whole by the worker thread.
+        # Until the first reading, an empty record (all values -1)
+        self.latest = (empty(), None)
+        # The latest attempt timed out or failed: the published record is the last good one
+        self.stale = False
+        self.timeouts = 0
+        self.failures = 0
+        self._errors_in_row = 0
+        self._requested = threading.Event()
+        self._done = threading.Event()
+        self._done.set()
+        self._thread = None
+
+    @property
+    def record(self) -> Stats:
+        return self.latest[0]
+
+    def run(self):
+        try:
+            record = self.collect()
+        except Exception as e:
+            self.failures += 1
+            self.error("%s collector failed: %s" % (self.name, e))
+            return
+        self.latest = (record, time.monotonic())
+        self.stale = False
+        self._errors_in_row = 0
+
+    def error(self, message: str):
+        self.stale = True
+        self._errors_in_row += 1
+        # Only log the first error in a row, a hung collector would flood the log otherwise
+        if self._errors_in_row == 1:
+            logger.error(message)
+
+    def start(self):
+        # Daemon thread: a collector hung in native code must not prevent the program from exiting
+        self._thread = threading.Thread(
+            target=self._work, name="collector-%s" % self.name, daemon=True
+        )
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            self._requested.wait()
+            self._requested.clear()
+            self.run()
+            self._done.set()
+
+    def submit(self) -> bool:
+        # Request a reading from the worker thread, unless it is still busy with a previous one
+        if not self._done.is_set():
+            return False
+        self._done.clear()
+        self._requested.set()
+        return True
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+    def age(self, now: float) -> float:
+        # Age of the latest good record, in seconds
+        sampled_at = self.latest[1]
+        if sampled_at is None:
+            return -1
+        return round(now - sampled_at, 3)
+
+    def status(self, now: float) -> dict:
+        return {
+            "period": self.period,
+            "age": self.age(now),
+            "stale": self.stale,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+        }
+
+
+class CollectorPool:
+    def __init__(self, collectors: Dict[str, Collector]):
+        self.collectors = collectors
+        for collector in collectors.values():
+            collector.start()
+
+    def run(self, names: Iterable[str]):
+        # Run the given collectors concurrently, and wait for each one until its own deadline
+        started_at = time.monotonic()
+        submitted = []
+        for name in names:
+            collector = self.collectors[name]
+            if collector.submit():
+                if collector.timeout is not None:
+                    submitted.append(collector)
+            else:
+                collector.timeouts += 1
+                collector.error("%s collector is still busy, skipping it" % name)
+
+        for collector in sorted(submitted, key=lambda c: c.timeout):
+            remaining = started_at + collector.timeout - time.monotonic()
+            if not collector.wait(max(remaining, 0)):
+                # The reading goes on in background, its record is used once it completes
+                collector.timeouts += 1
+                collector.error(
+                    "%s collector timed out after %ss" % (collector.name, collector.timeout)
+                )
@@ -0,0 +1,76 @@
+# coding:utf-8
+# Change detection: a snapshot is only published when a metric moved beyond its deadband since the last
+# published snapshot, or when nothing was published for too long (heartbeat)
+import fnmatch
+from typing import Any, Dict, List, Tuple
+
+from serializers import flatten
+
+# Fields changing at every tick, not compared
+IGNORED_FIELDS = ["Tick.*", "Collectors.*.age"]
+
+
+class ChangeDetector:
+    def __init__(
+        self,
+        deadbands: List[Tuple[str, float, float]],
+        max_silence: float,
+        ignored: List[str] = IGNORED_FIELDS,
+    ):
+        # deadbands: (field name pattern, absolute, relative) tried in order, e.g. ("Disk.*", 0, 0.01).
+        # A numeric field changed when it moved by more than the absolute or the relative deadband,
+        # fields without deadband change with any difference
+        self.deadbands = deadbands
+        self.max_silence = max_silence  # In seconds, 0 to disable the heartbeat
+        self.ignored = ignored
+        # Resolved deadband of each field name, None for ignored fields
+        self.bands: Dict[str, Any] = {}
+        # Values of the last published snapshot
+        self.published: Dict[str, Any] = {}
+        self.published_at = None
+        self.skipped = 0
+
+    def band(self, name: str):
+        if any(fnmatch.fnmatchcase(name, pattern) for pattern in self.ignored):
+            return None
+        for pattern, absolute, relative in self.deadbands:
+            if fnmatch.fnmatchcase(name, pattern):
+                return absolute, relative
+        return 0, 0
+
+    def moved(self, values: Dict[str, Any]) -> bool:
+        if values.keys() != self.published.keys():
+            return True
+        for name, value in values.items():
+            band = self.bands.get(name, False)
+            if band is False:
+                band = self.bands[name] = self.band(name)
+            if band is None:
+                continue
+            before = self.published[name]
+            if (
+                isinstance(value, (int, float))
+                and not isinstance(value, bool)
+                and isinstance(before, (int, float))
+                and not isinstance(before, bool)
+            ):
+                absolute, relative = band
+                if abs(value - before) > max(absolute, relative * abs(before)):
+                    return True
+            elif value != before:
+                return True
+        return False
+
+    def should_publish(self, data: Dict[str, Any], now: float) -> bool:
+        # now: monotonic time, in seconds
+        values = dict(flatten(data))
+        if (
+            self.published_at is not None
+            and not (self.max_silence and now - self.published_at >= self.max_silence)
+            and not self.moved(values)
+        ):
+            self.skipped += 1
+            return False
+        self.published = values
+        self.published_at = now
+        return True
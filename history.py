@@ -0,0 +1,102 @@
+# coding:utf-8
+# In-memory history of the latest snapshots: a fixed-capacity ring buffer with one preallocated array('d')
+# column per numeric field and a shared timestamp column. Memory is allocated once per field, never per sample
+import bisect
+import math
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+from serializers import flatten
+
+NAN = float("nan")
+
+
+class History:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        # Unix timestamps of the samples, and their time.monotonic() used for the searches: the wall clock may
+        # step backwards (NTP), the monotonic times are always in order
+        self.times = array("d", bytes(8 * capacity))
+        self.monotonic = array("d", bytes(8 * capacity))
+        self.columns: Dict[str, array] = {}
+        # Total number of samples appended: the next one goes to count % capacity
+        self.count = 0
+        # Appends come from the main loop, queries from the sinks threads
+        self.lock = threading.Lock()
+
+    def append(self, timestamp: float, data: Dict[str, Any]):
+        values = {}
+        for name, value in flatten(data):
+            if isinstance(value, (int, float)):
+                values[name] = float(value)
+        now = time.monotonic()
+        with self.lock:
+            index = self.count % self.capacity
+            self.times[index] = timestamp
+            self.monotonic[index] = now
+            for name, column in self.columns.items():
+                column[index] = values.pop(name, NAN)
+            for name, value in values.items():
+                # New field: empty (NaN) for the previous samples
+                column = self.columns[name] = array("d", [NAN]) * self.capacity
+                column[index] = value
+            self.count += 1
+
+    def close(self):
+        # Nothing to flush: in memory only
+        pass
+
+    def fields(self) -> List[str]:
+        return list(self.columns)
+
+    def window(self, since: Optional[float] = None, last: Optional[int] = None) -> Tuple[int, int]:
+        # Logical (oldest first) start and end of the samples after the since timestamp, or of the last samples
+        size = min(self.count, self.capacity)
+        start = 0
+        if since is not None:
+            # Same instant on the monotonic clock, then binary search on the logical positions: samples are
+            # appended in monotonic time order
+            since = since - time.time() + time.monotonic()
+            start = bisect.bisect_left(range(size), since, key=self.monotonic_at)
+        if last is not None:
+            start = max(start, size - last)
+        return start, size
+
+    def monotonic_at(self, position: int) -> float:
+        return self.monotonic[self.physical(position)]
+
+    def physical(self, position: int) -> int:
+        if self.count <= self.capacity:
+            return position
+        return (self.count + position) % self.capacity
+
+    def slice(self, column: array, start: int, end: int) -> array:
+        # Copy of the logical range [start, end) of a column: at most two array slices
+        first = self.physical(start) if start < end else 0
+        length = end - start
+        if first + length <= self.capacity:
+            return column[first : first + length]
+        return column[first:] + column[: first + length - self.capacity]
+
+    def query(
+        self, name: str, since: Optional[float] = None, last: Optional[int] = None
+    ) -> Dict[str, Any]:
+        # Samples and min / max / mean of a field, over the samples after the since timestamp and/or the last ones
+        with self.lock:
+            column = self.columns.get(name)
+            if column is None:
+                raise KeyError(name)
+            start, end = self.window(since, last)
+            times = self.slice(self.times, start, end)
+            values = self.slice(column, start, end)
+        present = [value for value in values if not math.isnan(value)]
+        return {
+            "field": name,
+            "times": times.tolist(),
+            "values": [None if math.isnan(value) else value for value in values],
+            "min": min(present) if present else None,
+            "max": max(present) if present else None,
+            "mean": math.fsum(present) / len(present) if present else None,
+        }
@@ -0,0 +1,184 @@
+# coding:utf-8
+# Indexed reader for the Linux hwmon sysfs interface (/sys/class/hwmon)
+# The chips and channels are walked once, their static attributes (name, label, min, max) are read once,
+# and the value files are kept open: a reading is a single pread() on a cached file descriptor.
+# The index is only rebuilt when the set of hwmon directories changes, or after a channel read its device gone
+# (driver reloaded under the same hwmonN name).
+import errno
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+HWMON_ROOT = "/sys/class/hwmon"
+
+# Channel kind -> divisor to convert the raw sysfs value to the reported unit
+CHANNEL_SCALES = {
+    "fan": 1,  # RPM
+    "temp": 1000,  # millidegree Celsius -> °C
+    "in": 1000,  # mV -> V
+    "power": 1000000,  # µW -> W
+}
+
+CHANNEL_RE = re.compile(r"^(fan|temp|in|power)(\d+)_(input|average)$")
+
+# Errors of a read through the file descriptor of a sysfs file that was removed
+GONE_ERRNOS = (errno.ENODEV, errno.ENOENT, errno.ENXIO)
+
+
+def read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def read_number(path: str, scale: int) -> Optional[float]:
+    value = read_text(path)
+    try:
+        return int(value) / scale
+    except (TypeError, ValueError):
+        return None
+
+
+class HwmonChannel:
+    __slots__ = ("chip", "kind", "number", "label", "min", "max", "scale", "fd", "gone")
+
+    def __init__(self, chip: "HwmonChip", kind: str, number: int, base: str, value_path: str):
+        self.chip = chip
+        self.kind = kind
+        self.number = number
+        self.scale = CHANNEL_SCALES[kind]
+        self.label = read_text(base + "_label") or os.path.basename(base)
+        self.min = read_number(base + "_min", self.scale)
+        self.max = read_number(base + "_max", self.scale)
+        self.fd = os.open(value_path, os.O_RDONLY)
+        # The last reading failed because the device is gone: the cached file descriptor is stale
+        self.gone = False
+
+    def read(self) -> Optional[float]:
+        # Current value, None if the device is gone or does not report it
+        try:
+            value = int(os.pread(self.fd, 32, 0))
+        except OSError as e:
+            self.gone = e.errno in GONE_ERRNOS
+            return None
+        except ValueError:
+            return None
+        # Fan speeds are integers (RPM), like the raw value
+        return value / self.scale if self.scale != 1 else value
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class HwmonChip:
+    __slots__ = ("name", "path", "channels")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = read_text(os.path.join(path, "name")) or os.path.basename(path)
+        self.channels: List[HwmonChannel] = []
+        # CentOS has an intermediate /device directory:
+        # https://github.com/giampaolo/psutil/issues/971
+        for directory in (path, os.path.join(path, "device")):
+            self._add_channels(directory)
+            if self.channels:
+                break
+        self.channels.sort(key=lambda channel: (channel.kind, channel.number))
+
+    def _add_channels(self, directory: str):
+        try:
+            filenames = os.listdir(directory)
+        except OSError:
+            return
+        for filename in filenames:
+            match = CHANNEL_RE.match(filename)
+            if match is None:
+                continue
+            kind, number, attribute = match.groups()
+            # power channels may only expose an averaged value
+            if attribute == "average" and kind + number + "_input" in filenames:
+                continue
+            base = os.path.join(directory, kind + number)
+            try:
+                self.channels.append(
+                    HwmonChannel(self, kind, int(number), base, os.path.join(directory, filename))
+                )
+            except OSError:
+                pass
+
+
+class HwmonIndex:
+    def __init__(self, root: str = HWMON_ROOT, check_interval: float = 5.0):
+        self.root = root
+        # Minimal delay between two checks of the hwmon directories
+        self.check_interval = check_interval
+        self.chips: List[HwmonChip] = []
+        self.by_name: Dict[str, List[HwmonChip]] = {}
+        self.by_kind: Dict[str, List[HwmonChannel]] = {}
+        self._dirs = None
+        self._checked_at = None
+        # The index is shared by the collector threads: a rebuild closes the file descriptors of the channels.
+        # Held by refresh() and build(), and by the readers from the lookup of a channel to its reading
+        self.lock = threading.RLock()
+
+    def refresh(self) -> "HwmonIndex":
+        # Rebuild the index if the set of hwmon directories changed since last build
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self
+        with self.lock:
+            self._checked_at = now
+            try:
+                dirs = frozenset(name for name in os.listdir(self.root) if name.startswith("hwmon"))
+            except OSError:
+                dirs = frozenset()
+            if dirs != self._dirs:
+                self.build(dirs)
+        return self
+
+    def build(self, dirs):
+        with self.lock:
+            self.close()
+            # hwmon0, hwmon1, ..., hwmon10 in numerical order
+            ordered = sorted(dirs, key=lambda name: (len(name), name))
+            self.chips = [HwmonChip(os.path.join(self.root, name)) for name in ordered]
+            self.by_name = {}
+            self.by_kind = {}
+            for chip in self.chips:
+                self.by_name.setdefault(chip.name, []).append(chip)
+                for channel in chip.channels:
+                    self.by_kind.setdefault(channel.kind, []).append(channel)
+            self._dirs = dirs
+
+    def invalidate(self):
+        # Force a rebuild on the next check of the hwmon directories, e.g. after a reading of a gone device.
+        # The check interval still applies: a channel that keeps failing does not rebuild the index at every tick
+        self._dirs = None
+
+    def channels(self, kind: str) -> List[HwmonChannel]:
+        self.refresh()
+        return self.by_kind.get(kind, [])
+
+    def first_channel(self, chip_name: str, kind: str) -> Optional[HwmonChannel]:
+        self.refresh()
+        for chip in self.by_name.get(chip_name, ()):
+            for channel in chip.channels:
+                if channel.kind == kind:
+                    return channel
+        return None
+
+    def close(self):
+        with self.lock:
+            for chip in self.chips:
+                for channel in chip.channels:
+                    channel.close()
+            self.chips = []
+            self.by_name = {}
+            self.by_kind = {}
@@ -0,0 +1,145 @@
+# coding:utf-8
+# Sensor index for LibreHardwareMonitor hardware
+# Every exported metric is a fallback chain of rules (sensor type and name pattern). The sensors of a hardware are
+# walked once, their type and name read once, and each metric keeps the matching sensor objects in chain order:
+# a reading is then only the .Value of these pre-resolved handles, without str(sensor.Name) calls through
+# pythonnet. The index of a hardware is rebuilt every rebuild_interval seconds (sensors appear after the first
+# updates) or after invalidate().
+# Only duck typing is used (Sensors, SubHardware, SensorType, Name, Value): works with any model of the LHM objects
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class Rule:
+    __slots__ = ("sensor_type", "prefix", "suffix", "contains", "excludes")
+
+    def __init__(self, sensor_type: Any, prefix: str = "", suffix: str = "", contains: str = "", excludes: str = ""):
+        # Sensors of this type whose name starts with prefix, ends with suffix, contains contains and not excludes
+        self.sensor_type = sensor_type
+        self.prefix = prefix
+        self.suffix = suffix
+        self.contains = contains
+        self.excludes = excludes
+
+    def matches(self, sensor_type: Any, name: str) -> bool:
+        return (
+            sensor_type == self.sensor_type
+            and name.startswith(self.prefix)
+            and name.endswith(self.suffix)
+            and self.contains in name
+            and not (self.excludes and self.excludes in name)
+        )
+
+
+class Metric:
+    __slots__ = ("rules", "default", "average", "zero_falls_back")
+
+    def __init__(self, rules: List[Rule], default: float = -1, average: bool = False, zero_falls_back: bool = False):
+        # rules: fallback chain, the next rule is only used when no sensor of the previous ones has a value.
+        # average: mean of all the sensors of a rule (e.g. the core clocks), else the first sensor with a value.
+        # zero_falls_back: a 0 value also falls back to the next rule (a less precise sensor reading something)
+        self.rules = rules
+        self.default = default
+        self.average = average
+        self.zero_falls_back = zero_falls_back
+
+
+class ResolvedSensors:
+    __slots__ = ("hardware", "metrics", "chains", "built_at")
+
+    def __init__(self, hardware: Any, metrics: Dict[str, Metric]):
+        self.hardware = hardware
+        self.metrics = metrics
+        # Metric name -> one list of sensors per rule of its chain
+        self.chains: Dict[str, List[List[Any]]] = {
+            name: [[] for _ in metric.rules] for name, metric in metrics.items()
+        }
+        sensors = list(hardware.Sensors)
+        for sub_hardware in getattr(hardware, "SubHardware", None) or ():
+            sensors.extend(sub_hardware.Sensors)
+        for sensor in sensors:
+            sensor_type = sensor.SensorType
+            name = str(sensor.Name)
+            for metric_name, metric in metrics.items():
+                for position, rule in enumerate(metric.rules):
+                    if rule.matches(sensor_type, name):
+                        self.chains[metric_name][position].append(sensor)
+        self.built_at = time.monotonic()
+
+    def has(self, name: str) -> bool:
+        return any(self.chains[name])
+
+    def value(self, name: str) -> float:
+        metric = self.metrics[name]
+        zero = None
+        for sensors in self.chains[name]:
+            if metric.average:
+                values = [value for value in (sensor.Value for sensor in sensors) if value is not None]
+                if values:
+                    return float(sum(values) / len(values))
+                continue
+            for sensor in sensors:
+                value = sensor.Value
+                if value is None:
+                    continue
+                if value == 0 and metric.zero_falls_back:
+                    zero = 0.0
+                    continue
+                return float(value)
+        return zero if zero is not None else metric.default
+
+
+class SensorIndex:
+    def __init__(self, metrics: Dict[str, Metric], rebuild_interval: float = 60.0):
+        self.metrics = metrics
+        # Delay before the sensors of a hardware are indexed again, 0 to never rebuild
+        self.rebuild_interval = rebuild_interval
+        self.resolved: Dict[Hashable, ResolvedSensors] = {}
+        # id() of the latest wrapper object of each indexed hardware -> its sensors: looked up without any call
+        # through pythonnet, the hardware objects kept by the backend (GPUs, interfaces) always hit it
+        self.by_object: Dict[int, ResolvedSensors] = {}
+
+    @staticmethod
+    def key(hardware: Any) -> Hashable:
+        # pythonnet may return a new Python wrapper at each access to the same .NET object: LHM hardware are
+        # identified by their Identifier, the other objects by their identity
+        identifier = getattr(hardware, "Identifier", None)
+        return str(identifier) if identifier is not None else id(hardware)
+
+    def expired(self, resolved: ResolvedSensors) -> bool:
+        return bool(self.rebuild_interval) and time.monotonic() - resolved.built_at >= self.rebuild_interval
+
+    def resolve(self, hardware: Any) -> ResolvedSensors:
+        # Sensors of the hardware for every metric, indexed when first seen or when the index is too old
+        resolved = self.by_object.get(id(hardware))
+        if resolved is not None and resolved.hardware is hardware and not self.expired(resolved):
+            return resolved
+        return self.lookup(hardware)
+
+    def lookup(self, hardware: Any) -> ResolvedSensors:
+        # Another wrapper object, a new hardware or an index too old: found again by Identifier
+        key = self.key(hardware)
+        resolved = self.resolved.get(key)
+        if resolved is not None:
+            self.by_object.pop(id(resolved.hardware), None)
+        if (
+            resolved is None
+            # == is Equals() for .NET objects: same hardware behind another wrapper
+            or (resolved.hardware is not hardware and resolved.hardware != hardware)
+            or self.expired(resolved)
+        ):
+            resolved = self.resolved[key] = ResolvedSensors(hardware, self.metrics)
+        else:
+            resolved.hardware = hardware
+        self.by_object[id(hardware)] = resolved
+        return resolved
+
+    def invalidate(self, hardware: Optional[Any] = None):
+        # Index again on next resolve, e.g. after a hardware change
+        if hardware is None:
+            self.resolved.clear()
+            self.by_object.clear()
+        else:
+            resolved = self.resolved.pop(self.key(hardware), None)
+            if resolved is not None:
+                self.by_object.pop(id(resolved.hardware), None)
@@ -2,45 +2,175 @@
 # hareware-stats.py: Write hardware status data in a loop to a local YAML format file for other programs to read and use
 import argparse
 import atexit
+import functools
+import multiprocessing
 import os
 import gc
-import shutil
 import signal
+import socket
 import sys
 import time
-import tempfile
 import platform
-import ruamel.yaml
 
 from runtime_util import require_runas_admin, require_runas_unique
 from log import logger
 from consts import STATE_PATH
+import mounts
+import processes
+import sensors
+from collectors import Collector, CollectorPool
+from deadband import ChangeDetector
+from history import History
+from rollup import Rollups
+from tslog import TimeSeriesLog
+from scheduler import MultiRateScheduler
+from serializers import SERIALIZERS, get_serializer
+from sinks import FileSink, HttpSink, SharedMemorySink, StreamSink
+from supervisor import WorkerProcess
 
-TEMP_DIR = tempfile.TemporaryDirectory()
+# Default sampling period of the Processes collector, in seconds
+PROCESSES_PERIOD = 5.0
+
+# Enabled output sinks, closed on exit
+SINKS = []
+
+# History recorders, fed with every tick and closed on exit
+RECORDERS = []
 
 
 def safe_exit(signum=None, frame=None):
     logger.info(f"Received signal {signum}, cleaning up...")
-    TEMP_DIR.cleanup()
+    while SINKS:
+        SINKS.pop().close()
+    while RECORDERS:
+        RECORDERS.pop().close()
     try:
         sys.exit(0)
     except:
         os._exit(0)
 
 
-# 注册退出时要执行的清理函数
-atexit.register(safe_exit)
-# 捕获终止信号
-signal.signal(signal.SIGTERM, safe_exit)
-signal.signal(signal.SIGINT, safe_exit)  # Ctrl+C
+def load_sensors(args):
+    # Import the sensors backend: LibreHardwareMonitor on Windows, psutil elsewhere, or native procfs on Linux
+    backend = args.backend
+    if backend == "auto":
+        backend = "lhm" if platform.system() == "Windows" else "python"
+    if backend == "lhm":
+        import sensors_librehardwaremonitor as sensors_backend
+    elif backend == "procfs":
+        import sensors_procfs as sensors_backend
+
+        sensors_backend.set_roots(args.procfs_root, args.sysfs_root)
+    else:
+        import sensors_python as sensors_backend
+    logger.info("Using sensors backend: %s" % backend)
+    return sensors_backend
+
 
-require_runas_unique()
+def make_collectors(args) -> dict:
+    # Collect function and empty record of every subsystem.
+    # Also called in the collector worker processes (see supervisor.py): it must only depend on args
+    sensors_backend = load_sensors(args)
+    Cpu = sensors_backend.Cpu
+    Gpu = sensors_backend.Gpu
+    Memory = sensors_backend.Memory
+    Disk = sensors_backend.Disk
+    Net = sensors_backend.Net
+    Gpu.rediscover_interval = args.gpu_rediscover
+    Gpu.sampling_interval = args.interval
+    # One collector per subsystem, each returning a snapshot record filled from a single query
+    collectors = {
+        "Cpu": (Cpu.collect, sensors.CpuStats),
+        "Gpu": (Gpu.collect, sensors.GpuStats),
+        "Memory": (Memory.collect, sensors.MemoryStats),
+        "Disk": (Disk.collect, sensors.DiskStats),
+        "Net": (lambda: Net.collect(args.network, args.interval), sensors.NetStats),
+    }
+    # Optional collectors, not available in all the backends
+    if args.cpu_cores and hasattr(sensors_backend, "CpuCores"):
+        collectors["CpuCores"] = (sensors_backend.CpuCores.collect, sensors.CpuCoresStats)
+    if args.processes:
+        collectors["Processes"] = (
+            lambda: sensors_backend.Processes.collect(args.processes, args.processes_sort),
+            sensors.ProcessesStats,
+        )
+    if args.mounts and hasattr(sensors_backend, "Mounts"):
+        exclude = mounts.DEFAULT_EXCLUDE if args.mounts_exclude is None else args.mounts_exclude
+        collectors["Mounts"] = (lambda: sensors_backend.Mounts.collect(exclude), sensors.MountsStats)
+    if args.disk_io and hasattr(sensors_backend, "DiskIO"):
+        device_filter = sensors.DeviceFilter(
+            args.disk_io_include or ["*"],
+            sensors.DEFAULT_DEVICE_EXCLUDE if args.disk_io_exclude is None else args.disk_io_exclude,
+        )
+        collectors["DiskIO"] = (lambda: sensors_backend.DiskIO.collect(device_filter), sensors.DiskIOStats)
+    if args.interfaces and hasattr(sensors_backend, "Interfaces"):
+        interface_filter = sensors.InterfaceFilter(
+            args.interfaces_include or ["*"],
+            sensors.DEFAULT_INTERFACE_EXCLUDE if args.interfaces_exclude is None else args.interfaces_exclude,
+        )
+        collectors["Interfaces"] = (
+            lambda: sensors_backend.Interfaces.collect(interface_filter),
+            sensors.InterfacesStats,
+        )
+    return collectors
+
+
+def parse_seconds(value: str):
+    # "Disk=30" -> ("Disk", 30.0)
+    name, _, period = value.partition("=")
+    try:
+        return name, float(period)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected NAME=SECONDS, got '%s'" % value)
 
-if platform.system() == "Windows":  # Windows-specific
-    require_runas_admin()
-    from sensors_librehardwaremonitor import Cpu, Gpu, Memory, Disk, Net
-else:
-    from sensors_python import Cpu, Gpu, Memory, Disk, Net
+
+def parse_patterns(value: str):
+    # "eth*, bond*" -> ["eth*", "bond*"]
+    return [pattern.strip() for pattern in value.split(",") if pattern.strip()]
+
+
+def parse_deadband(value: str):
+    # "Cpu.percentage=1" -> ("Cpu.percentage", 1.0, 0), "Disk.*=2%" -> ("Disk.*", 0, 0.02)
+    pattern, _, band = value.partition("=")
+    try:
+        if band.endswith("%"):
+            return pattern, 0, float(band[:-1]) / 100
+        return pattern, float(band), 0
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected FIELD=DELTA or FIELD=PERCENT%%, got '%s'" % value)
+
+
+def parse_fsync(value: str):
+    # "never" -> (0, False), "shutdown" -> (0, True), "10" -> (10, True): every 10 writes and on shutdown
+    if value == "never":
+        return 0, False
+    if value == "shutdown":
+        return 0, True
+    try:
+        every = int(value)
+    except ValueError:
+        every = 0
+    if every <= 0:
+        raise argparse.ArgumentTypeError("expected never, shutdown or a number of writes, got '%s'" % value)
+    return every, True
+
+
+def parse_rollup(value: str):
+    # "60=86400" -> (60.0, 86400.0): buckets of 60 seconds kept 1 day
+    resolution, _, retention = value.partition("=")
+    try:
+        return float(resolution), float(retention)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected RESOLUTION=RETENTION in seconds, got '%s'" % value)
+
+
+def parse_address(value: str):
+    # "127.0.0.1:9100" -> ("127.0.0.1", 9100), "9100" -> ("127.0.0.1", 9100)
+    host, _, port = value.rpartition(":")
+    try:
+        return host.strip("[]") or "127.0.0.1", int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected [HOST:]PORT, got '%s'" % value)
 
 
 def run():
@@ -50,89 +180,350 @@ def run():
     parser.add_argument(
         "--interval", type=float, default=0.5, help="Write interval, unit second"
     )
+    parser.add_argument(
+        "--align",
+        action="store_true",
+        help="Align the writes on wall clock multiples of the interval",
+    )
+    parser.add_argument(
+        "--period",
+        type=parse_seconds,
+        action="append",
+        default=[],
+        metavar="NAME=SECONDS",
+        help="Sampling period of a collector (Cpu, Gpu, Memory, Disk, Net, CpuCores, Mounts, DiskIO, Interfaces, Processes...), default to the interval. Repeatable",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=parse_seconds,
+        action="append",
+        default=[],
+        metavar="NAME=SECONDS",
+        help="Reading timeout of a collector, default to the interval: its last value is published as stale. Repeatable",
+    )
     parser.add_argument(
         "--network", type=str, default="", help="The netword interface want to watch"
     )
+    parser.add_argument(
+        "--cpu-cores",
+        action="store_true",
+        help="Also collect the utilization and frequency of each logical CPU (CpuCores, not with the lhm backend)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Also collect the N top processes (Processes). Sampled every %g seconds unless set with --period, "
+        "the ticks do not wait for the scan unless a --timeout is set"
+        % PROCESSES_PERIOD,
+    )
+    parser.add_argument(
+        "--processes-sort",
+        type=str,
+        default="cpu",
+        choices=list(processes.SORT_KEYS),
+        help="Ranking of the top processes: CPU usage, resident memory or disk I/O",
+    )
+    parser.add_argument(
+        "--mounts",
+        action="store_true",
+        help="Also collect the space usage of every mounted filesystem (Mounts)",
+    )
+    parser.add_argument(
+        "--mounts-exclude",
+        type=parse_patterns,
+        default=None,
+        metavar="GLOB,...",
+        help="Filesystem types skipped by --mounts, empty for none (default: pseudo and network filesystems, "
+        "e.g. tmpfs,overlay,nfs,cifs)",
+    )
+    parser.add_argument(
+        "--disk-io",
+        action="store_true",
+        help="Also collect the throughput, IOPS, latency and utilization of every block device (DiskIO)",
+    )
+    parser.add_argument(
+        "--disk-io-include",
+        type=parse_patterns,
+        default=[],
+        metavar="GLOB,...",
+        help="Devices collected by --disk-io, e.g. 'nvme*,dm-*' (default: all)",
+    )
+    parser.add_argument(
+        "--disk-io-exclude",
+        type=parse_patterns,
+        default=None,
+        metavar="GLOB,...",
+        help="Devices skipped by --disk-io, empty for none (default: partitions, loop, RAM and optical devices, %s)"
+        % ",".join(sensors.DEFAULT_DEVICE_EXCLUDE),
+    )
+    parser.add_argument(
+        "--interfaces",
+        action="store_true",
+        help="Also collect the traffic, packet, error and drop rates of every network interface (Interfaces)",
+    )
+    parser.add_argument(
+        "--interfaces-include",
+        type=parse_patterns,
+        default=[],
+        metavar="GLOB,...",
+        help="Interfaces collected by --interfaces, e.g. 'eth*,bond*' (default: all)",
+    )
+    parser.add_argument(
+        "--interfaces-exclude",
+        type=parse_patterns,
+        default=None,
+        metavar="GLOB,...",
+        help="Interfaces skipped by --interfaces, empty for none (default: loopback and virtual interfaces, %s)"
+        % ",".join(sensors.DEFAULT_INTERFACE_EXCLUDE),
+    )
+    parser.add_argument(
+        "--gpu-rediscover",
+        type=float,
+        default=60,
+        help="GPU rediscovery interval for hot-plugged GPUs, unit second (0 to disable)",
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default="auto",
+        choices=["auto", "python", "procfs", "lhm"],
+        help="Sensors backend: psutil (python), native Linux procfs (procfs) or LibreHardwareMonitor (lhm)",
+    )
+    parser.add_argument(
+        "--procfs-root", type=str, default="/proc", help="procfs mount point for the procfs backend"
+    )
+    parser.add_argument(
+        "--sysfs-root", type=str, default="/sys", help="sysfs mount point for the procfs backend"
+    )
+    parser.add_argument(
+        "--isolate",
+        type=str,
+        action="append",
+        default=[],
+        metavar="NAME",
+        help="Run a collector in a worker process, restarted if it hangs (e.g. Gpu). Repeatable",
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="yaml",
+        choices=list(SERIALIZERS),
+        help="Output file format, the file extension follows the format",
+    )
+    parser.add_argument(
+        "--fsync",
+        type=parse_fsync,
+        default="never",
+        metavar="POLICY",
+        help="Flush the output file to disk: never, shutdown, or every N writes (and on shutdown)",
+    )
+    parser.add_argument(
+        "--on-change",
+        action="store_true",
+        help="Only publish a snapshot when a value changed since the last published one",
+    )
+    parser.add_argument(
+        "--deadband",
+        type=parse_deadband,
+        action="append",
+        default=[],
+        metavar="FIELD=DELTA",
+        help="Change ignored for the fields matching the pattern (e.g. Cpu.percentage=1, Disk.*=2%%), implies --on-change. Repeatable",
+    )
+    parser.add_argument(
+        "--max-silence",
+        type=float,
+        default=10,
+        help="With --on-change, publish anyway after this time without change, unit second (0 to disable)",
+    )
+    parser.add_argument(
+        "--shm",
+        type=str,
+        default="",
+        metavar="PATH",
+        help="Also publish the snapshots in a shared memory file (e.g. /dev/shm/hardware-stats), read with shm.ShmReader",
+    )
+    parser.add_argument(
+        "--http",
+        type=parse_address,
+        default=None,
+        metavar="[HOST:]PORT",
+        help="Serve the snapshots over HTTP: /metrics (Prometheus) and /snapshot (JSON), on 127.0.0.1 by default",
+    )
+    parser.add_argument(
+        "--history",
+        type=int,
+        default=0,
+        metavar="SAMPLES",
+        help="Keep the last SAMPLES snapshots in memory, queried on /history of the HTTP server (0 to disable)",
+    )
+    parser.add_argument(
+        "--tslog",
+        type=str,
+        default="",
+        metavar="DIRECTORY",
+        help="Append every snapshot to a time-series log in this directory, dumped with tslog.py",
+    )
+    parser.add_argument(
+        "--tslog-segment-mb", type=float, default=64, help="Size of a time-series log segment file, unit MB"
+    )
+    parser.add_argument(
+        "--tslog-segment-hours", type=float, default=1, help="Duration of a time-series log segment file, unit hour"
+    )
+    parser.add_argument(
+        "--tslog-batch",
+        type=int,
+        default=20,
+        help="Snapshots buffered before a write to the time-series log, lost if the program crashes",
+    )
+    parser.add_argument(
+        "--tslog-keep", type=int, default=0, help="Time-series log segments kept, the oldest are removed (0 to keep all)"
+    )
+    parser.add_argument(
+        "--rollup",
+        type=parse_rollup,
+        action="append",
+        default=[],
+        metavar="RESOLUTION=RETENTION",
+        help="Keep min/max/mean/count of every field per bucket of RESOLUTION seconds during RETENTION seconds "
+        "(e.g. 1=3600 60=604800 3600=31536000), queried on /rollups of the HTTP server. Repeatable",
+    )
+    parser.add_argument(
+        "--rollup-dir",
+        type=str,
+        default="",
+        metavar="DIRECTORY",
+        help="Also append the closed rollup buckets to a time-series log per resolution in this directory",
+    )
+    parser.add_argument(
+        "--stream",
+        type=str,
+        default="",
+        metavar="PATH",
+        help="Push each snapshot as a JSON line to the clients of a Unix domain socket; "
+        "a client first sends the sections it wants, e.g. 'Net,Cpu', or an empty line for all",
+    )
+    parser.add_argument(
+        "--stream-queue",
+        type=int,
+        default=16,
+        help="Snapshots queued for a slow stream client before the oldest ones are dropped",
+    )
+    parser.add_argument(
+        "--heartbeat",
+        type=float,
+        default=5,
+        help="Time for a worker process to answer before it is killed and restarted, unit second",
+    )
     args = parser.parse_args()
+    resolutions = [resolution for resolution, _ in args.rollup]
+    for lower, higher in zip(resolutions, resolutions[1:]):
+        if higher <= lower or higher % lower:
+            parser.error("--rollup resolutions must increase, each a multiple of the previous one")
+    if args.stream and not hasattr(socket, "AF_UNIX"):
+        parser.error("--stream needs Unix domain sockets, not available on this platform")
     #
     logger.info("start get stats...")
-    temp_path = os.path.join(TEMP_DIR.name, "temp-hardware-stats")
-    loop_count = 0
+    # Serializer is built once and reused for every tick
+    serializer = get_serializer(args.format)
+    state_path = os.path.splitext(STATE_PATH)[0] + serializer.extension
+    fsync_every, fsync_on_close = args.fsync
+    SINKS.append(FileSink(state_path, serializer, fsync_every, fsync_on_close))
+    if args.shm:
+        SINKS.append(SharedMemorySink(args.shm))
+    # Every tick is recorded, including the ones not published because nothing changed
+    history = History(args.history) if args.history > 0 else None
+    if history is not None:
+        RECORDERS.append(history)
+    if args.tslog:
+        RECORDERS.append(
+            TimeSeriesLog(
+                args.tslog,
+                int(args.tslog_segment_mb * 1024 * 1024),
+                args.tslog_segment_hours * 3600,
+                max(args.tslog_batch, 1),
+                args.tslog_keep,
+            )
+        )
+    rollups = None
+    if args.rollup:
+        rollups = Rollups(args.rollup, args.rollup_dir, max(args.tslog_batch, 1))
+        RECORDERS.append(rollups)
+    if args.http:
+        SINKS.append(HttpSink(*args.http, history, rollups))
+    if args.stream:
+        SINKS.append(StreamSink(args.stream, args.stream_queue))
+    collectors = make_collectors(args)
+    periods = dict(args.period)
+    timeouts = dict(args.timeout)
+    if "Processes" in collectors:
+        # Scanning all the processes is the costliest collection: slower period, and the ticks do not wait for it
+        periods.setdefault("Processes", max(PROCESSES_PERIOD, args.interval))
+        timeouts.setdefault("Processes", None)
+    for option, names in [("--period", periods), ("--timeout", timeouts), ("--isolate", args.isolate)]:
+        for name in names:
+            if name not in collectors:
+                parser.error("unknown collector in %s: %s" % (option, name))
+    for name in args.isolate:
+        # The worker process builds the same collector with make_collectors(args)
+        worker = WorkerProcess(name, functools.partial(make_collectors, args), args.heartbeat)
+        collectors[name] = (worker.collect, collectors[name][1])
+    collectors = {
+        name: Collector(
+            name,
+            collect,
+            periods.get(name, args.interval),
+            timeouts.get(name, args.interval),
+            empty,
+        )
+        for name, (collect, empty) in collectors.items()
+    }
+    detector = None
+    if args.on_change or args.deadband:
+        detector = ChangeDetector(args.deadband, args.max_silence)
+    pool = CollectorPool(collectors)
+    scheduler = MultiRateScheduler(
+        {name: collector.period for name, collector in collectors.items()}, args.align
+    )
     while True:
-        with open(temp_path, "w", encoding="utf-8") as tmp_file:
-            # CPU
-            cpuStats = {
-                name: getattr(Cpu, name)()
-                for name in [
-                    "percentage",
-                    "frequency",
-                    "temperature",
-                    "fan_rpm",
-                ]
-            }
-            # GPU
-            gpuStats = {
-                name: getattr(Gpu, name)()
-                for name in [
-                    "stats",
-                    "is_available",
-                    "fan_rpm",
-                ]
-            }
-            gpuStats["load"] = gpuStats["stats"][0]
-            gpuStats["percentage"] = gpuStats["stats"][1]
-            gpuStats["total"] = gpuStats["stats"][3]
-            gpuStats["used"] = gpuStats["stats"][2]
-            gpuStats["free"] = gpuStats["total"] - gpuStats["used"]
-            gpuStats["temperature"] = gpuStats["stats"][4]
-            del gpuStats["stats"]
-            # Memory
-            memStats = {
-                name: getattr(Memory, name)()
-                for name in [
-                    "percentage",
-                    "used",
-                    "free",
-                ]
-            }
-            memStats["total"] = memStats["used"] + memStats["free"]
-            # Disk
-            diskStats = {
-                name: getattr(Disk, name)()
-                for name in [
-                    "percentage",
-                    "used",
-                    "free",
-                ]
-            }
-            diskStats["total"] = diskStats["used"] + diskStats["free"]
-            # Net
-            _netStats = Net.stats(args.network, args.interval)
-            netStats = {
-                "upload_rate": _netStats[0],
-                "uploaded": _netStats[1],
-                "download_rate": _netStats[2],
-                "downloaded": _netStats[3],
-            }
-            data = {
-                "Cpu": cpuStats,
-                "Gpu": gpuStats,
-                "Memory": memStats,
-                "Disk": diskStats,
-                "Net": netStats,
-            }
-            # logger.info(data)
-            ruamel.yaml.YAML().dump(data, tmp_file)
-        shutil.move(temp_path, STATE_PATH)
-        # sleep interval
-        loop_count += 1
+        # Wait for the next deadline: the collection and write time does not delay the following ticks
+        tick, due = scheduler.wait()
+        pool.run(due)
+        # Latest record of every collector, and how old each one is
+        data = {name: collector.record.as_dict() for name, collector in collectors.items()}
+        data["Tick"] = tick.as_dict()
+        now = time.monotonic()
+        data["Collectors"] = {
+            name: collector.status(now) for name, collector in collectors.items()
+        }
+        # logger.info(data)
+        for recorder in RECORDERS:
+            recorder.append(tick.time, data)
+        # Same publication policy for all the sinks
+        if detector is None or detector.should_publish(data, now):
+            for sink in SINKS:
+                sink.publish(data)
         # 每万次手动进行一次垃圾回收
-        if loop_count % 10000 == 0:
+        if tick.sequence % 10000 == 0:
             gc.collect()
-        else:
-            time.sleep(args.interval)
 
 if __name__ == "__main__":
+    # Collector worker processes start here when the program is frozen
+    multiprocessing.freeze_support()
+
+    # 注册退出时要执行的清理函数
+    atexit.register(safe_exit)
+    # 捕获终止信号
+    signal.signal(signal.SIGTERM, safe_exit)
+    signal.signal(signal.SIGINT, safe_exit)  # Ctrl+C
+
+    require_runas_unique()
+
+    if platform.system() == "Windows":  # Windows-specific
+        require_runas_admin()
+
     try:
         run()
     except Exception as e:
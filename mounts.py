@@ -0,0 +1,252 @@
+# coding:utf-8
+# Cached mount table for the disk space collectors
+# On Linux /proc/self/mountinfo is kept open and polled: the kernel flags it with POLLPRI when a filesystem is
+# mounted or unmounted, so the table is only parsed again after a change. On the other platforms (or without
+# mountinfo) the partitions listed by psutil are re-read on a timer.
+# Space usage is one statvfs() per filesystem: bind mounts of an already listed filesystem are skipped.
+# Mounts do not depend on the sensors library: the Mounts collector and its table are shared by all the backends.
+import fnmatch
+import os
+import re
+import select
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import sensors
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+
+# Filesystems without disk space of their own (kernel interfaces, memory, container layers, read-only images)
+PSEUDO_FILESYSTEMS = [
+    "proc",
+    "sysfs",
+    "devtmpfs",
+    "devpts",
+    "tmpfs",
+    "ramfs",
+    "cgroup",
+    "cgroup2",
+    "securityfs",
+    "debugfs",
+    "tracefs",
+    "pstore",
+    "bpf",
+    "configfs",
+    "fusectl",
+    "mqueue",
+    "hugetlbfs",
+    "autofs",
+    "binfmt_misc",
+    "nsfs",
+    "rpc_pipefs",
+    "efivarfs",
+    "selinuxfs",
+    "overlay",
+    "squashfs",
+    "fuse.lxcfs",
+    "fuse.gvfsd-fuse",
+    "fuse.portal",
+]
+
+# Filesystems served over the network: statvfs() blocks as long as the server does not answer.
+# "remote" is the type given to network drives on Windows
+NETWORK_FILESYSTEMS = [
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "ncpfs",
+    "afs",
+    "ceph",
+    "glusterfs",
+    "fuse.glusterfs",
+    "fuse.sshfs",
+    "fuse.rclone",
+    "9p",
+    "davfs",
+    "lustre",
+    "gpfs",
+    "beegfs",
+    "remote",
+]
+
+# Filesystem types skipped by default
+DEFAULT_EXCLUDE = PSEUDO_FILESYSTEMS + NETWORK_FILESYSTEMS
+
+# Octal escapes of the mountinfo paths, e.g. "\040" for a space
+ESCAPE_RE = re.compile(r"\\([0-7]{3})")
+
+
+class Mount:
+    __slots__ = ("device", "mountpoint", "fstype", "filesystem")
+
+    def __init__(self, device: str, mountpoint: str, fstype: str, filesystem: str):
+        self.device = device
+        self.mountpoint = mountpoint
+        self.fstype = fstype
+        # Identifier of the mounted filesystem, shared by its bind mounts
+        self.filesystem = filesystem
+
+
+def unescape(path: str) -> str:
+    return ESCAPE_RE.sub(lambda match: chr(int(match.group(1), 8)), path)
+
+
+def parse_mountinfo(text: str) -> List[Mount]:
+    # "36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue"
+    # Optional fields before the "-" separator are variable in number
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split(" ")
+        try:
+            separator = fields.index("-", 6)
+            mounts.append(
+                Mount(unescape(fields[separator + 2]), unescape(fields[4]), fields[separator + 1], fields[2])
+            )
+        except (ValueError, IndexError):
+            continue
+    return mounts
+
+
+def list_partitions() -> List[Mount]:
+    if psutil is None:
+        return []
+    mounts = []
+    for partition in psutil.disk_partitions(all=True):
+        fstype = partition.fstype
+        if "remote" in partition.opts.split(","):
+            fstype = "remote"
+        mounts.append(Mount(partition.device, partition.mountpoint, fstype, partition.device))
+    return mounts
+
+
+def usage(mountpoint: str) -> Tuple[int, int]:
+    # Used and free (for unprivileged users) bytes, computed like psutil.disk_usage()
+    if hasattr(os, "statvfs"):
+        st = os.statvfs(mountpoint)
+        return (st.f_blocks - st.f_bfree) * st.f_frsize, st.f_bavail * st.f_frsize
+    disk_usage = psutil.disk_usage(mountpoint)
+    return disk_usage.used, disk_usage.free
+
+
+class MountTable:
+    def __init__(self, mountinfo: Optional[str] = MOUNTINFO_PATH, check_interval: float = 30.0):
+        self.mountinfo = mountinfo
+        # Delay between two readings of the partitions when mountinfo cannot be polled
+        self.check_interval = check_interval
+        self.mounts: List[Mount] = []
+        # Incremented when the table changes
+        self.generation = 0
+        self._fd = None
+        self._poll = None
+        self._checked_at = None
+        # Selected mounts of each exclude list, for the current generation
+        self._selected: Dict[Tuple[str, ...], List[Mount]] = {}
+        if mountinfo and os.path.exists(mountinfo) and hasattr(select, "poll"):
+            try:
+                self._fd = os.open(mountinfo, os.O_RDONLY)
+                self._poll = select.poll()
+                self._poll.register(self._fd, select.POLLPRI | select.POLLERR)
+            except OSError:
+                self.close()
+
+    def refresh(self) -> "MountTable":
+        if self._fd is not None:
+            # Without change, no event: the poll does not block and nothing is read
+            if self._checked_at is not None and not self._poll.poll(0):
+                return self
+            self._checked_at = time.monotonic()
+            try:
+                self.update(parse_mountinfo(self.read_mountinfo()))
+            except OSError:
+                # mountinfo cannot be read any more: fall back to the timer
+                self.close()
+            return self
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self
+        self._checked_at = now
+        try:
+            self.update(list_partitions())
+        except Exception:
+            pass
+        return self
+
+    def read_mountinfo(self) -> str:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        chunks = []
+        while True:
+            chunk = os.read(self._fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", "surrogateescape")
+
+    def update(self, mounts: List[Mount]):
+        self.mounts = mounts
+        self.generation += 1
+        self._selected = {}
+
+    def selected(self, exclude: Sequence[str] = ()) -> List[Mount]:
+        # Mounts whose filesystem type matches no exclude pattern, the first mount of each filesystem only
+        self.refresh()
+        key = tuple(exclude)
+        mounts = self._selected.get(key)
+        if mounts is None:
+            mounts = []
+            filesystems = set()
+            for mount in self.mounts:
+                if mount.filesystem in filesystems or any(
+                    fnmatch.fnmatchcase(mount.fstype, pattern) for pattern in exclude
+                ):
+                    continue
+                filesystems.add(mount.filesystem)
+                mounts.append(mount)
+            self._selected[key] = mounts
+        return mounts
+
+    def usage(self, exclude: Sequence[str] = ()) -> List[Tuple[Mount, int, int]]:
+        # (mount, used bytes, free bytes) of the selected mounts, the unreadable ones (e.g. no media) left out
+        result = []
+        for mount in self.selected(exclude):
+            try:
+                used, free = usage(mount.mountpoint)
+            except OSError:
+                continue
+            if used + free > 0:
+                result.append((mount, used, free))
+        return result
+
+    def close(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+        self._fd = None
+        self._poll = None
+
+
+# Mounted filesystems of the host, replaced by sensors_procfs.set_roots()
+MOUNTS = MountTable()
+
+
+class Mounts(sensors.Mounts):
+    @staticmethod
+    def collect(exclude: Sequence[str] = ()) -> sensors.MountsStats:
+        try:
+            usages = MOUNTS.usage(exclude)
+        except Exception:
+            return sensors.MountsStats()
+        return sensors.MountsStats(
+            [
+                sensors.MountStats(mount.mountpoint, mount.device, mount.fstype, used, free)
+                for mount, used, free in usages
+            ]
+        )
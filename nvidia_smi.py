@@ -0,0 +1,197 @@
+# coding:utf-8
+# Streaming Nvidia GPU collector: one long-lived "nvidia-smi -lms" child process is parsed on a reader thread,
+# so reading the GPU stats never forks nor blocks the main loop
+import atexit
+import os
+import platform
+import shutil
+import subprocess
+import threading
+import time
+from typing import List, Optional
+
+from log import logger
+
+QUERY_FIELDS = (
+    "index",
+    "name",
+    "uuid",
+    "utilization.gpu",
+    "memory.used",
+    "memory.total",
+    "temperature.gpu",
+    "fan.speed",
+    "clocks.gr",
+)
+
+
+def find_nvidia_smi() -> Optional[str]:
+    nvidia_smi = shutil.which("nvidia-smi")
+    if nvidia_smi is None and platform.system() == "Windows":
+        # Same fallback location as GPUtil
+        nvidia_smi = "%s\\Program Files\\NVIDIA Corporation\\NVSMI\\nvidia-smi.exe" % os.environ.get(
+            "systemdrive", "C:"
+        )
+        if not os.path.isfile(nvidia_smi):
+            nvidia_smi = None
+    return nvidia_smi
+
+
+def parse_number(value: str) -> float:
+    # "[N/A]", "[Not Supported]"... are reported as -1
+    try:
+        return float(value)
+    except ValueError:
+        return -1
+
+
+class NvidiaGpu:
+    __slots__ = (
+        "index",
+        "name",
+        "uuid",
+        "load",  # %
+        "memory_used",  # Mb
+        "memory_total",  # Mb
+        "temperature",  # °C
+        "fan_speed",  # %
+        "clock",  # MHz
+    )
+
+    def __init__(self, line: str):
+        fields = [field.strip() for field in line.split(",")]
+        if len(fields) != len(QUERY_FIELDS):
+            raise ValueError("Unexpected nvidia-smi line: %r" % line)
+        self.index = int(fields[0])
+        self.name = fields[1]
+        self.uuid = fields[2]
+        self.load = parse_number(fields[3])
+        self.memory_used = parse_number(fields[4])
+        self.memory_total = parse_number(fields[5])
+        self.temperature = parse_number(fields[6])
+        self.fan_speed = parse_number(fields[7])
+        self.clock = parse_number(fields[8])
+
+
+class NvidiaSmiStream:
+    # Delay before restarting a dead nvidia-smi child, doubled after each quick failure
+    MIN_RESTART_DELAY = 1
+    MAX_RESTART_DELAY = 30
+
+    def __init__(self, interval: float = 0.5, executable: str = None):
+        self.interval = interval
+        self.executable = executable or find_nvidia_smi()
+        # Latest complete sample, one row per GPU. Replaced as a whole so readers never need a lock
+        self.gpus: List[NvidiaGpu] = []
+        self.updated_at = None
+        self.restarts = 0
+        self._batch = []
+        self._gpu_count = 0
+        self._process = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+
+    def command(self) -> List[str]:
+        return [
+            self.executable,
+            "--query-gpu=" + ",".join(QUERY_FIELDS),
+            "--format=csv,noheader,nounits",
+            "-lms",
+            str(max(int(self.interval * 1000), 1)),
+        ]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="nvidia-smi-reader", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stopping.set()
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait_ready(self, timeout: float) -> bool:
+        # Wait for the first complete sample
+        return self._ready.wait(timeout)
+
+    def latest(self) -> List[NvidiaGpu]:
+        # Latest sample, or nothing if the child stopped reporting for a while
+        max_age = max(self.interval * 10, 5)
+        if self.updated_at is None or time.monotonic() - self.updated_at > max_age:
+            return []
+        return self.gpus
+
+    def _publish(self):
+        self.gpus = self._batch
+        self.updated_at = time.monotonic()
+        self._batch = []
+        self._ready.set()
+
+    def _parse_line(self, line: str):
+        if not line.strip():
+            return
+        try:
+            gpu = NvidiaGpu(line)
+        except ValueError as e:
+            logger.debug(e)
+            return
+        # Each sample lists all the GPUs by index: a lower or same index starts a new sample
+        if self._batch and gpu.index <= self._batch[-1].index:
+            self._gpu_count = len(self._batch)
+            self._publish()
+        self._batch.append(gpu)
+        # Once the GPU count is known, publish as soon as a sample is complete
+        if len(self._batch) == self._gpu_count:
+            self._publish()
+
+    def _run(self):
+        delay = self.MIN_RESTART_DELAY
+        while not self._stopping.is_set():
+            started_at = time.monotonic()
+            try:
+                self._process = subprocess.Popen(
+                    self.command(),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    stdin=subprocess.DEVNULL,
+                    text=True,
+                    bufsize=1,
+                )
+            except OSError as e:
+                logger.error("Cannot start nvidia-smi: %s" % e)
+            else:
+                self._batch = []
+                self._gpu_count = 0
+                for line in self._process.stdout:
+                    self._parse_line(line)
+                self._process.wait()
+                if self._stopping.is_set():
+                    break
+                logger.warning(
+                    "nvidia-smi exited with code %s, restarting it"
+                    % self._process.returncode
+                )
+                self.restarts += 1
+
+            # The child ran for a while: it is not a crash loop, restart it quickly
+            if time.monotonic() - started_at > self.MAX_RESTART_DELAY:
+                delay = self.MIN_RESTART_DELAY
+            self._stopping.wait(delay)
+            delay = min(delay * 2, self.MAX_RESTART_DELAY)
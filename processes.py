@@ -0,0 +1,188 @@
+# coding:utf-8
+# Top processes by CPU, resident memory or I/O, from a table of psutil.Process kept across samples
+# A process is only set up when its PID first appears (name and first CPU times, inside oneshot()); then every
+# sample only reads the CPU times and the sort key of all the processes: one or two files per process on Linux.
+# The other attributes are only read for the top processes, selected with a bounded heap (heapq.nlargest)
+# instead of a full sort. A PID may be reused by a new process between two samples: CPU times going down give it
+# away, and the identity of the top processes (PID + creation time) is checked before they are returned.
+# Processes are listed with psutil in every backend: the Processes collector and its table are shared.
+import heapq
+import operator
+import time
+from contextlib import nullcontext
+from typing import Dict, List
+
+import psutil
+
+import sensors
+
+# Sort key name -> ranked attribute of the entries
+SORT_KEYS = {
+    "cpu": operator.attrgetter("cpu_percent"),
+    "rss": operator.attrgetter("rss"),
+    "io": operator.attrgetter("io"),
+}
+
+
+class ProcessEntry:
+    __slots__ = (
+        "process",
+        "pid",
+        "name",
+        "cpu_before",
+        "cpu_percent",
+        "rss",
+        "read_rate",
+        "write_rate",
+        "io",
+        "io_before",
+        "io_sampled_at",
+    )
+
+    def __init__(self, process: psutil.Process):
+        self.process = process
+        self.pid = process.pid
+        self.name = ""
+        # User + system CPU seconds at the previous sample
+        self.cpu_before = None
+        self.cpu_percent = 0.0
+        self.rss = -1
+        # Bytes read and written per second and their sum, from the counters of the previous reading
+        self.read_rate = -1.0
+        self.write_rate = -1.0
+        self.io = -1.0
+        self.io_before = None
+        self.io_sampled_at = None
+
+    def read_io(self, now: float):
+        # Rates since the previous reading of this process, 0 the first time. Not available on macOS
+        counters = self.process.io_counters()
+        self.read_rate = self.write_rate = 0.0
+        if self.io_before is not None and now > self.io_sampled_at:
+            elapsed = now - self.io_sampled_at
+            self.read_rate = max(counters.read_bytes - self.io_before[0], 0) / elapsed
+            self.write_rate = max(counters.write_bytes - self.io_before[1], 0) / elapsed
+        self.io_before = counters.read_bytes, counters.write_bytes
+        self.io_sampled_at = now
+        self.io = self.read_rate + self.write_rate
+
+
+class ProcessTable:
+    def __init__(self):
+        self.entries: Dict[int, ProcessEntry] = {}
+        # Monotonic time of the previous sample
+        self.sampled_at = None
+
+    def add(self, pid: int):
+        # Full setup of a new PID, or of a reused one (replaces its entry): name and CPU times come from the same
+        # file on Linux
+        try:
+            entry = ProcessEntry(psutil.Process(pid))
+            with entry.process.oneshot():
+                entry.name = entry.process.name()
+                times = entry.process.cpu_times()
+        except psutil.Error:
+            return
+        entry.cpu_before = times.user + times.system
+        self.entries[pid] = entry
+
+    def renew(self, pid: int):
+        # The PID is not the process of its entry any more: a new entry if it was reused, none if it is gone
+        del self.entries[pid]
+        self.add(pid)
+
+    def sample(self, sort: str = "cpu"):
+        # Update the cache with the current PIDs, then read the CPU times and the sort key of every process
+        pids = set(psutil.pids())
+        # PID 0 is not a process: the idle time of every CPU on Windows ("System Idle Process"), up to 100% per
+        # CPU, would always lead the ranking
+        pids.discard(0)
+        for pid in self.entries.keys() - pids:
+            del self.entries[pid]
+        now = time.monotonic()
+        elapsed = now - self.sampled_at if self.sampled_at is not None else 0
+        self.sampled_at = now
+        for pid in pids - self.entries.keys():
+            self.add(pid)
+        gone = []
+        reused = []
+        for pid, entry in self.entries.items():
+            try:
+                # oneshot() costs more than it saves for a single attribute, and on Linux the CPU times,
+                # memory and I/O counters are read from different files anyway
+                with nullcontext() if sort == "cpu" or psutil.LINUX else entry.process.oneshot():
+                    times = entry.process.cpu_times()
+                    if sort == "rss":
+                        entry.rss = entry.process.memory_info().rss
+                    elif sort == "io" and hasattr(entry.process, "io_counters"):
+                        entry.read_io(now)
+                # Always read, so that the CPU delta is relative to the previous sample. Like psutil's
+                # cpu_percent(), in % of one CPU
+                cpu = times.user + times.system
+                if cpu < entry.cpu_before:
+                    # CPU times never go down: another process with the same PID
+                    reused.append(pid)
+                    continue
+                entry.cpu_percent = round((cpu - entry.cpu_before) / elapsed * 100, 1) if elapsed > 0 else 0.0
+                entry.cpu_before = cpu
+            except psutil.NoSuchProcess:
+                gone.append(pid)
+            except psutil.Error:
+                # Access denied: not ranked on this key
+                pass
+        for pid in gone:
+            del self.entries[pid]
+        for pid in reused:
+            self.renew(pid)
+
+    def top(self, limit: int, sort: str = "cpu") -> List[ProcessEntry]:
+        # The limit first processes, their remaining attributes read now
+        now = time.monotonic()
+        while True:
+            selected = heapq.nlargest(limit, self.entries.values(), key=SORT_KEYS[sort])
+            # A PID reused since the previous sample with more CPU time, memory or I/O than its former process:
+            # ranked with the values of two processes and under the old name. Renewed, then selected again
+            stale = [entry.pid for entry in selected if not entry.process.is_running()]
+            if not stale:
+                break
+            for pid in stale:
+                self.renew(pid)
+        result = []
+        for entry in selected:
+            try:
+                with entry.process.oneshot():
+                    if sort != "rss":
+                        entry.rss = entry.process.memory_info().rss
+                    if sort != "io" and hasattr(entry.process, "io_counters"):
+                        # Rates over the time since this process was last in the top, 0 when it just entered it
+                        entry.read_io(now)
+            except psutil.NoSuchProcess:
+                continue
+            except psutil.Error:
+                pass
+            result.append(entry)
+        return result
+
+
+# psutil.Process of every running process, kept across samples for the CPU deltas
+PROCESSES = ProcessTable()
+
+
+class Processes(sensors.Processes):
+    @staticmethod
+    def collect(limit: int = 10, sort: str = "cpu") -> sensors.ProcessesStats:
+        try:
+            PROCESSES.sample(sort)
+            top = PROCESSES.top(limit, sort)
+        except Exception:
+            return sensors.ProcessesStats()
+        return sensors.ProcessesStats(
+            len(PROCESSES.entries),
+            sort,
+            [
+                sensors.ProcessStats(
+                    entry.pid, entry.name, entry.cpu_percent, entry.rss, entry.read_rate, entry.write_rate
+                )
+                for entry in top
+            ],
+        )
@@ -0,0 +1,131 @@
+# coding:utf-8
+# Rollups: running min / max / sum / count of every numeric field per time bucket, at several resolutions
+# (e.g. 1s -> 1m -> 1h). Only the first tier sees the samples, each following tier is fed with the closed
+# buckets of the previous one: the cost per sample does not depend on the number of tiers or of samples kept
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from serializers import flatten
+from tslog import TimeSeriesLog
+
+# min, max, sum, count
+Aggregate = List[float]
+
+
+class RollupTier:
+    def __init__(self, resolution: float, retention: float, log: Optional[TimeSeriesLog] = None):
+        self.resolution = resolution  # Bucket duration, in seconds
+        self.retention = retention  # In seconds
+        # Start time of the bucket being filled, and its aggregates per field
+        self.start = None
+        self.aggregates: Dict[str, Aggregate] = {}
+        # Closed buckets kept in memory: (start time, {field: (min, max, sum, count)})
+        self.closed = deque(maxlen=max(int(retention // resolution), 1))
+        self.log = log
+
+    def add(self, timestamp: float, values: Dict[str, Aggregate]) -> Optional[Tuple[float, Dict[str, Aggregate]]]:
+        # Merge aggregates in the bucket of the timestamp, return the bucket closed by it if any
+        bucket = timestamp // self.resolution * self.resolution
+        closed = None
+        if self.start is None:
+            self.start = bucket
+        elif bucket > self.start:
+            closed = self.close()
+            self.start = bucket
+        aggregates = self.aggregates
+        for name, (low, high, total, count) in values.items():
+            aggregate = aggregates.get(name)
+            if aggregate is None:
+                aggregates[name] = [low, high, total, count]
+            else:
+                if low < aggregate[0]:
+                    aggregate[0] = low
+                if high > aggregate[1]:
+                    aggregate[1] = high
+                aggregate[2] += total
+                aggregate[3] += count
+        return closed
+
+    def close(self) -> Optional[Tuple[float, Dict[str, Aggregate]]]:
+        if not self.aggregates:
+            return None
+        bucket = (self.start, self.aggregates)
+        self.closed.append(bucket)
+        self.aggregates = {}
+        if self.log is not None:
+            self.log.append(
+                bucket[0],
+                {
+                    name: {"min": low, "max": high, "mean": total / count, "count": count}
+                    for name, (low, high, total, count) in bucket[1].items()
+                },
+            )
+        return bucket
+
+    def query(self, name: str, since: Optional[float] = None) -> Dict[str, Any]:
+        # Closed buckets of a field, oldest first
+        result = {"resolution": self.resolution, "field": name, "times": [], "min": [], "max": [], "mean": [], "count": []}
+        for start, aggregates in list(self.closed):
+            if since is not None and start + self.resolution <= since:
+                continue
+            aggregate = aggregates.get(name)
+            if aggregate is None:
+                continue
+            low, high, total, count = aggregate
+            result["times"].append(start)
+            result["min"].append(low)
+            result["max"].append(high)
+            result["mean"].append(total / count)
+            result["count"].append(count)
+        return result
+
+
+class Rollups:
+    def __init__(self, tiers: List[Tuple[float, float]], directory: str = "", batch: int = 20):
+        # tiers: (resolution, retention) in seconds, by increasing resolution, each a multiple of the previous one.
+        # With a directory, closed buckets are also appended to a time-series log per tier
+        self.tiers = []
+        for resolution, retention in tiers:
+            log = None
+            if directory:
+                # Segments of a quarter of the retention: between 1 and 1.25 times the retention is kept on disk
+                log = TimeSeriesLog(
+                    os.path.join(directory, "rollup-%gs" % resolution),
+                    segment_seconds=max(retention / 4, resolution),
+                    batch=batch if resolution < 60 else 1,
+                    keep=5,
+                )
+            self.tiers.append(RollupTier(resolution, retention, log))
+        # Same threads as history.History.lock
+        self.lock = threading.Lock()
+
+    def append(self, timestamp: float, data: Dict[str, Any]):
+        values = {
+            name: (value, value, value, 1)
+            for name, value in flatten(data)
+            if isinstance(value, (int, float))
+        }
+        with self.lock:
+            bucket = (timestamp, values)
+            for tier in self.tiers:
+                bucket = tier.add(*bucket)
+                if bucket is None:
+                    break
+
+    def tier(self, resolution: float) -> RollupTier:
+        for tier in self.tiers:
+            if tier.resolution == resolution:
+                return tier
+        raise KeyError(resolution)
+
+    def query(self, resolution: float, name: str, since: Optional[float] = None) -> Dict[str, Any]:
+        with self.lock:
+            return self.tier(resolution).query(name, since)
+
+    def close(self):
+        with self.lock:
+            for tier in self.tiers:
+                if tier.log is not None:
+                    tier.log.close()
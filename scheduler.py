@@ -0,0 +1,75 @@
+# coding:utf-8
+# Main loop scheduling: each collector has its own period, and its ticks are planned on absolute deadlines
+# kept in a priority queue, so the collection and write time does not add up to the periods and does not drift
+import heapq
+import time
+from typing import Dict, List, Tuple
+
+from sensors import Stats
+
+
+class TickInfo(Stats):
+    __slots__ = ("sequence", "time", "monotonic", "missed_ticks")
+
+    def __init__(self, sequence: int, wall_time: float, monotonic: float, missed_ticks: int):
+        self.sequence = sequence
+        self.time = wall_time  # Unix timestamp, in seconds
+        self.monotonic = monotonic  # time.monotonic(), in seconds
+        self.missed_ticks = missed_ticks  # Total of ticks skipped because the loop was late
+
+
+class MultiRateScheduler:
+    def __init__(self, periods: Dict[str, float], align: bool = False):
+        # Period of each collector, in seconds
+        self.periods = periods
+        # Align the ticks on wall clock multiples of the periods (e.g. every full second)
+        self.align = align
+        self.sequence = 0
+        self.missed_ticks = 0
+        # (deadline, registration order, collector name)
+        self.queue: List[Tuple[float, int, str]] = []
+
+    def clock(self) -> float:
+        if self.align:
+            # Wall clock, so that NTP adjustments are followed
+            return time.time()
+        return time.monotonic()
+
+    def reset(self, now: float):
+        self.queue = []
+        for order, (name, period) in enumerate(self.periods.items()):
+            if self.align:
+                deadline = (now // period + 1) * period
+            else:
+                deadline = now
+            self.queue.append((deadline, order, name))
+        heapq.heapify(self.queue)
+
+    def wait(self) -> Tuple[TickInfo, List[str]]:
+        # Sleep until the next deadline, return the info of the tick starting now and the collectors due
+        now = self.clock()
+        if not self.queue:
+            self.reset(now)
+        else:
+            deadline, _, name = self.queue[0]
+            if deadline - now > self.periods[name]:
+                # The wall clock went back: restart from now
+                self.reset(now)
+
+        deadline = self.queue[0][0]
+        if now < deadline:
+            time.sleep(deadline - now)
+            now = self.clock()
+
+        due = []
+        while self.queue and self.queue[0][0] <= now:
+            deadline, order, name = heapq.heappop(self.queue)
+            period = self.periods[name]
+            # Late by one or more full periods: skip the missed ticks instead of running them in a burst
+            missed = int((now - deadline) // period)
+            self.missed_ticks += missed
+            heapq.heappush(self.queue, (deadline + (missed + 1) * period, order, name))
+            due.append(name)
+
+        self.sequence += 1
+        return TickInfo(self.sequence, time.time(), time.monotonic(), self.missed_ticks), due
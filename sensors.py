@@ -1,6 +1,705 @@
 # coding:utf-8
+import fnmatch
+import operator
+import time
+from itertools import repeat
 from abc import ABC, abstractmethod
-from typing import Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from log import logger
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Snapshot records: one record per subsystem, filled from a single underlying query so that
+# all the fields of a record describe the same moment (used + free == total)
+class Stats:
+    __slots__ = ()
+
+    def as_dict(self) -> dict:
+        # Keys are emitted in __slots__ order, which is the order of the output file. Nested records become dicts
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, Stats):
+                value = value.as_dict()
+            elif isinstance(value, list):
+                value = [item.as_dict() if isinstance(item, Stats) else item for item in value]
+            data[name] = value
+        return data
+
+    def __repr__(self):
+        return "%s(%s)" % (
+            type(self).__name__,
+            ", ".join("%s=%r" % (name, getattr(self, name)) for name in self.__slots__),
+        )
+
+
+class CpuStats(Stats):
+    __slots__ = ("percentage", "frequency", "temperature", "fan_rpm")
+
+    def __init__(
+        self,
+        percentage: float = -1,  # %
+        frequency: float = -1,  # GHz
+        temperature: float = -1,  # °C
+        fan_rpm: float = -1,
+    ):
+        self.percentage = percentage
+        self.frequency = frequency
+        self.temperature = temperature
+        self.fan_rpm = fan_rpm
+
+
+class CpuCoreStats(Stats):
+    __slots__ = ("index", "percentage", "iowait", "steal", "frequency")
+
+    def __init__(
+        self,
+        index: int = -1,  # Logical CPU number
+        percentage: float = -1,  # Busy time (%)
+        iowait: float = -1,  # Idle time waiting for I/O (%)
+        steal: float = -1,  # Time taken by the hypervisor (%)
+        frequency: float = -1,  # GHz
+    ):
+        self.index = index
+        self.percentage = percentage
+        self.iowait = iowait
+        self.steal = steal
+        self.frequency = frequency
+
+
+class CpuCoresStats(Stats):
+    __slots__ = ("count", "cores")
+
+    def __init__(self, cores: List[CpuCoreStats] = None):
+        self.cores = cores if cores is not None else []
+        self.count = len(self.cores)
+
+
+class GpuDeviceStats(Stats):
+    __slots__ = (
+        "index",
+        "name",
+        "uuid",
+        "load",
+        "percentage",
+        "total",
+        "used",
+        "free",
+        "temperature",
+        "fan_speed",
+        "fan_rpm",
+        "frequency",
+    )
+
+    def __init__(
+        self,
+        index: int = -1,
+        name: str = "",
+        uuid: str = "",  # UUID, PCI bus id or backend identifier: stable across restarts
+        load: float = -1,  # %
+        percentage: float = -1,  # used mem (%)
+        total: float = -1,  # total mem (Mb)
+        used: float = -1,  # used mem (Mb)
+        temperature: float = -1,  # °C
+        fan_speed: float = -1,  # %
+        fan_rpm: float = -1,
+        frequency: float = -1,  # GHz
+    ):
+        self.index = index
+        self.name = name
+        self.uuid = uuid
+        self.load = load
+        self.percentage = percentage
+        self.total = total
+        self.used = used
+        self.free = total - used
+        self.temperature = temperature
+        self.fan_speed = fan_speed
+        self.fan_rpm = fan_rpm
+        self.frequency = frequency
+
+
+def gpu_average(devices: List[GpuDeviceStats]) -> Tuple[float, float, float, float, float]:
+    # Aggregate view of all the GPUs: mean load / used mem (%) / used mem (Mb) / total mem (Mb) / temp (°C)
+    if not devices:
+        return -1, -1, -1, -1, -1
+    count = len(devices)
+    load = sum(device.load for device in devices) / count
+    used = sum(device.used for device in devices) / count
+    total = sum(device.total for device in devices) / count
+    temperature = sum(device.temperature for device in devices) / count
+    try:
+        percentage = used / total * 100
+    except ZeroDivisionError:
+        percentage = -1
+    return load, percentage, used, total, temperature
+
+
+class GpuStats(Stats):
+    # Aggregate of all the GPUs, and the detail of each one in devices
+    __slots__ = (
+        "is_available",
+        "fan_rpm",
+        "load",
+        "percentage",
+        "total",
+        "used",
+        "free",
+        "temperature",
+        "devices",
+    )
+
+    def __init__(
+        self,
+        is_available: bool = False,
+        fan_rpm: float = -1,
+        load: float = -1,  # %
+        percentage: float = -1,  # used mem (%)
+        total: float = -1,  # total mem (Mb)
+        used: float = -1,  # used mem (Mb)
+        temperature: float = -1,  # °C
+        devices: List[GpuDeviceStats] = None,
+    ):
+        self.is_available = is_available
+        self.fan_rpm = fan_rpm
+        self.load = load
+        self.percentage = percentage
+        self.total = total
+        self.used = used
+        self.free = total - used
+        self.temperature = temperature
+        self.devices = devices if devices is not None else []
+
+
+class MemoryStats(Stats):
+    __slots__ = ("percentage", "used", "free", "total", "swap_percent", "swap_used", "swap_free")
+
+    def __init__(
+        self,
+        percentage: float = -1,  # %
+        used: int = -1,  # In bytes
+        free: int = -1,  # In bytes
+        swap_percent: float = -1,  # %
+        swap_used: int = -1,  # In bytes
+        swap_free: int = -1,  # In bytes
+    ):
+        self.percentage = percentage
+        self.used = used
+        self.free = free
+        self.total = used + free
+        self.swap_percent = swap_percent
+        self.swap_used = swap_used
+        self.swap_free = swap_free
+
+
+class DiskStats(Stats):
+    __slots__ = ("percentage", "used", "free", "total")
+
+    def __init__(
+        self,
+        percentage: float = -1,  # %
+        used: int = -1,  # In bytes
+        free: int = -1,  # In bytes
+    ):
+        self.percentage = percentage
+        self.used = used
+        self.free = free
+        self.total = used + free
+
+
+class MountStats(Stats):
+    __slots__ = ("mountpoint", "device", "fstype", "percentage", "used", "free", "total")
+
+    def __init__(
+        self,
+        mountpoint: str = "",
+        device: str = "",
+        fstype: str = "",
+        used: int = -1,  # In bytes
+        free: int = -1,  # In bytes
+    ):
+        self.mountpoint = mountpoint
+        self.device = device
+        self.fstype = fstype
+        self.percentage = round(used / (used + free) * 100, 1) if used + free > 0 else -1
+        self.used = used
+        self.free = free
+        self.total = used + free
+
+
+class MountsStats(Stats):
+    __slots__ = ("count", "percentage", "used", "free", "total", "mounts")
+
+    def __init__(self, mounts: List[MountStats] = None):
+        self.mounts = mounts if mounts is not None else []
+        self.count = len(self.mounts)
+        # All the selected mounts
+        self.used = sum(mount.used for mount in self.mounts) if self.mounts else -1
+        self.free = sum(mount.free for mount in self.mounts) if self.mounts else -1
+        self.total = self.used + self.free if self.mounts else -1
+        self.percentage = round(self.used / self.total * 100, 1) if self.mounts and self.total > 0 else -1
+
+
+class NetStats(Stats):
+    __slots__ = ("upload_rate", "uploaded", "download_rate", "downloaded")
+
+    def __init__(
+        self,
+        upload_rate: float = -1,  # B/s
+        uploaded: int = -1,  # B
+        download_rate: float = -1,  # B/s
+        downloaded: int = -1,  # B
+    ):
+        self.upload_rate = upload_rate
+        self.uploaded = uploaded
+        self.download_rate = download_rate
+        self.downloaded = downloaded
+
+
+class DiskIODeviceStats(Stats):
+    __slots__ = (
+        "name",
+        "read_rate",
+        "write_rate",
+        "read_iops",
+        "write_iops",
+        "read_await",
+        "write_await",
+        "utilization",
+    )
+
+    def __init__(
+        self,
+        name: str = "",
+        read_rate: float = -1,  # B/s
+        write_rate: float = -1,  # B/s
+        read_iops: float = -1,  # Reads/s
+        write_iops: float = -1,  # Writes/s
+        read_await: float = -1,  # Mean time of a read, queue included (ms)
+        write_await: float = -1,  # Mean time of a write, queue included (ms)
+        utilization: float = -1,  # Time with I/O in progress (%)
+    ):
+        self.name = name
+        self.read_rate = read_rate
+        self.write_rate = write_rate
+        self.read_iops = read_iops
+        self.write_iops = write_iops
+        self.read_await = read_await
+        self.write_await = write_await
+        self.utilization = utilization
+
+
+READ_RATE = operator.attrgetter("read_rate")
+WRITE_RATE = operator.attrgetter("write_rate")
+READ_IOPS = operator.attrgetter("read_iops")
+WRITE_IOPS = operator.attrgetter("write_iops")
+
+
+class DiskIOStats(Stats):
+    __slots__ = ("count", "read_rate", "write_rate", "read_iops", "write_iops", "devices")
+
+    def __init__(self, devices: List[DiskIODeviceStats] = None):
+        self.devices = devices if devices is not None else []
+        self.count = len(self.devices)
+        # All the selected devices
+        self.read_rate = sum(map(READ_RATE, self.devices)) if self.devices else -1
+        self.write_rate = sum(map(WRITE_RATE, self.devices)) if self.devices else -1
+        self.read_iops = sum(map(READ_IOPS, self.devices)) if self.devices else -1
+        self.write_iops = sum(map(WRITE_IOPS, self.devices)) if self.devices else -1
+
+
+class ProcessStats(Stats):
+    __slots__ = ("pid", "name", "cpu_percent", "rss", "read_rate", "write_rate")
+
+    def __init__(
+        self,
+        pid: int = -1,
+        name: str = "",
+        cpu_percent: float = -1,  # % of one CPU: up to 100 times the number of CPUs
+        rss: int = -1,  # Resident memory, in bytes
+        read_rate: float = -1,  # B/s
+        write_rate: float = -1,  # B/s
+    ):
+        self.pid = pid
+        self.name = name
+        self.cpu_percent = cpu_percent
+        self.rss = rss
+        self.read_rate = read_rate
+        self.write_rate = write_rate
+
+
+class ProcessesStats(Stats):
+    __slots__ = ("count", "sort", "processes")
+
+    def __init__(self, count: int = -1, sort: str = "", processes: List[ProcessStats] = None):
+        self.count = count  # All the processes
+        self.sort = sort  # Ranking of the processes: cpu, rss or io
+        self.processes = processes if processes is not None else []
+
+
+class InterfaceStats(Stats):
+    __slots__ = (
+        "name",
+        "rx_bytes",
+        "tx_bytes",
+        "rx_rate",
+        "tx_rate",
+        "rx_packet_rate",
+        "tx_packet_rate",
+        "rx_error_rate",
+        "tx_error_rate",
+        "rx_drop_rate",
+        "tx_drop_rate",
+    )
+
+    def __init__(
+        self,
+        name: str = "",
+        rx_bytes: int = -1,  # B
+        tx_bytes: int = -1,  # B
+        rx_rate: float = -1,  # B/s
+        tx_rate: float = -1,  # B/s
+        rx_packet_rate: float = -1,  # /s
+        tx_packet_rate: float = -1,  # /s
+        rx_error_rate: float = -1,  # /s
+        tx_error_rate: float = -1,  # /s
+        rx_drop_rate: float = -1,  # /s
+        tx_drop_rate: float = -1,  # /s
+    ):
+        self.name = name
+        self.rx_bytes = rx_bytes
+        self.tx_bytes = tx_bytes
+        self.rx_rate = rx_rate
+        self.tx_rate = tx_rate
+        self.rx_packet_rate = rx_packet_rate
+        self.tx_packet_rate = tx_packet_rate
+        self.rx_error_rate = rx_error_rate
+        self.tx_error_rate = tx_error_rate
+        self.rx_drop_rate = rx_drop_rate
+        self.tx_drop_rate = tx_drop_rate
+
+
+RX_RATE = operator.attrgetter("rx_rate")
+TX_RATE = operator.attrgetter("tx_rate")
+
+
+class InterfacesStats(Stats):
+    __slots__ = ("count", "rx_rate", "tx_rate", "interfaces")
+
+    def __init__(self, interfaces: List[InterfaceStats] = None):
+        self.interfaces = interfaces if interfaces is not None else []
+        self.count = len(self.interfaces)
+        # All the selected interfaces, in B/s
+        self.rx_rate = sum(map(RX_RATE, self.interfaces)) if self.interfaces else -1
+        self.tx_rate = sum(map(TX_RATE, self.interfaces)) if self.interfaces else -1
+
+
+# Loopback and virtual (containers, VMs, tunnels, bridges) interfaces, skipped by default
+DEFAULT_INTERFACE_EXCLUDE = [
+    "lo",
+    "Loopback*",
+    "veth*",
+    "docker*",
+    "br-*",
+    "virbr*",
+    "vnet*",
+    "tap*",
+    "tun*",
+    "dummy*",
+    "ifb*",
+    "cni*",
+    "flannel*",
+    "cali*",
+    "vxlan*",
+    "kube-*",
+]
+
+
+class NameFilter:
+    def __init__(self, include: Sequence[str] = ("*",), exclude: Sequence[str] = ()):
+        # Glob patterns: a name is selected when it matches an include pattern and no exclude pattern
+        self.include = list(include) or ["*"]
+        self.exclude = list(exclude)
+        # Decision of every name seen, and the selected positions of the last list of names
+        self.decisions: Dict[str, bool] = {}
+        self.names = None
+        self.positions: List[int] = []
+
+    def selected(self, name: str) -> bool:
+        decision = self.decisions.get(name)
+        if decision is None:
+            decision = self.decisions[name] = any(
+                fnmatch.fnmatchcase(name, pattern) for pattern in self.include
+            ) and not any(fnmatch.fnmatchcase(name, pattern) for pattern in self.exclude)
+        return decision
+
+    def select(self, names: Sequence[str]) -> List[int]:
+        # Positions of the selected names, only recomputed when the names change
+        if names != self.names:
+            self.names = names
+            self.positions = [position for position, name in enumerate(names) if self.selected(name)]
+        return self.positions
+
+
+class InterfaceFilter(NameFilter):
+    def __init__(self, include: Sequence[str] = ("*",), exclude: Sequence[str] = DEFAULT_INTERFACE_EXCLUDE):
+        super().__init__(include, exclude)
+
+
+# Partitions (counted in their disk already), loop, RAM and optical devices, skipped by default
+DEFAULT_DEVICE_EXCLUDE = [
+    "loop*",
+    "ram*",
+    "zram*",
+    "sr*",
+    "fd*",
+    "sd*[0-9]",
+    "hd*[0-9]",
+    "vd*[0-9]",
+    "xvd*[0-9]",
+    "nvme*p*",
+    "mmcblk*p*",
+    "md*p*",
+]
+
+
+class DeviceFilter(NameFilter):
+    def __init__(self, include: Sequence[str] = ("*",), exclude: Sequence[str] = DEFAULT_DEVICE_EXCLUDE):
+        super().__init__(include, exclude)
+
+
+DEFAULT_DEVICE_FILTER = DeviceFilter()
+
+
+DEFAULT_INTERFACE_FILTER = InterfaceFilter()
+
+
+def default_interface(names: Sequence[str]) -> str:
+    # Interface watched by Net when none is configured: the first one not loopback or virtual
+    for name in names:
+        if DEFAULT_INTERFACE_FILTER.selected(name):
+            return name
+    return names[0] if names else ""
+
+
+# Counter columns of the per-interface samples
+INTERFACE_COUNTERS = (
+    "rx_bytes",
+    "rx_packets",
+    "rx_errors",
+    "rx_drops",
+    "tx_bytes",
+    "tx_packets",
+    "tx_errors",
+    "tx_drops",
+)
+
+
+# Largest increase per second of a counter that wrapped around: 10 Gb/s in bytes. 32-bit counters are only found
+# on old drivers and 32-bit kernels, they wrap after 4 GiB (3.4 s at this rate)
+MAX_WRAP_RATE = 10 * 1000**3 // 8
+
+
+def counter_deltas(after: Sequence[int], before: Sequence[int], elapsed: float) -> List[int]:
+    # Increase of each counter in elapsed seconds. A counter lower than before either wrapped around at 2**32
+    # (32-bit counters of some drivers) or was reset (device re-created, counting again from 0). It wrapped when
+    # it was near 2**32, so that the increase through the wrap is plausible for the elapsed time; else it was
+    # reset, and the increase is its current value
+    deltas = list(map(operator.sub, after, before))
+    if deltas and min(deltas) < 0:
+        max_wrapped = elapsed * MAX_WRAP_RATE
+        for index, delta in enumerate(deltas):
+            if delta < 0:
+                wrapped = delta + (1 << 32)
+                deltas[index] = wrapped if before[index] < (1 << 32) and wrapped <= max_wrapped else after[index]
+    return deltas
+
+
+def counter_increases(
+    names: Tuple[str, ...],
+    columns: List[Sequence[int]],
+    sampled_at: float,
+    before: Optional[tuple],
+    name_filter: NameFilter,
+) -> Tuple[Tuple[str, ...], List[Sequence[int]], List[List[int]], float, tuple]:
+    # names: all the devices of the sample, columns: one sequence of all the devices per counter.
+    # before: state returned by the previous call. Every column is processed in one C-level pass (map), whatever
+    # the number of devices. Returns the selected names, their counters and counter increases, the elapsed time
+    # since the previous sample and the state for the next call
+    positions = name_filter.select(names)
+    if len(positions) != len(names):
+        pick = operator.itemgetter(*positions) if positions else (lambda column: ())
+        names = tuple(names[position] for position in positions)
+        columns = [pick(column) for column in columns]
+        if len(positions) == 1:
+            columns = [(value,) for value in columns]
+    state = names, columns, sampled_at
+    # First sample: no increase
+    names_before, columns_before, sampled_before = before if before is not None else state
+    if names_before != names:
+        # Devices added or removed: align the previous counters, new devices start without increase
+        index_before = {name: index for index, name in enumerate(names_before)}
+        columns_before = [
+            [
+                column_before[index_before[name]] if name in index_before else value
+                for name, value in zip(names, column)
+            ]
+            for column, column_before in zip(columns, columns_before)
+        ]
+    elapsed = sampled_at - sampled_before
+    deltas = [
+        counter_deltas(column, column_before, elapsed) for column, column_before in zip(columns, columns_before)
+    ]
+    return names, columns, deltas, elapsed, state
+
+
+def interface_rates(
+    names: Tuple[str, ...],
+    columns: List[Sequence[int]],
+    sampled_at: float,
+    before: Optional[tuple],
+    interface_filter: InterfaceFilter,
+) -> Tuple[InterfacesStats, tuple]:
+    # columns: one per INTERFACE_COUNTERS, see counter_increases.
+    # Returns the stats of the selected interfaces and the state for the next call
+    names, columns, deltas, elapsed, state = counter_increases(
+        names, columns, sampled_at, before, interface_filter
+    )
+    if not names:
+        return InterfacesStats(), state
+    scale = (1 / elapsed if elapsed > 0 else 0.0).__mul__
+    rates = [list(map(scale, delta)) for delta in deltas]
+    rx_bytes, _, _, _, tx_bytes, _, _, _ = columns
+    rx_rate, rx_packets, rx_errors, rx_drops, tx_rate, tx_packets, tx_errors, tx_drops = rates
+    return (
+        InterfacesStats(
+            list(
+                map(
+                    InterfaceStats,
+                    names,
+                    rx_bytes,
+                    tx_bytes,
+                    rx_rate,
+                    tx_rate,
+                    rx_packets,
+                    tx_packets,
+                    rx_errors,
+                    tx_errors,
+                    rx_drops,
+                    tx_drops,
+                )
+            )
+        ),
+        state,
+    )
+
+
+def interfaces_from_psutil(before: Optional[tuple], interface_filter: InterfaceFilter) -> Tuple[InterfacesStats, tuple]:
+    # Interfaces of the psutil backends (sensors_python, LHM): before is the state of the previous call, see
+    # interface_rates. Returns the stats and the state for the next call
+    try:
+        # Counters wrapping around are already corrected by psutil (nowrap)
+        counters = psutil.net_io_counters(pernic=True)
+        sampled_at = time.monotonic()
+    except Exception:
+        return InterfacesStats(), before
+    if not counters:
+        return InterfacesStats(), before
+    # bytes_sent, bytes_recv, packets_sent, packets_recv, errin, errout, dropin, dropout
+    sent, received, packets_sent, packets_received, errors_in, errors_out, drops_in, drops_out = zip(
+        *counters.values()
+    )
+    columns = [received, packets_received, errors_in, drops_in, sent, packets_sent, errors_out, drops_out]
+    return interface_rates(tuple(counters), columns, sampled_at, before, interface_filter)
+
+
+# Counter columns of the per-device samples, times in ms. busy_time is not reported on all the platforms
+DISK_IO_COUNTERS = ("read_count", "write_count", "read_bytes", "write_bytes", "read_time", "write_time", "busy_time")
+
+
+def disk_io_rates(
+    names: Tuple[str, ...],
+    columns: List[Sequence[int]],
+    sampled_at: float,
+    before: Optional[tuple],
+    device_filter: DeviceFilter,
+    sector_size: int = 1,
+) -> Tuple[DiskIOStats, tuple]:
+    # columns: one per DISK_IO_COUNTERS (busy_time may be left out), see counter_increases. The read_bytes and
+    # write_bytes columns count units of sector_size bytes: sectors are only converted after the deltas, so that
+    # a wrap of a 32-bit sector counter is still seen as one.
+    # Returns the stats of the selected devices and the state for the next call
+    names, columns, deltas, elapsed, state = counter_increases(names, columns, sampled_at, before, device_filter)
+    if not names:
+        return DiskIOStats(), state
+    scale = (1 / elapsed if elapsed > 0 else 0.0).__mul__
+    bytes_scale = (sector_size / elapsed if elapsed > 0 else 0.0).__mul__
+    reads, writes, read_bytes, write_bytes, read_time, write_time = deltas[:6]
+    if len(deltas) > 6:
+        # Busy ms per elapsed ms, capped: the sampling time and the kernel accounting are not exactly aligned
+        busy_scale = (100 / (elapsed * 1000) if elapsed > 0 else 0.0).__mul__
+        utilization = map(min, map(busy_scale, deltas[6]), repeat(100.0))
+    else:
+        utilization = repeat(-1)
+    return (
+        DiskIOStats(
+            list(
+                map(
+                    DiskIODeviceStats,
+                    names,
+                    map(bytes_scale, read_bytes),
+                    map(bytes_scale, write_bytes),
+                    map(scale, reads),
+                    map(scale, writes),
+                    per_operation(read_time, reads),
+                    per_operation(write_time, writes),
+                    utilization,
+                )
+            )
+        ),
+        state,
+    )
+
+
+def disk_io_from_psutil(before: Optional[tuple], device_filter: DeviceFilter) -> Tuple[DiskIOStats, tuple]:
+    # Disk I/O of the psutil backends (sensors_python, LHM): before is the state of the previous call, see
+    # disk_io_rates. Returns the stats and the state for the next call
+    try:
+        # Counters wrapping around are already corrected by psutil (nowrap)
+        counters = psutil.disk_io_counters(perdisk=True)
+        sampled_at = time.monotonic()
+    except Exception:
+        return DiskIOStats(), before
+    if not counters:
+        return DiskIOStats(), before
+    # Fields depend on the platform: busy_time is only on Linux and FreeBSD
+    values = list(zip(*counters.values()))
+    fields = next(iter(counters.values()))._fields
+    columns = [values[fields.index(name)] for name in DISK_IO_COUNTERS if name in fields]
+    return disk_io_rates(tuple(counters), columns, sampled_at, before, device_filter)
+
+
+def per_operation(time_spent: List[int], operations: List[int]):
+    # Mean time of the operations completed, in ms. The time of an operation is counted when it completes:
+    # no operation, no time (0 ms)
+    return map(operator.truediv, time_spent, map(max, operations, repeat(1)))
+
+
+# Interface names already reported as missing: warned once, not at every tick
+MISSING_INTERFACES = set()
+
+
+def warn_missing_interface(if_name: str):
+    if if_name not in MISSING_INTERFACES:
+        MISSING_INTERFACES.add(if_name)
+        logger.warning(
+            "Network interface '%s' not found. Check names in config.yaml." % if_name
+        )
 
 
 class Cpu(ABC):
@@ -10,6 +709,11 @@ class Cpu(ABC):
 
         pass
 
+    @staticmethod
+    @abstractmethod
+    def collect() -> CpuStats:
+        pass
+
     @staticmethod
     @abstractmethod
     def frequency() -> float:
@@ -26,13 +730,86 @@ class Cpu(ABC):
         pass
 
 
+class CpuCores(ABC):
+    # Per logical CPU utilization and frequency, collected apart from Cpu: it can be large on big hosts
+    @staticmethod
+    @abstractmethod
+    def collect() -> CpuCoresStats:
+        pass
+
+
+class DiskIO(ABC):
+    # Throughput, IOPS, latency and utilization of the block devices selected by the filter, from a single sample
+    @staticmethod
+    @abstractmethod
+    def collect(device_filter: DeviceFilter = DEFAULT_DEVICE_FILTER) -> DiskIOStats:
+        pass
+
+
+class Processes(ABC):
+    # Top processes by CPU, resident memory or I/O. Scanning all the processes is costly on big hosts:
+    # this collector is meant to run at a slower period than the others
+    @staticmethod
+    @abstractmethod
+    def collect(limit: int = 10, sort: str = "cpu") -> ProcessesStats:
+        pass
+
+
+class Mounts(ABC):
+    # Space usage of every mounted filesystem whose type matches no exclude pattern, from a cached mount table
+    @staticmethod
+    @abstractmethod
+    def collect(exclude: Sequence[str] = ()) -> MountsStats:
+        pass
+
+
+class Interfaces(ABC):
+    # Counters of all the network interfaces taken from a single sample, rates of the ones selected by the filter
+    @staticmethod
+    @abstractmethod
+    def collect(interface_filter: InterfaceFilter = DEFAULT_INTERFACE_FILTER) -> InterfacesStats:
+        pass
+
+
 class Gpu(ABC):
+    # GPU detection is cached: it runs once at startup, then again every rediscover_interval seconds
+    # (to pick up hot-plugged GPUs, 0 to disable) or after max_read_failures consecutive failed readings
+    rediscover_interval = 60.0
+    max_read_failures = 3
+    # Sampling interval (seconds) for backends reading the GPU in background
+    sampling_interval = 0.5
+    detected_at = None
+    read_failures = 0
+
+    @classmethod
+    def detection_due(cls) -> bool:
+        if cls.detected_at is None or cls.read_failures >= cls.max_read_failures:
+            return True
+        return (
+            cls.rediscover_interval > 0
+            and time.monotonic() - cls.detected_at >= cls.rediscover_interval
+        )
+
+    @classmethod
+    def detection_done(cls):
+        cls.detected_at = time.monotonic()
+        cls.read_failures = 0
+
+    @classmethod
+    def reading_done(cls, success: bool):
+        cls.read_failures = 0 if success else cls.read_failures + 1
+
     @staticmethod
     @abstractmethod
     def stats() -> Tuple[
         float, float, float, float, float]:  # load (%) / used mem (%) / used mem (Mb) / total mem (Mb) / temp (°C)
         pass
 
+    @staticmethod
+    @abstractmethod
+    def devices() -> List[GpuDeviceStats]:  # One record per GPU, all filled from the same query
+        pass
+
     @staticmethod
     @abstractmethod
     def fps() -> int:
@@ -53,6 +830,11 @@ class Gpu(ABC):
     def is_available() -> bool:
         pass
 
+    @staticmethod
+    @abstractmethod
+    def collect() -> GpuStats:
+        pass
+
 
 class Memory(ABC):
     @staticmethod
@@ -75,6 +857,11 @@ class Memory(ABC):
     def virtual_free() -> int:  # In bytes
         pass
 
+    @staticmethod
+    @abstractmethod
+    def collect() -> MemoryStats:
+        pass
+
 
 class Disk(ABC):
     @staticmethod
@@ -92,6 +879,11 @@ class Disk(ABC):
     def disk_free() -> int:  # In bytes
         pass
 
+    @staticmethod
+    @abstractmethod
+    def collect() -> DiskStats:
+        pass
+
 
 class Net(ABC):
     @staticmethod
@@ -100,3 +892,8 @@ class Net(ABC):
         int, int, int, int]:  # up rate (B/s), uploaded (B), dl rate (B/s), downloaded (B)
         pass
 
+    @staticmethod
+    @abstractmethod
+    def collect(if_name="", interval=1) -> NetStats:
+        pass
+
@@ -2,15 +2,17 @@
 import ctypes
 import os
 import sys
-from statistics import mean
-from typing import Tuple
+from typing import List, Tuple
 
 import clr  # type: ignore # Clr is from pythonnet package. Do not install clr package
 import psutil
 from win32api import * # type: ignore
 
 import sensors as sensors
+from lhm_index import Metric, ResolvedSensors, Rule, SensorIndex
 from log import logger
+import mounts
+import processes
 from consts import EXEC_PATH
 # Import LibreHardwareMonitor dll to Python
 lhm_dll = EXEC_PATH + "\\external\\LibreHardwareMonitor\\LibreHardwareMonitorLib.dll"
@@ -72,6 +74,78 @@ for hardware in handle.Hardware:
         logger.info("Found Network interface: %s" % hardware.Name)
 
 
+# Sensors of each metric, resolved once per hardware instead of matching the sensor names at every reading.
+# Fallback chains are in order of preference
+CPU_SENSORS = SensorIndex(
+    {
+        "percentage": Metric([Rule(Hardware.SensorType.Load, prefix="CPU Total")]),
+        # Mean of the real core clocks, effective core clocks ignored (as in Windows Task Manager Performance tab)
+        "frequency": Metric(
+            [Rule(Hardware.SensorType.Clock, contains="Core #", excludes="Effective")], average=True
+        ),
+        # Average of all the cores, else the max core temperature, else the CPU Package temperature (usually
+        # same as max core temperature), else any sensor named "Core..."
+        "temperature": Metric(
+            [
+                Rule(Hardware.SensorType.Temperature, prefix="Core Average"),
+                Rule(Hardware.SensorType.Temperature, prefix="Core Max"),
+                Rule(Hardware.SensorType.Temperature, prefix="CPU Package"),
+                Rule(Hardware.SensorType.Temperature, prefix="Core"),
+            ]
+        ),
+    }
+)
+MOTHERBOARD_SENSORS = SensorIndex(
+    {
+        # Is Motherboard #2 Fan always the CPU Fan ?
+        "cpu_fan_rpm": Metric([Rule(Hardware.SensorType.Fan, contains="#2")]),
+    }
+)
+GPU_SENSORS = SensorIndex(
+    {
+        # Only use D3D usage if global "GPU Core" sensor is not available, because it is less
+        # precise and does not cover the entire GPU: https://www.hwinfo.com/forum/threads/what-is-d3d-usage.759/
+        "load": Metric(
+            [
+                Rule(Hardware.SensorType.Load, prefix="GPU Core"),
+                Rule(Hardware.SensorType.Load, prefix="D3D 3D"),
+            ],
+            default=0,
+            zero_falls_back=True,
+        ),
+        "used": Metric(
+            [
+                Rule(Hardware.SensorType.SmallData, prefix="GPU Memory Used"),
+                Rule(Hardware.SensorType.SmallData, prefix="D3D", suffix="Memory Used"),
+            ],
+            default=0,
+            zero_falls_back=True,
+        ),
+        "total": Metric([Rule(Hardware.SensorType.SmallData, prefix="GPU Memory Total")], default=0),
+        "temperature": Metric([Rule(Hardware.SensorType.Temperature, prefix="GPU Core")], default=0),
+        "fps": Metric([Rule(Hardware.SensorType.Factor, contains="FPS")]),
+        "fan_rpm": Metric([Rule(Hardware.SensorType.Fan)]),
+        # Real core clocks only, effective core clocks ignored
+        "frequency": Metric([Rule(Hardware.SensorType.Clock, contains="Core", excludes="Effective")]),
+    }
+)
+MEMORY_SENSORS = SensorIndex(
+    {
+        "percentage": Metric([Rule(Hardware.SensorType.Load, prefix="Memory")]),
+        "used": Metric([Rule(Hardware.SensorType.Data, prefix="Memory Used")]),
+        "free": Metric([Rule(Hardware.SensorType.Data, prefix="Memory Available")]),
+    }
+)
+NET_SENSORS = SensorIndex(
+    {
+        "uploaded": Metric([Rule(Hardware.SensorType.Data, prefix="Data Uploaded")], default=0),
+        "downloaded": Metric([Rule(Hardware.SensorType.Data, prefix="Data Downloaded")], default=0),
+        "upload_rate": Metric([Rule(Hardware.SensorType.Throughput, prefix="Upload Speed")], default=0),
+        "download_rate": Metric([Rule(Hardware.SensorType.Throughput, prefix="Download Speed")], default=0),
+    }
+)
+
+
 def get_hw_and_update(
     hwtype: Hardware.HardwareType, name: str = None
 ) -> Hardware.Hardware:
@@ -83,16 +157,26 @@ def get_hw_and_update(
     return None
 
 
-def get_gpu_name() -> str:
-    # Determine which GPU to use, in case there are multiple : try to avoid using discrete GPU for stats
-    hw_gpus = []
-    for hardware in handle.Hardware:
+def resolve_cpu() -> ResolvedSensors:
+    # Update the CPU hardware, and return its indexed sensors
+    return CPU_SENSORS.resolve(get_hw_and_update(Hardware.HardwareType.Cpu))
+
+
+def get_hw_gpus() -> list:
+    return [
+        hardware
+        for hardware in handle.Hardware
         if (
             hardware.HardwareType == Hardware.HardwareType.GpuNvidia
             or hardware.HardwareType == Hardware.HardwareType.GpuAmd
             or hardware.HardwareType == Hardware.HardwareType.GpuIntel
-        ):
-            hw_gpus.append(hardware)
+        )
+    ]
+
+
+def get_gpu_name() -> str:
+    # Determine which GPU to use, in case there are multiple : try to avoid using discrete GPU for stats
+    hw_gpus = get_hw_gpus()
 
     if len(hw_gpus) == 0:
         # No supported GPU found on the system
@@ -152,55 +236,44 @@ def get_gpu_name() -> str:
         return gpu_to_use
 
 
+# Network hardware by name, in the order of handle.Hardware: only rescanned when an interface is not found
+NET_INTERFACES = {}
+
+
 def get_net_interface_and_update(if_name: str = "") -> Hardware.Hardware:
-    for hardware in handle.Hardware:
-        if hardware.HardwareType == Hardware.HardwareType.Network:
-            if not if_name:  # 默认返回第一个网卡
-                hardware.Update()
-                return hardware
-            else:  # 返回指定名称的网卡
-                if hardware.Name == if_name:
-                    hardware.Update()
-                    return hardware
-    #
-    logger.warning(
-        "Network interface '%s' not found. Check names in config.yaml." % if_name
-    )
-    return None
+    if not NET_INTERFACES or (if_name and if_name not in NET_INTERFACES):
+        NET_INTERFACES.clear()
+        for hardware in handle.Hardware:
+            if hardware.HardwareType == Hardware.HardwareType.Network:
+                NET_INTERFACES[str(hardware.Name)] = hardware
+    if not if_name:  # 默认返回第一个非回环、非虚拟网卡
+        if_name = sensors.default_interface(list(NET_INTERFACES))
+    hardware = NET_INTERFACES.get(if_name)
+    if hardware is None:
+        sensors.warn_missing_interface(if_name)
+        return None
+    hardware.Update()
+    return hardware
 
 
 class Cpu(sensors.Cpu):
     @staticmethod
-    def percentage() -> float:
-        cpu = get_hw_and_update(Hardware.HardwareType.Cpu)
-        for sensor in cpu.Sensors:
-            if (
-                sensor.SensorType == Hardware.SensorType.Load
-                and str(sensor.Name).startswith("CPU Total")
-                and sensor.Value is not None
-            ):
-                return float(sensor.Value)
-
-        logger.error("CPU load cannot be read")
-        return -1
+    def percentage(resolved: ResolvedSensors = None) -> float:
+        if resolved is None:
+            resolved = resolve_cpu()
+        percentage = resolved.value("percentage")
+        if percentage == -1:
+            logger.error("CPU load cannot be read")
+        return percentage
 
     @staticmethod
-    def frequency() -> float:
-        frequencies = []
-        cpu = get_hw_and_update(Hardware.HardwareType.Cpu)
+    def frequency(resolved: ResolvedSensors = None) -> float:
+        if resolved is None:
+            resolved = resolve_cpu()
         try:
-            for sensor in cpu.Sensors:
-                if sensor.SensorType == Hardware.SensorType.Clock:
-                    # Keep only real core clocks, ignore effective core clocks
-                    if (
-                        "Core #" in str(sensor.Name)
-                        and "Effective" not in str(sensor.Name)
-                        and sensor.Value is not None
-                    ):
-                        frequencies.append(float(sensor.Value))
-            if frequencies:
-                # Take mean of all core clock as "CPU clock" (as it is done in Windows Task Manager Performance tab)
-                return mean(frequencies) / 1000
+            frequency = resolved.value("frequency")
+            if frequency != -1:
+                return frequency / 1000
         except:
             pass
 
@@ -208,41 +281,11 @@ class Cpu(sensors.Cpu):
         return -1
 
     @staticmethod
-    def temperature() -> float:
-        cpu = get_hw_and_update(Hardware.HardwareType.Cpu)
+    def temperature(resolved: ResolvedSensors = None) -> float:
+        if resolved is None:
+            resolved = resolve_cpu()
         try:
-            # By default, the average temperature of all CPU cores will be used
-            for sensor in cpu.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Temperature
-                    and str(sensor.Name).startswith("Core Average")
-                    and sensor.Value is not None
-                ):
-                    return float(sensor.Value)
-            # If not available, the max core temperature will be used
-            for sensor in cpu.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Temperature
-                    and str(sensor.Name).startswith("Core Max")
-                    and sensor.Value is not None
-                ):
-                    return float(sensor.Value)
-            # If not available, the CPU Package temperature (usually same as max core temperature) will be used
-            for sensor in cpu.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Temperature
-                    and str(sensor.Name).startswith("CPU Package")
-                    and sensor.Value is not None
-                ):
-                    return float(sensor.Value)
-            # Otherwise any sensor named "Core..." will be used
-            for sensor in cpu.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Temperature
-                    and str(sensor.Name).startswith("Core")
-                    and sensor.Value is not None
-                ):
-                    return float(sensor.Value)
+            return resolved.value("temperature")
         except:
             pass
 
@@ -254,23 +297,33 @@ class Cpu(sensors.Cpu):
         try:
             for sh in mb.SubHardware:
                 sh.Update()
-                for sensor in sh.Sensors:
-                    if (
-                        sensor.SensorType == Hardware.SensorType.Fan
-                        and "#2" in str(sensor.Name)
-                        and sensor.Value is not None
-                    ):  # Is Motherboard #2 Fan always the CPU Fan ?
-                        return float(sensor.Value)
+            # Sensors of the motherboard and of its sub-hardware (the fan controllers)
+            return MOTHERBOARD_SENSORS.resolve(mb).value("cpu_fan_rpm")
         except:
             pass
 
         # No Fan Speed sensor for this CPU model
         return -1
 
+    @staticmethod
+    def collect() -> sensors.CpuStats:
+        # Update the CPU hardware once and resolve its sensors once, then read them all from the same update
+        resolved = resolve_cpu()
+        return sensors.CpuStats(
+            percentage=Cpu.percentage(resolved),
+            frequency=Cpu.frequency(resolved),
+            temperature=Cpu.temperature(resolved),
+            fan_rpm=Cpu.fan_rpm(),
+        )
+
 
 class Gpu(sensors.Gpu):
-    # GPU to use is detected once, and its name is saved for future sensors readings
+    # GPU to use is detected once (then again when rediscovery is due, see sensors.Gpu),
+    # and its name and hardware are saved for future sensors readings
     gpu_name = ""
+    gpu_hardware = None
+    # All the GPUs, with their identifier, for the per-device stats
+    all_gpus = None
 
     # Latest FPS value is backed up in case next reading returns no value
     prev_fps = 0
@@ -278,6 +331,10 @@ class Gpu(sensors.Gpu):
     # Get GPU to use for sensors, and update it
     @classmethod
     def get_gpu_to_use(cls):
+        if cls.gpu_hardware is not None:
+            cls.gpu_hardware.Update()
+            return cls.gpu_hardware
+
         gpu_to_use = get_hw_and_update(Hardware.HardwareType.GpuAmd, cls.gpu_name)
         if gpu_to_use is None:
             gpu_to_use = get_hw_and_update(
@@ -286,69 +343,30 @@ class Gpu(sensors.Gpu):
         if gpu_to_use is None:
             gpu_to_use = get_hw_and_update(Hardware.HardwareType.GpuIntel, cls.gpu_name)
 
+        cls.gpu_hardware = gpu_to_use
         return gpu_to_use
 
     @classmethod
     def stats(
-        cls,
+        cls, gpu_to_use: Hardware.Hardware = None
     ) -> Tuple[
         float, float, float, float, float
     ]:  # load (%) / used mem (%) / used mem (Mb) / total mem (Mb) / temp (°C)
-        gpu_to_use = cls.get_gpu_to_use()
+        if gpu_to_use is None:
+            gpu_to_use = cls.get_gpu_to_use()
         if gpu_to_use is None:
             # GPU not supported
             return -1, -1, -1, -1, -1
 
-        load = 0
-        used_mem = 0
-        total_mem = 0
-        temp = 0
-        for sensor in gpu_to_use.Sensors:
-            if (
-                sensor.SensorType == Hardware.SensorType.Load
-                and str(sensor.Name).startswith("GPU Core")
-                and sensor.Value is not None
-            ):
-                load = float(sensor.Value)
-            elif (
-                sensor.SensorType == Hardware.SensorType.Load
-                and str(sensor.Name).startswith("D3D 3D")
-                and load == 0
-                and sensor.Value is not None
-            ):
-                # Only use D3D usage if global "GPU Core" sensor is not available, because it is less
-                # precise and does not cover the entire GPU: https://www.hwinfo.com/forum/threads/what-is-d3d-usage.759/
-                load = float(sensor.Value)
-            elif (
-                sensor.SensorType == Hardware.SensorType.SmallData
-                and str(sensor.Name).startswith("GPU Memory Used")
-                and sensor.Value is not None
-            ):
-                used_mem = float(sensor.Value)
-            elif (
-                sensor.SensorType == Hardware.SensorType.SmallData
-                and str(sensor.Name).startswith("D3D")
-                and str(sensor.Name).endswith("Memory Used")
-                and used_mem == 0
-                and sensor.Value is not None
-            ):
-                # Only use D3D memory usage if global "GPU Memory Used" sensor is not available, because it is less
-                # precise and does not cover the entire GPU: https://www.hwinfo.com/forum/threads/what-is-d3d-usage.759/
-                used_mem = float(sensor.Value)
-            elif (
-                sensor.SensorType == Hardware.SensorType.SmallData
-                and str(sensor.Name).startswith("GPU Memory Total")
-                and sensor.Value is not None
-            ):
-                total_mem = float(sensor.Value)
-            elif (
-                sensor.SensorType == Hardware.SensorType.Temperature
-                and str(sensor.Name).startswith("GPU Core")
-                and sensor.Value is not None
-            ):
-                temp = float(sensor.Value)
-
-        return load, (used_mem / total_mem * 100.0), used_mem, total_mem, temp
+        resolved = GPU_SENSORS.resolve(gpu_to_use)
+        load = resolved.value("load")
+        used_mem = resolved.value("used")
+        total_mem = resolved.value("total")
+        temp = resolved.value("temperature")
+        # No total memory sensor (e.g. integrated GPUs sharing the system memory): percentage not available
+        used_mem_percent = used_mem / total_mem * 100.0 if total_mem > 0 else -1
+
+        return load, used_mem_percent, used_mem, total_mem, temp
 
     @classmethod
     def fps(cls) -> int:
@@ -358,16 +376,12 @@ class Gpu(sensors.Gpu):
             return -1
 
         try:
-            for sensor in gpu_to_use.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Factor
-                    and "FPS" in str(sensor.Name)
-                    and sensor.Value is not None
-                ):
-                    # If a reading returns a value <= 0, returns old value instead
-                    if int(sensor.Value) > 0:
-                        cls.prev_fps = int(sensor.Value)
-                    return cls.prev_fps
+            fps = GPU_SENSORS.resolve(gpu_to_use).value("fps")
+            if fps != -1:
+                # If a reading returns a value <= 0, returns old value instead
+                if int(fps) > 0:
+                    cls.prev_fps = int(fps)
+                return cls.prev_fps
         except:
             pass
 
@@ -375,18 +389,14 @@ class Gpu(sensors.Gpu):
         return -1
 
     @classmethod
-    def fan_rpm(cls) -> float:
-        gpu_to_use = cls.get_gpu_to_use()
+    def fan_rpm(cls, gpu_to_use: Hardware.Hardware = None) -> float:
+        if gpu_to_use is None:
+            gpu_to_use = cls.get_gpu_to_use()
         if gpu_to_use is None:
             # GPU not supported
             return -1
         try:
-            for sensor in gpu_to_use.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Fan
-                    and sensor.Value is not None
-                ):
-                    return float(sensor.Value)
+            return GPU_SENSORS.resolve(gpu_to_use).value("fan_rpm")
         except:
             pass
 
@@ -394,22 +404,17 @@ class Gpu(sensors.Gpu):
         return -1
 
     @classmethod
-    def frequency(cls) -> float:
-        gpu_to_use = cls.get_gpu_to_use()
+    def frequency(cls, gpu_to_use: Hardware.Hardware = None) -> float:
+        if gpu_to_use is None:
+            gpu_to_use = cls.get_gpu_to_use()
         if gpu_to_use is None:
             # GPU not supported
             return -1
 
         try:
-            for sensor in gpu_to_use.Sensors:
-                if sensor.SensorType == Hardware.SensorType.Clock:
-                    # Keep only real core clocks, ignore effective core clocks
-                    if (
-                        "Core" in str(sensor.Name)
-                        and "Effective" not in str(sensor.Name)
-                        and sensor.Value is not None
-                    ):
-                        return float(sensor.Value) / 1000
+            frequency = GPU_SENSORS.resolve(gpu_to_use).value("frequency")
+            if frequency != -1:
+                return frequency / 1000
         except:
             pass
 
@@ -418,54 +423,114 @@ class Gpu(sensors.Gpu):
 
     @classmethod
     def is_available(cls) -> bool:
-        cls.gpu_name = get_gpu_name()
+        if cls.detection_due():
+            cls.gpu_name = get_gpu_name()
+            cls.gpu_hardware = None
+            cls.all_gpus = None
+            # GPUs may have been added or removed: their sensors are indexed again
+            GPU_SENSORS.invalidate()
+            cls.detection_done()
         return bool(cls.gpu_name)
 
+    @classmethod
+    def devices(cls, updated: Hardware.Hardware = None) -> List[sensors.GpuDeviceStats]:
+        # Every GPU is updated once (except the already updated one), then all its sensors are read
+        if cls.all_gpus is None:
+            cls.all_gpus = [(hardware, str(hardware.Identifier)) for hardware in get_hw_gpus()]
+        updated_identifier = str(updated.Identifier) if updated is not None else None
+        devices = []
+        for index, (hardware, identifier) in enumerate(cls.all_gpus):
+            try:
+                if identifier != updated_identifier:
+                    hardware.Update()
+                load, percentage, used, total, temperature = cls.stats(hardware)
+            except:
+                # GPU removed since last detection, or memory not reported
+                continue
+            devices.append(
+                sensors.GpuDeviceStats(
+                    index=index,
+                    name=str(hardware.Name),
+                    uuid=identifier,
+                    load=load,
+                    percentage=percentage,
+                    total=total,
+                    used=used,
+                    temperature=temperature,
+                    fan_rpm=cls.fan_rpm(hardware),
+                    frequency=cls.frequency(hardware),
+                )
+            )
+        return devices
+
+    @classmethod
+    def collect(cls) -> sensors.GpuStats:
+        is_available = cls.is_available()
+        # Update the GPU hardware once, and read all its sensors from the same update
+        try:
+            gpu_to_use = cls.get_gpu_to_use()
+        except:
+            # GPU removed since last detection
+            gpu_to_use = None
+        if is_available:
+            # Repeated failed readings trigger a new GPU detection
+            cls.reading_done(gpu_to_use is not None)
+        if gpu_to_use is None:
+            # GPU not supported
+            return sensors.GpuStats(is_available=is_available)
+
+        # Aggregate fields are the stats of the GPU to use, as before
+        load, percentage, used, total, temperature = cls.stats(gpu_to_use)
+        return sensors.GpuStats(
+            is_available=is_available,
+            fan_rpm=cls.fan_rpm(gpu_to_use),
+            load=load,
+            percentage=percentage,
+            total=total,
+            used=used,
+            temperature=temperature,
+            devices=cls.devices(gpu_to_use),
+        )
+
 
 class Memory(sensors.Memory):
 
     @staticmethod
     def percentage() -> float:
         memory = get_hw_and_update(Hardware.HardwareType.Memory)
-        for sensor in memory.Sensors:
-            if (
-                sensor.SensorType == Hardware.SensorType.Load
-                and str(sensor.Name).startswith("Memory")
-                and sensor.Value is not None
-            ):
-                return float(sensor.Value)
-
-        return -1
+        return MEMORY_SENSORS.resolve(memory).value("percentage")
 
     @staticmethod
     def used() -> int:  # In bytes
         memory = get_hw_and_update(Hardware.HardwareType.Memory)
-        for sensor in memory.Sensors:
-            if (
-                sensor.SensorType == Hardware.SensorType.Data
-                and str(sensor.Name).startswith("Memory Used")
-                and sensor.Value is not None
-            ):
-                return int(sensor.Value * 1000000000.0)
-
-        return -1
+        used = MEMORY_SENSORS.resolve(memory).value("used")
+        return int(used * 1000000000.0) if used != -1 else -1
 
     @staticmethod
     def free() -> int:  # In bytes
         memory = get_hw_and_update(Hardware.HardwareType.Memory)
-        for sensor in memory.Sensors:
-            if (
-                sensor.SensorType == Hardware.SensorType.Data
-                and str(sensor.Name).startswith("Memory Available")
-                and sensor.Value is not None
-            ):
-                return int(sensor.Value * 1000000000.0)
+        free = MEMORY_SENSORS.resolve(memory).value("free")
+        return int(free * 1000000000.0) if free != -1 else -1
 
-        return -1
+    @staticmethod
+    def collect() -> sensors.MemoryStats:
+        # Update the memory hardware once, and read its indexed sensors
+        memory = get_hw_and_update(Hardware.HardwareType.Memory)
+        resolved = MEMORY_SENSORS.resolve(memory)
+        percentage = resolved.value("percentage")
+        used = resolved.value("used")
+        free = resolved.value("free")
+        used = int(used * 1000000000.0) if used != -1 else -1
+        free = int(free * 1000000000.0) if free != -1 else -1
+
+        return sensors.MemoryStats(percentage=percentage, used=used, free=free)
 
 
 # NOTE: all disk data are fetched from psutil Python library, because LHM does not have it.
 # This is because LHM is a hardware-oriented library, whereas used/free/total space is for partitions, not disks
+# The partitions are listed again every MountTable.check_interval seconds (mounts.MOUNTS), not at every tick
+
+
 class Disk(sensors.Disk):
     @staticmethod
     def percentage() -> float:
@@ -473,17 +538,43 @@ class Disk(sensors.Disk):
 
     @staticmethod
     def used() -> int:  # In bytes
-        used = 0
-        for part in psutil.disk_partitions():
-            used += psutil.disk_usage(part.mountpoint).used
-        return used
+        return Disk.collect().used
 
     @staticmethod
     def free() -> int:  # In bytes
+        return Disk.collect().free
+
+    @staticmethod
+    def collect() -> sensors.DiskStats:
+        # Partitions from the cached mount table, network drives left out: a server not answering would block
+        used = 0
         free = 0
-        for part in psutil.disk_partitions():
-            free += psutil.disk_usage(part.mountpoint).free
-        return free
+        for mount, mount_used, mount_free in mounts.MOUNTS.usage(mounts.DEFAULT_EXCLUDE):
+            used += mount_used
+            free += mount_free
+        # Percentage of the summed partitions, consistent with used / free / total of the same scan
+        percentage = used / (used + free) * 100 if used + free > 0 else -1
+        return sensors.DiskStats(percentage=percentage, used=used, free=free)
+
+
+# NOTE: I/O counters are fetched from psutil too, LHM only has the disk activity percentage
+DISK_IO_BEFORE = None
+
+
+class DiskIO(sensors.DiskIO):
+    @staticmethod
+    def collect(device_filter: sensors.DeviceFilter = sensors.DEFAULT_DEVICE_FILTER) -> sensors.DiskIOStats:
+        global DISK_IO_BEFORE
+        stats, DISK_IO_BEFORE = sensors.disk_io_from_psutil(DISK_IO_BEFORE, device_filter)
+        return stats
+
+
+# NOTE: processes are listed with psutil, LHM does not have them
+Processes = processes.Processes
+
+
+# Partitions listed by psutil, see mounts.py
+Mounts = mounts.Mounts
 
 
 class Net(sensors.Net):
@@ -494,38 +585,29 @@ class Net(sensors.Net):
         int, int, int, int
     ]:  # up rate (B/s), uploaded (B), dl rate (B/s), downloaded (B)
 
-        upload_rate = 0
-        uploaded = 0
-        download_rate = 0
-        downloaded = 0
-
         net_if = get_net_interface_and_update(if_name)
         if net_if is not None:
-            for sensor in net_if.Sensors:
-                if (
-                    sensor.SensorType == Hardware.SensorType.Data
-                    and str(sensor.Name).startswith("Data Uploaded")
-                    and sensor.Value is not None
-                ):
-                    uploaded = int(sensor.Value * 1000000000.0)
-                elif (
-                    sensor.SensorType == Hardware.SensorType.Data
-                    and str(sensor.Name).startswith("Data Downloaded")
-                    and sensor.Value is not None
-                ):
-                    downloaded = int(sensor.Value * 1000000000.0)
-                elif (
-                    sensor.SensorType == Hardware.SensorType.Throughput
-                    and str(sensor.Name).startswith("Upload Speed")
-                    and sensor.Value is not None
-                ):
-                    upload_rate = int(sensor.Value)
-                elif (
-                    sensor.SensorType == Hardware.SensorType.Throughput
-                    and str(sensor.Name).startswith("Download Speed")
-                    and sensor.Value is not None
-                ):
-                    download_rate = int(sensor.Value)
+            resolved = NET_SENSORS.resolve(net_if)
+            uploaded = int(resolved.value("uploaded") * 1000000000.0)
+            downloaded = int(resolved.value("downloaded") * 1000000000.0)
+            upload_rate = int(resolved.value("upload_rate"))
+            download_rate = int(resolved.value("download_rate"))
 
             return upload_rate, uploaded, download_rate, downloaded
         return -1, -1, -1, -1
+
+    @staticmethod
+    def collect(if_name="", interval=1) -> sensors.NetStats:
+        return sensors.NetStats(*Net.stats(if_name, interval))
+
+
+# NOTE: per-interface packets, errors and drops are fetched from psutil, because LHM does not have them.
+INTERFACES_BEFORE = None
+
+
+class Interfaces(sensors.Interfaces):
+    @staticmethod
+    def collect(interface_filter: sensors.InterfaceFilter = sensors.DEFAULT_INTERFACE_FILTER) -> sensors.InterfacesStats:
+        global INTERFACES_BEFORE
+        stats, INTERFACES_BEFORE = sensors.interfaces_from_psutil(INTERFACES_BEFORE, interface_filter)
+        return stats
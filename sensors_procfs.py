@@ -0,0 +1,526 @@
+# coding:utf-8
+# Linux-only backend reading procfs directly: /proc/stat, /proc/meminfo and /proc/net/dev are kept open
+# and re-read with a single pread() into a reused buffer, then parsed only for the exported fields.
+# Collectors run on their own threads and some share a file (stat, net/dev): a reader holds the lock of the file
+# from the read to the end of the parsing of its buffer.
+# GPU, CPU temperature and fans have no procfs source: they are read like in sensors_python.
+import glob
+import operator
+import os
+import threading
+import time
+from array import array
+from typing import List, Tuple
+
+import sensors as sensors
+import sensors_python
+from hwmon import HwmonIndex
+import mounts
+import processes
+
+# Roots of procfs and sysfs, can be changed (with set_roots) for containers or fixture files
+PROC_ROOT = "/proc"
+SYS_ROOT = "/sys"
+
+PROC_FILES = {}
+PROC_FILES_LOCK = threading.Lock()
+
+# Previous /proc/stat CPU counters (busy, total) for CPU percentage
+CPU_BEFORE = None
+
+# Previous /proc/net/dev counters (bytes sent, bytes received, monotonic sampling time) per interface
+PNIC_BEFORE = {}
+
+# Previous counters of all the interfaces, see sensors.interface_rates
+INTERFACES_BEFORE = None
+
+# Previous counters of all the block devices, see sensors.disk_io_rates
+DISK_IO_BEFORE = None
+
+# Cached file descriptors of the cpufreq scaling_cur_freq files
+CPUFREQ_FDS = None
+
+# Per-CPU /proc/stat counters of the listed CPUs (see CoreCounters), allocated again only when their names change
+CORES_BEFORE = None
+
+# Cached file descriptors of the per-CPU scaling_cur_freq files (None when the CPU has no cpufreq)
+CORE_FREQ_FDS = None
+
+
+class ProcFile:
+    def __init__(self, path: str, size: int = 4096):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+        self.length = 0
+        # Held from read() to the end of the parsing of buffer
+        self.lock = threading.Lock()
+
+    def read(self) -> bytearray:
+        # Re-read the whole file from offset 0 into the reused buffer, grow it if the file does not fit
+        while True:
+            self.length = os.preadv(self.fd, [self.buffer], 0)
+            if self.length < len(self.buffer):
+                return self.buffer
+            self.buffer = bytearray(len(self.buffer) * 2)
+
+    def line_after(self, key: bytes, start: int = 0) -> Tuple[bytearray, int]:
+        # Content of the line starting with key (key excluded), and position of its end
+        pos = self.buffer.find(key, start, self.length)
+        if pos == -1:
+            raise KeyError(key)
+        end = self.buffer.find(b"\n", pos, self.length)
+        if end == -1:
+            end = self.length
+        return self.buffer[pos + len(key) : end], end
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+def proc_file(name: str) -> ProcFile:
+    proc = PROC_FILES.get(name)
+    if proc is None:
+        with PROC_FILES_LOCK:
+            proc = PROC_FILES.get(name)
+            if proc is None:
+                proc = ProcFile(os.path.join(PROC_ROOT, name))
+                PROC_FILES[name] = proc
+    return proc
+
+
+def set_roots(proc_root: str = "/proc", sys_root: str = "/sys"):
+    global PROC_ROOT, SYS_ROOT, CPU_BEFORE, CPUFREQ_FDS, CORES_BEFORE, CORE_FREQ_FDS
+    global INTERFACES_BEFORE, DISK_IO_BEFORE
+    for proc in PROC_FILES.values():
+        proc.close()
+    PROC_FILES.clear()
+    for fd in CPUFREQ_FDS or ():
+        os.close(fd)
+    close_core_freq_fds()
+    CORES_BEFORE = None
+    PROC_ROOT = proc_root
+    SYS_ROOT = sys_root
+    sensors_python.HWMON.close()
+    sensors_python.HWMON = HwmonIndex(os.path.join(sys_root, "class/hwmon"))
+    mounts.MOUNTS.close()
+    mounts.MOUNTS = mounts.MountTable(os.path.join(proc_root, "self/mountinfo"))
+    CPU_BEFORE = None
+    CPUFREQ_FDS = None
+    PNIC_BEFORE.clear()
+    INTERFACES_BEFORE = None
+    DISK_IO_BEFORE = None
+
+
+def net_dev_fields(proc: ProcFile, if_name: str) -> list:
+    # "  eth0: rx_bytes rx_packets rx_errs rx_drop rx_fifo rx_frame rx_compressed rx_multicast tx_bytes ..."
+    # Names are right-aligned on 6 characters: only match a whole name, preceded by a space or a new line
+    key = if_name.encode() + b":"
+    pos = 0
+    while True:
+        pos = proc.buffer.find(key, pos, proc.length)
+        if pos == -1:
+            raise KeyError(if_name)
+        if pos == 0 or proc.buffer[pos - 1] in b" \n":
+            break
+        pos += 1
+    end = proc.buffer.find(b"\n", pos, proc.length)
+    return proc.buffer[pos + len(key) : end if end != -1 else proc.length].split()
+
+
+def net_dev_table(proc: ProcFile) -> Tuple[Tuple[str, ...], list]:
+    # Interface names and all the tokens of the interface lines, 17 per interface: name then 16 counters.
+    # Old kernels do not put a space after the colon of large rx_bytes values
+    header_end = proc.buffer.find(b"\n", proc.buffer.find(b"\n") + 1) + 1
+    tokens = bytes(proc.buffer[header_end : proc.length]).replace(b":", b" ").split()
+    return tuple(map(bytes.decode, tokens[0::17])), tokens
+
+
+def meminfo_kb(proc: ProcFile, key: bytes) -> int:
+    # "MemTotal:       16318412 kB"
+    value, _ = proc.line_after(key)
+    return int(value.split()[0]) * 1024
+
+
+class Cpu(sensors.Cpu):
+    @staticmethod
+    def percentage() -> float:
+        global CPU_BEFORE
+        try:
+            proc = proc_file("stat")
+            with proc.lock:
+                proc.read()
+                # "cpu  user nice system idle iowait irq softirq steal guest guest_nice"
+                # guest times are already included in user and nice
+                value, _ = proc.line_after(b"cpu ")
+                times = [int(field) for field in value.split()[:8]]
+        except:
+            return -1
+        total = sum(times)
+        busy = total - times[3] - times[4]
+        if CPU_BEFORE is None:
+            # First sample: no increase, like psutil.cpu_percent(None) (not the average since boot)
+            CPU_BEFORE = busy, total
+            return 0.0
+        busy_before, total_before = CPU_BEFORE
+        CPU_BEFORE = busy, total
+        if total <= total_before:
+            return 0.0
+        return round((busy - busy_before) / (total - total_before) * 100, 1)
+
+    @staticmethod
+    def frequency() -> float:
+        global CPUFREQ_FDS
+        if CPUFREQ_FDS is None:
+            CPUFREQ_FDS = [
+                os.open(path, os.O_RDONLY)
+                for path in sorted(
+                    glob.glob(
+                        os.path.join(
+                            SYS_ROOT, "devices/system/cpu/cpufreq/policy*/scaling_cur_freq"
+                        )
+                    )
+                )
+            ]
+        try:
+            if CPUFREQ_FDS:
+                # Mean of all policies, in kHz
+                frequencies = [int(os.pread(fd, 32, 0)) for fd in CPUFREQ_FDS]
+                return sum(frequencies) / len(frequencies) / 1000000
+            # No cpufreq driver: use /proc/cpuinfo, in MHz
+            proc = proc_file("cpuinfo")
+            with proc.lock:
+                proc.read()
+                frequencies = []
+                end = 0
+                while True:
+                    try:
+                        value, end = proc.line_after(b"cpu MHz", end)
+                    except KeyError:
+                        break
+                    frequencies.append(float(value.split(b":")[1]))
+                return sum(frequencies) / len(frequencies) / 1000
+        except:
+            return -1
+
+    @staticmethod
+    def load() -> Tuple[float, float, float]:  # 1 / 5 / 15min avg (%):
+        try:
+            return os.getloadavg()
+        except:
+            return -1, -1, -1
+
+    @staticmethod
+    def temperature() -> float:
+        return sensors_python.Cpu.temperature()
+
+    @staticmethod
+    def fan_rpm(fan_name: str = None) -> float:
+        return sensors_python.Cpu.fan_rpm(fan_name)
+
+    @staticmethod
+    def collect() -> sensors.CpuStats:
+        return sensors.CpuStats(
+            percentage=Cpu.percentage(),
+            frequency=Cpu.frequency(),
+            temperature=Cpu.temperature(),
+            fan_rpm=Cpu.fan_rpm(),
+        )
+
+
+def close_core_freq_fds():
+    global CORE_FREQ_FDS
+    for fd in CORE_FREQ_FDS or ():
+        if fd is not None:
+            os.close(fd)
+    CORE_FREQ_FDS = None
+
+
+def open_core_freq_fds(names: List[bytes]) -> list:
+    fds = []
+    for name in names:
+        try:
+            fds.append(
+                os.open(
+                    os.path.join(SYS_ROOT, "devices/system/cpu", name.decode(), "cpufreq/scaling_cur_freq"),
+                    os.O_RDONLY,
+                )
+            )
+        except OSError:
+            fds.append(None)
+    return fds
+
+
+def column_percentages(delta: list, totals: list) -> list:
+    return [round(value / total * 100, 1) if total > 0 else 0.0 for value, total in zip(delta, totals)]
+
+
+def fill(row: array, values):
+    # Overwrite the items of row with values, in place: same length, the row keeps its buffer
+    row[:] = array("q", values)
+
+
+class CoreCounters:
+    # Counter matrix of the listed CPUs, one array("q") row per counter and one item per CPU. Preallocated for a
+    # set of CPU names, then only filled in place: the per-tick cost does not grow with allocations
+    __slots__ = ("names", "columns", "current", "before", "delta")
+
+    def __init__(self, names: List[bytes]):
+        self.names = names
+        count = len(names)
+        # user, nice, system, idle, iowait, irq, softirq, steal: guest times are already in user and nice
+        self.columns = [array("q", bytes(8 * count)) for column in range(8)]
+        # total, busy, iowait and steal of the latest reading, of the previous one, and their increases
+        self.current = [array("q", bytes(8 * count)) for row in range(4)]
+        self.before = [array("q", bytes(8 * count)) for row in range(4)]
+        self.delta = [array("q", bytes(8 * count)) for row in range(4)]
+
+    def update(self, tokens: List[bytes], width: int, first: bool):
+        # tokens: the split per-CPU lines of /proc/stat, width tokens per line. First reading: no increase
+        self.current, self.before = self.before, self.current
+        for row, column in zip(self.columns, range(1, 9)):
+            fill(row, map(int, tokens[column::width]))
+        total, busy, iowait, steal = self.current
+        fill(total, map(sum, zip(*self.columns)))
+        fill(busy, map(operator.sub, total, map(operator.add, self.columns[3], self.columns[4])))
+        iowait[:] = self.columns[4]
+        steal[:] = self.columns[7]
+        if first:
+            for before, current in zip(self.before, self.current):
+                before[:] = current
+        for delta, current, before in zip(self.delta, self.current, self.before):
+            fill(delta, map(operator.sub, current, before))
+
+
+class CpuCores(sensors.CpuCores):
+    # /proc/stat is read once, then every counter column of all the CPUs is converted and subtracted in one
+    # C-level pass (map over strided slices) instead of one Python loop per CPU and per counter
+    @staticmethod
+    def collect() -> sensors.CpuCoresStats:
+        global CORES_BEFORE, CORE_FREQ_FDS
+        try:
+            proc = proc_file("stat")
+            with proc.lock:
+                buffer = proc.read()
+                # Per-CPU lines, from "cpu0" to the end of the last "cpuN" line (offline CPUs are not listed)
+                start = buffer.find(b"\ncpu", 0, proc.length) + 1
+                last = buffer.rfind(b"\ncpu", 0, proc.length) + 1
+                end = buffer.find(b"\n", last, proc.length)
+                if start == 0 or last < start:
+                    return sensors.CpuCoresStats()
+                # "cpuN user nice system idle iowait irq softirq steal guest guest_nice"
+                width = len(buffer[start : buffer.find(b"\n", start)].split())
+                tokens = bytes(buffer[start:end]).split()
+            names = tokens[0::width]
+            first = CORES_BEFORE is None or CORES_BEFORE.names != names
+            if first:
+                # First reading, or CPUs went online / offline: a new matrix, no delta for this tick
+                close_core_freq_fds()
+                CORE_FREQ_FDS = open_core_freq_fds(names)
+                CORES_BEFORE = CoreCounters(names)
+            CORES_BEFORE.update(tokens, width, first)
+        except:
+            # The matrix may be half filled: start again from a first reading
+            CORES_BEFORE = None
+            return sensors.CpuCoresStats()
+
+        delta_total, delta_busy, delta_iowait, delta_steal = CORES_BEFORE.delta
+        percentages = column_percentages(delta_busy, delta_total)
+        iowaits = column_percentages(delta_iowait, delta_total)
+        steals = column_percentages(delta_steal, delta_total)
+        frequencies = []
+        for fd in CORE_FREQ_FDS:
+            try:
+                # In kHz
+                frequencies.append(int(os.pread(fd, 32, 0)) / 1000000 if fd is not None else -1)
+            except (OSError, ValueError):
+                frequencies.append(-1)
+        return sensors.CpuCoresStats(
+            [
+                sensors.CpuCoreStats(int(name[3:]), percentage, iowait, steal, frequency)
+                for name, percentage, iowait, steal, frequency in zip(
+                    names, percentages, iowaits, steals, frequencies
+                )
+            ]
+        )
+
+
+# No GPU data in procfs
+Gpu = sensors_python.Gpu
+
+# Mounts are already read from procfs, statvfs() for the space
+Mounts = mounts.Mounts
+
+# psutil reads the processes from procfs already, through cached Process objects
+Processes = processes.Processes
+
+
+class Memory(sensors.Memory):
+    @staticmethod
+    def percentage() -> float:
+        return Memory.collect().percentage
+
+    @staticmethod
+    def used() -> int:  # In bytes
+        return Memory.collect().used
+
+    @staticmethod
+    def free() -> int:  # In bytes
+        return Memory.collect().free
+
+    @staticmethod
+    def swap_percent() -> float:
+        return Memory.collect().swap_percent
+
+    @staticmethod
+    def collect() -> sensors.MemoryStats:
+        try:
+            proc = proc_file("meminfo")
+            with proc.lock:
+                proc.read()
+                total = meminfo_kb(proc, b"MemTotal:")
+                # Same choice as sensors_python: "available" is the memory really free for new processes
+                available = meminfo_kb(proc, b"MemAvailable:")
+                swap_total = meminfo_kb(proc, b"SwapTotal:")
+                swap_free = meminfo_kb(proc, b"SwapFree:")
+        except:
+            return sensors.MemoryStats()
+        used = total - available
+        return sensors.MemoryStats(
+            percentage=round(used / total * 100, 1) if total else -1,
+            used=used,
+            free=available,
+            swap_percent=(
+                round((swap_total - swap_free) / swap_total * 100, 1) if swap_total else 0.0
+            ),
+            swap_used=swap_total - swap_free,
+            swap_free=swap_free,
+        )
+
+
+class Disk(sensors.Disk):
+    @staticmethod
+    def percentage() -> float:
+        return Disk.collect().percentage
+
+    @staticmethod
+    def used() -> int:  # In bytes
+        return Disk.collect().used
+
+    @staticmethod
+    def free() -> int:  # In bytes
+        return Disk.collect().free
+
+    @staticmethod
+    def collect() -> sensors.DiskStats:
+        # Space usage is not in procfs: one statvfs() call, computed like psutil.disk_usage()
+        try:
+            st = os.statvfs("/")
+        except OSError:
+            return sensors.DiskStats()
+        used = (st.f_blocks - st.f_bfree) * st.f_frsize
+        free = st.f_bavail * st.f_frsize
+        percentage = round(used / (used + free) * 100, 1) if used + free else 0.0
+        return sensors.DiskStats(percentage=percentage, used=used, free=free)
+
+
+def diskstats_table(proc: ProcFile) -> Tuple[list, int]:
+    # All the tokens of /proc/diskstats and the number of tokens per device:
+    # "major minor name reads merged sectors read_ms writes merged sectors write_ms in_flight io_ms weighted_ms ..."
+    # 14 tokens per device, more with the discard (4.18) and flush (5.5) counters
+    data = bytes(proc.buffer[: proc.length])
+    tokens = data.split()
+    width = len(data[: data.find(b"\n")].split())
+    if width >= 14 and len(tokens) == width * data.count(b"\n"):
+        return tokens, width
+    # Devices with different numbers of counters: only keep the 14 first tokens of each
+    rows = [row[:14] for row in map(bytes.split, data.splitlines()) if len(row) >= 14]
+    return [token for row in rows for token in row], 14
+
+
+class DiskIO(sensors.DiskIO):
+    @staticmethod
+    def collect(device_filter: sensors.DeviceFilter = sensors.DEFAULT_DEVICE_FILTER) -> sensors.DiskIOStats:
+        global DISK_IO_BEFORE
+        try:
+            proc = proc_file("diskstats")
+            with proc.lock:
+                proc.read()
+                sampled_at = time.monotonic()
+                tokens, width = diskstats_table(proc)
+                names = tuple(map(bytes.decode, tokens[2::width]))
+                # reads, writes, sectors read, sectors written, read ms, write ms, io ms: one strided slice per counter
+                reads, writes, sectors_read, sectors_written, read_time, write_time, busy_time = [
+                    list(map(int, tokens[column::width])) for column in (3, 7, 5, 9, 6, 10, 12)
+                ]
+        except:
+            return sensors.DiskIOStats()
+        columns = [reads, writes, sectors_read, sectors_written, read_time, write_time, busy_time]
+        # Sectors of 512 bytes, whatever the sector size of the device
+        stats, DISK_IO_BEFORE = sensors.disk_io_rates(
+            names, columns, sampled_at, DISK_IO_BEFORE, device_filter, sector_size=512
+        )
+        return stats
+
+
+class Net(sensors.Net):
+    @staticmethod
+    def stats(
+        if_name="", interval=1
+    ) -> Tuple[
+        int, int, int, int
+    ]:  # up rate (B/s), uploaded (B), dl rate (B/s), downloaded (B)
+        # Rates are computed from the measured time between two samples, interval is kept for compatibility
+        try:
+            proc = proc_file("net/dev")
+            with proc.lock:
+                proc.read()
+                sampled_at = time.monotonic()
+                if not if_name:
+                    if_name = sensors.default_interface(net_dev_table(proc)[0])
+                fields = net_dev_fields(proc, if_name)
+        except KeyError:
+            sensors.warn_missing_interface(if_name)
+            return -1, -1, -1, -1
+        except:
+            return -1, -1, -1, -1
+
+        uploaded = int(fields[8])
+        downloaded = int(fields[0])
+        upload_rate = 0
+        download_rate = 0
+        if if_name in PNIC_BEFORE:
+            uploaded_before, downloaded_before, sampled_before = PNIC_BEFORE[if_name]
+            elapsed = sampled_at - sampled_before
+            if elapsed > 0:
+                upload_rate = (uploaded - uploaded_before) / elapsed
+                download_rate = (downloaded - downloaded_before) / elapsed
+        PNIC_BEFORE[if_name] = uploaded, downloaded, sampled_at
+        return upload_rate, uploaded, download_rate, downloaded
+
+    @staticmethod
+    def collect(if_name="", interval=1) -> sensors.NetStats:
+        return sensors.NetStats(*Net.stats(if_name, interval))
+
+
+class Interfaces(sensors.Interfaces):
+    @staticmethod
+    def collect(interface_filter: sensors.InterfaceFilter = sensors.DEFAULT_INTERFACE_FILTER) -> sensors.InterfacesStats:
+        global INTERFACES_BEFORE
+        try:
+            proc = proc_file("net/dev")
+            with proc.lock:
+                proc.read()
+                sampled_at = time.monotonic()
+                names, tokens = net_dev_table(proc)
+                # rx bytes, packets, errs, drop, then tx bytes, packets, errs, drop: one strided slice per counter
+                columns = [list(map(int, tokens[column::17])) for column in (1, 2, 3, 4, 9, 10, 11, 12)]
+        except:
+            return sensors.InterfacesStats()
+        stats, INTERFACES_BEFORE = sensors.interface_rates(
+            names, columns, sampled_at, INTERFACES_BEFORE, interface_filter
+        )
+        return stats
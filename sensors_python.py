@@ -1,9 +1,10 @@
 # coding:utf-8
 import platform
 import sys
+import time
 from collections import namedtuple
 from enum import IntEnum, auto
-from typing import Tuple
+from typing import List, Optional, Tuple
 
 # Nvidia GPU
 import GPUtil
@@ -12,7 +13,11 @@ import GPUtil
 import psutil
 
 import sensors as sensors
+from hwmon import HwmonIndex
+import mounts
+import processes
 from log import logger
+from nvidia_smi import NvidiaSmiStream, find_nvidia_smi
 
 # AMD GPU on Linux
 try:
@@ -26,8 +31,18 @@ try:
 except:
     pyadl = None
 
+# Previous network counters and their monotonic sampling time, per interface
 PNIC_BEFORE = {}
 
+# Previous per-CPU times (total, busy, iowait, steal)
+CORES_BEFORE = None
+
+# Previous counters of all the interfaces, see sensors.interface_rates
+INTERFACES_BEFORE = None
+
+# Previous counters of all the block devices, see sensors.disk_io_rates
+DISK_IO_BEFORE = None
+
 
 class GpuType(IntEnum):
     UNSUPPORTED = auto()
@@ -37,6 +52,28 @@ class GpuType(IntEnum):
 
 DETECTED_GPU = GpuType.UNSUPPORTED
 
+# AMD GPU handles (pyamdgpuinfo or pyadl devices), cached at detection time. AMD_GPU is the first one
+AMD_GPUS = []
+AMD_GPU = None
+
+# Streaming nvidia-smi reader, started once a Nvidia GPU is detected
+NVIDIA_SMI = None
+
+
+# hwmon chips and channels, indexed once and read through cached file descriptors
+HWMON = HwmonIndex()
+
+sfan = namedtuple("sfan", ["label", "current", "percent"])
+
+
+def read_channel(channel) -> Optional[float]:
+    # Value of a hwmon channel. A channel whose device is gone (driver reloaded under the same hwmonN name) has a
+    # stale file descriptor: the index is rebuilt
+    value = channel.read()
+    if value is None and channel.gone:
+        HWMON.invalidate()
+    return value
+
 
 # Function inspired of psutil/psutil/_pslinux.py:sensors_fans()
 # Adapted to also get fan speed percentage instead of raw value
@@ -49,45 +86,54 @@ def sensors_fans():
       retrieve this info, and this implementation relies on it
       only (old distros will probably use something else)
     - lm-sensors on Ubuntu 16.04 relies on /sys/class/hwmon
+    - the fans are read from the HWMON index, see hwmon.py
     """
-    from psutil._common import bcat, cat
-    import collections, glob, os
-
-    ret = collections.defaultdict(list)
-    basenames = glob.glob("/sys/class/hwmon/hwmon*/fan*_*")
-    if not basenames:
-        # CentOS has an intermediate /device directory:
-        # https://github.com/giampaolo/psutil/issues/971
-        basenames = glob.glob("/sys/class/hwmon/hwmon*/device/fan*_*")
-
-    basenames = sorted(set([x.split("_")[0] for x in basenames]))
-    for base in basenames:
-        try:
-            current_rpm = int(bcat(base + "_input"))
+    ret = {}
+    with HWMON.lock:
+        for channel in HWMON.channels("fan"):
+            current_rpm = read_channel(channel)
+            if current_rpm is None:
+                continue
+            # Approximated when not reported: fan speed is between 0 and 1500 RPM
+            max_rpm = channel.max if channel.max is not None else 1500
+            min_rpm = channel.min if channel.min is not None else 0
             try:
-                max_rpm = int(bcat(base + "_max"))
-            except:
-                max_rpm = 1500  # Approximated: max fan speed is 1500 RPM
-            try:
-                min_rpm = int(bcat(base + "_min"))
-            except:
-                min_rpm = 0  # Approximated: min fan speed is 0 RPM
-            percent = int((current_rpm - min_rpm) / (max_rpm - min_rpm) * 100)
-        except (IOError, OSError) as err:
-            continue
-        unit_name = cat(os.path.join(os.path.dirname(base), "name")).strip()
-        label = cat(base + "_label", fallback=os.path.basename(base)).strip()
+                percent = int((current_rpm - min_rpm) / (max_rpm - min_rpm) * 100)
+            except ZeroDivisionError:
+                continue
+            ret.setdefault(channel.chip.name, []).append(sfan(channel.label, current_rpm, percent))
 
-        custom_sfan = namedtuple("sfan", ["label", "current", "percent"])
-        ret[unit_name].append(custom_sfan(label, current_rpm, percent))
+    return ret
 
-    return dict(ret)
+
+def hwmon_fan_rpm(is_wanted) -> float:
+    # Speed of the first readable fan for which is_wanted(chip name, label) is true
+    with HWMON.lock:
+        for channel in HWMON.channels("fan"):
+            if is_wanted(channel.chip.name, channel.label):
+                current_rpm = read_channel(channel)
+                if current_rpm is not None:
+                    return current_rpm
+    return -1
 
 
 def is_cpu_fan(label: str) -> bool:
     return ("cpu" in label.lower()) or ("proc" in label.lower())
 
 
+def is_gpu_fan(name: str, label: str) -> bool:
+    return "gpu" in (label.lower() or name.lower())
+
+
+# hwmon chips reporting the CPU temperature, by order of preference
+CPU_TEMPERATURE_CHIPS = (
+    "coretemp",  # Intel CPU
+    "k10temp",  # AMD CPU
+    "cpu_thermal",  # ARM CPU
+    "zenpower",  # AMD CPU with zenpower (k10temp is in blacklist)
+)
+
+
 class Cpu(sensors.Cpu):
     @staticmethod
     def percentage() -> float:
@@ -112,60 +158,116 @@ class Cpu(sensors.Cpu):
 
     @staticmethod
     def temperature() -> float:
-        cpu_temp = -1
-        try:
-            sensors_temps = psutil.sensors_temperatures()
-            if "coretemp" in sensors_temps:
-                # Intel CPU
-                cpu_temp = sensors_temps["coretemp"][0].current
-            elif "k10temp" in sensors_temps:
-                # AMD CPU
-                cpu_temp = sensors_temps["k10temp"][0].current
-            elif "cpu_thermal" in sensors_temps:
-                # ARM CPU
-                cpu_temp = sensors_temps["cpu_thermal"][0].current
-            elif "zenpower" in sensors_temps:
-                # AMD CPU with zenpower (k10temp is in blacklist)
-                cpu_temp = sensors_temps["zenpower"][0].current
-        except:
-            # psutil.sensors_temperatures not available on Windows / MacOS
-            pass
-        return cpu_temp
+        # hwmon is not available on Windows / MacOS: the index is empty
+        with HWMON.lock:
+            for chip_name in CPU_TEMPERATURE_CHIPS:
+                channel = HWMON.first_channel(chip_name, "temp")
+                if channel is not None:
+                    cpu_temp = read_channel(channel)
+                    return cpu_temp if cpu_temp is not None else -1
+        return -1
 
     @staticmethod
     def fan_rpm(fan_name: str = None) -> float:
+        return hwmon_fan_rpm(
+            lambda name, label: (
+                # Manually selected fan
+                (fan_name is not None and fan_name == "%s/%s" % (name, label))
+                # Auto-detected fan
+                or is_cpu_fan(label)
+                or is_cpu_fan(name)
+            )
+        )
+
+    @staticmethod
+    def collect() -> sensors.CpuStats:
+        return sensors.CpuStats(
+            percentage=Cpu.percentage(),
+            frequency=Cpu.frequency(),
+            temperature=Cpu.temperature(),
+            fan_rpm=Cpu.fan_rpm(),
+        )
+
+
+class CpuCores(sensors.CpuCores):
+    @staticmethod
+    def collect() -> sensors.CpuCoresStats:
+        global CORES_BEFORE
         try:
-            fans = sensors_fans()
-            if fans:
-                for name, entries in fans.items():
-                    for entry in entries:
-                        if fan_name is not None and fan_name == "%s/%s" % (
-                            name,
-                            entry.label,
-                        ):
-                            # Manually selected fan
-                            return entry.current
-                        elif is_cpu_fan(entry.label) or is_cpu_fan(name):
-                            # Auto-detected fan
-                            return entry.current
+            cpu_times = psutil.cpu_times(percpu=True)
         except:
-            pass
+            return sensors.CpuCoresStats()
+        try:
+            # Not per CPU on all platforms: then one value for all the CPUs
+            frequencies = [frequency.current / 1000 for frequency in psutil.cpu_freq(percpu=True)]
+        except:
+            frequencies = []
+        if len(frequencies) == 1:
+            frequencies = frequencies * len(cpu_times)
+
+        # iowait and steal are only reported on Linux
+        counters = []
+        for times in cpu_times:
+            total = sum(times)
+            # guest times are already included in user and nice
+            total -= getattr(times, "guest", 0) + getattr(times, "guest_nice", 0)
+            iowait = getattr(times, "iowait", 0)
+            steal = getattr(times, "steal", 0)
+            counters.append((total, total - times.idle - iowait, iowait, steal))
+        before = CORES_BEFORE if CORES_BEFORE is not None and len(CORES_BEFORE) == len(counters) else counters
+        CORES_BEFORE = counters
+
+        cores = []
+        for index, (after, prior) in enumerate(zip(counters, before)):
+            elapsed = after[0] - prior[0]
+            if elapsed > 0:
+                percentage, iowait, steal = [
+                    round((after[column] - prior[column]) / elapsed * 100, 1) for column in (1, 2, 3)
+                ]
+            else:
+                percentage, iowait, steal = 0.0, 0.0, 0.0
+            cores.append(
+                sensors.CpuCoreStats(
+                    index,
+                    percentage,
+                    iowait,
+                    steal,
+                    frequencies[index] if index < len(frequencies) else -1,
+                )
+            )
+        return sensors.CpuCoresStats(cores)
+
 
+def used_percentage(used: float, total: float) -> float:
+    # -1 when a value is not reported
+    if used < 0 or total <= 0:
         return -1
+    return used / total * 100
 
 
 class Gpu(sensors.Gpu):
-    @staticmethod
-    def stats() -> (
+    @classmethod
+    def stats(cls) -> (
         Tuple[float, float, float, float, float]
     ):  # load (%) / used mem (%) / used mem (Mb) / total mem (Mb) / temp (°C)
+        return sensors.gpu_average(cls.devices())
+
+    @classmethod
+    def devices(cls) -> List[sensors.GpuDeviceStats]:
         global DETECTED_GPU
-        if DETECTED_GPU == GpuType.AMD:
-            return GpuAmd.stats()
-        elif DETECTED_GPU == GpuType.NVIDIA:
-            return GpuNvidia.stats()
-        else:
-            return -1, -1, -1, -1, -1
+        if DETECTED_GPU == GpuType.UNSUPPORTED:
+            return []
+
+        try:
+            if DETECTED_GPU == GpuType.AMD:
+                devices = GpuAmd.devices()
+            else:
+                devices = GpuNvidia.devices()
+        except:
+            devices = []
+        # Repeated failed readings trigger a new GPU detection
+        cls.reading_done(any(device.load != -1 or device.temperature != -1 for device in devices))
+        return devices
 
     @staticmethod
     def fps() -> int:
@@ -197,20 +299,50 @@ class Gpu(sensors.Gpu):
         else:
             return -1
 
-    @staticmethod
-    def is_available() -> bool:
+    @classmethod
+    def is_available(cls) -> bool:
+        # Detection is expensive (GPUtil forks nvidia-smi): only run it when due, see sensors.Gpu
+        if cls.detection_due():
+            cls.detect()
+        return DETECTED_GPU != GpuType.UNSUPPORTED
+
+    @classmethod
+    def detect(cls):
         global DETECTED_GPU
+        first_detection = cls.detected_at is None
+        previous_gpu = DETECTED_GPU
         if GpuAmd.is_available():
-            # logger.info("Detected AMD GPU(s)")
             DETECTED_GPU = GpuType.AMD
         elif GpuNvidia.is_available():
-            # logger.info("Detected Nvidia GPU(s)")
             DETECTED_GPU = GpuType.NVIDIA
         else:
-            # logger.warning("No supported GPU found")
             DETECTED_GPU = GpuType.UNSUPPORTED
-            
-        return DETECTED_GPU != GpuType.UNSUPPORTED
+        cls.detection_done()
+
+        if first_detection or DETECTED_GPU != previous_gpu:
+            if DETECTED_GPU == GpuType.AMD:
+                logger.info("Detected AMD GPU(s)")
+            elif DETECTED_GPU == GpuType.NVIDIA:
+                logger.info("Detected Nvidia GPU(s)")
+            else:
+                logger.warning("No supported GPU found")
+
+    @classmethod
+    def collect(cls) -> sensors.GpuStats:
+        # Detect first, so that the stats of the same tick are read from the detected GPU
+        is_available = cls.is_available()
+        devices = cls.devices()
+        load, percentage, used, total, temperature = sensors.gpu_average(devices)
+        return sensors.GpuStats(
+            is_available=is_available,
+            fan_rpm=Gpu.fan_rpm(),
+            load=load,
+            percentage=percentage,
+            total=total,
+            used=used,
+            temperature=temperature,
+            devices=devices,
+        )
 
 
 class GpuNvidia(sensors.Gpu):
@@ -218,39 +350,44 @@ class GpuNvidia(sensors.Gpu):
     def stats() -> (
         Tuple[float, float, float, float, float]
     ):  # load (%) / used mem (%) / used mem (Mb) / total mem (Mb) / temp (°C)
-        # Unlike other sensors, Nvidia GPU with GPUtil pulls in all the stats at once
-        nvidia_gpus = GPUtil.getGPUs()
+        return sensors.gpu_average(GpuNvidia.devices())
 
-        try:
-            memory_used_all = [item.memoryUsed for item in nvidia_gpus]
-            memory_used_mb = sum(memory_used_all) / len(memory_used_all)
-        except:
-            memory_used_mb = -1
-
-        try:
-            memory_total_all = [item.memoryTotal for item in nvidia_gpus]
-            memory_total_mb = sum(memory_total_all) / len(memory_total_all)
-        except:
-            memory_total_mb = -1
-
-        try:
-            memory_percentage = (memory_used_mb / memory_total_mb) * 100
-        except:
-            memory_percentage = -1
-
-        try:
-            load_all = [item.load for item in nvidia_gpus]
-            load = (sum(load_all) / len(load_all)) * 100
-        except:
-            load = -1
-
-        try:
-            temperature_all = [item.temperature for item in nvidia_gpus]
-            temperature = sum(temperature_all) / len(temperature_all)
-        except:
-            temperature = -1
-
-        return load, memory_percentage, memory_used_mb, memory_total_mb, temperature
+    @staticmethod
+    def devices() -> List[sensors.GpuDeviceStats]:
+        devices = []
+        if NVIDIA_SMI is not None:
+            # Latest sample of the streaming reader, all GPUs from the same query: no fork, no wait
+            for item in NVIDIA_SMI.latest():
+                devices.append(
+                    sensors.GpuDeviceStats(
+                        index=item.index,
+                        name=item.name,
+                        uuid=item.uuid,
+                        load=item.load,
+                        percentage=used_percentage(item.memory_used, item.memory_total),
+                        total=item.memory_total,
+                        used=item.memory_used,
+                        temperature=item.temperature,
+                        fan_speed=item.fan_speed,
+                        frequency=item.clock / 1000 if item.clock != -1 else -1,
+                    )
+                )
+        else:
+            # Unlike other sensors, Nvidia GPU with GPUtil pulls in all the stats at once
+            for item in GPUtil.getGPUs():
+                devices.append(
+                    sensors.GpuDeviceStats(
+                        index=item.id,
+                        name=item.name,
+                        uuid=item.uuid,
+                        load=item.load * 100,
+                        percentage=used_percentage(item.memoryUsed, item.memoryTotal),
+                        total=item.memoryTotal,
+                        used=item.memoryUsed,
+                        temperature=item.temperature,
+                    )
+                )
+        return devices
 
     @staticmethod
     def fps() -> int:
@@ -259,41 +396,50 @@ class GpuNvidia(sensors.Gpu):
 
     @staticmethod
     def fan_rpm() -> float:
-        try:
-            fans = sensors_fans()
-            if fans:
-                for name, entries in fans.items():
-                    for entry in entries:
-                        if "gpu" in (entry.label.lower() or name.lower()):
-                            return entry.current
-        except:
-            pass
-
-        return -1
+        return hwmon_fan_rpm(is_gpu_fan)
 
     @staticmethod
     def frequency() -> float:
-        # Not supported by Python libraries
+        if NVIDIA_SMI is not None:
+            try:
+                clock_all = [item.clock for item in NVIDIA_SMI.latest()]
+                return sum(clock_all) / len(clock_all) / 1000
+            except:
+                pass
+        # Not supported by GPUtil
         return -1
 
     @staticmethod
     def is_available() -> bool:
+        global NVIDIA_SMI
         try:
-            return len(GPUtil.getGPUs()) > 0
+            available = len(GPUtil.getGPUs()) > 0
         except:
-            return False
+            available = False
+
+        if available and NVIDIA_SMI is None and find_nvidia_smi():
+            # Stream the stats from one long-lived nvidia-smi instead of forking it for every reading
+            NVIDIA_SMI = NvidiaSmiStream(interval=Gpu.sampling_interval)
+            NVIDIA_SMI.start()
+            NVIDIA_SMI.wait_ready(timeout=2)
+        elif not available and NVIDIA_SMI is not None:
+            NVIDIA_SMI.stop()
+            NVIDIA_SMI = None
+        return available
 
 
 class GpuAmd(sensors.Gpu):
     @staticmethod
-    def stats() -> (
+    def stats(amd_gpu=None) -> (
         Tuple[float, float, float, float, float]
     ):  # load (%) / used mem (%) / used mem (Mb) / total mem (Mb) / temp (°C)
+        if amd_gpu is None:
+            amd_gpu = GpuAmd.get_gpu()
+        if amd_gpu is None:
+            return -1, -1, -1, -1, -1
+
         if pyamdgpuinfo:
             # Unlike other sensors, AMD GPU with pyamdgpuinfo pulls in all the stats at once
-            pyamdgpuinfo.detect_gpus()
-            amd_gpu = pyamdgpuinfo.get_gpu(0)
-
             try:
                 memory_used_bytes = amd_gpu.query_vram_usage()
                 memory_used = memory_used_bytes / 1024 / 1024
@@ -324,9 +470,7 @@ class GpuAmd(sensors.Gpu):
                 temperature = -1
 
             return load, memory_percentage, memory_used, memory_total, temperature
-        elif pyadl:
-            amd_gpu = pyadl.ADLManager.getInstance().getDevices()[0]
-
+        else:
             try:
                 load = amd_gpu.getCurrentUsage()
             except:
@@ -340,6 +484,40 @@ class GpuAmd(sensors.Gpu):
             # GPU memory data not supported by pyadl
             return load, -1, -1, -1, temperature
 
+    @staticmethod
+    def devices() -> List[sensors.GpuDeviceStats]:
+        # Neither pyamdgpuinfo nor pyadl has a batched query: each GPU is read with its own handle
+        if not AMD_GPUS:
+            GpuAmd.is_available()
+        devices = []
+        for index, amd_gpu in enumerate(AMD_GPUS):
+            load, memory_percentage, used, total, temperature = GpuAmd.stats(amd_gpu)
+            try:
+                # In MHz
+                frequency = GpuAmd.frequency(amd_gpu) / 1000
+            except:
+                frequency = -1
+            if pyamdgpuinfo:
+                name = getattr(amd_gpu, "name", "") or ""
+                uuid = getattr(amd_gpu, "pci_slot", "") or ""
+            else:
+                name = amd_gpu.adapterName
+                uuid = "pci:%s" % amd_gpu.busNumber
+            devices.append(
+                sensors.GpuDeviceStats(
+                    index=index,
+                    name=name,
+                    uuid=uuid,
+                    load=load,
+                    percentage=memory_percentage,
+                    total=total,
+                    used=used,
+                    temperature=temperature,
+                    frequency=frequency,
+                )
+            )
+        return devices
+
     @staticmethod
     def fps() -> int:
         # Not supported by Python libraries
@@ -348,20 +526,15 @@ class GpuAmd(sensors.Gpu):
     @staticmethod
     def fan_rpm() -> float:
         try:
-            # Try with psutil fans
-            fans = sensors_fans()
-            if fans:
-                for name, entries in fans.items():
-                    for entry in entries:
-                        if "gpu" in (entry.label.lower() or name.lower()):
-                            return entry.current
+            # Try with hwmon fans
+            fan_rpm = hwmon_fan_rpm(is_gpu_fan)
+            if fan_rpm != -1:
+                return fan_rpm
 
             # Try with pyadl if psutil did not find GPU fan
-            if pyadl:
-                return (
-                    pyadl.ADLManager.getInstance()
-                    .getDevices()[0]
-                    .getCurrentFanSpeed(pyadl.ADL_DEVICE_FAN_SPEED_TYPE_RPM)
+            if pyadl and not pyamdgpuinfo and GpuAmd.get_gpu() is not None:
+                return GpuAmd.get_gpu().getCurrentFanSpeed(
+                    pyadl.ADL_DEVICE_FAN_SPEED_TYPE_RPM
                 )
         except:
             pass
@@ -369,28 +542,36 @@ class GpuAmd(sensors.Gpu):
         return -1
 
     @staticmethod
-    def frequency() -> float:
-        if pyamdgpuinfo:
-            pyamdgpuinfo.detect_gpus()
-            return pyamdgpuinfo.get_gpu(0).query_sclk() / 1000000
-        elif pyadl:
-            return (
-                pyadl.ADLManager.getInstance().getDevices()[0].getCurrentEngineClock()
-            )
-        else:
+    def frequency(amd_gpu=None) -> float:
+        if amd_gpu is None:
+            amd_gpu = GpuAmd.get_gpu()
+        if amd_gpu is None:
             return -1
+        elif pyamdgpuinfo:
+            return amd_gpu.query_sclk() / 1000000
+        else:
+            return amd_gpu.getCurrentEngineClock()
+
+    @staticmethod
+    def get_gpu():
+        # Return the cached GPU handle, detect it on first use
+        if AMD_GPU is None:
+            GpuAmd.is_available()
+        return AMD_GPU
 
     @staticmethod
     def is_available() -> bool:
+        global AMD_GPU, AMD_GPUS
+        AMD_GPUS = []
         try:
             if pyamdgpuinfo and pyamdgpuinfo.detect_gpus() > 0:
-                return True
-            elif pyadl and len(pyadl.ADLManager.getInstance().getDevices()) > 0:
-                return True
-            else:
-                return False
+                AMD_GPUS = [pyamdgpuinfo.get_gpu(index) for index in range(pyamdgpuinfo.detect_gpus())]
+            elif pyadl:
+                AMD_GPUS = list(pyadl.ADLManager.getInstance().getDevices())
         except:
-            return False
+            pass
+        AMD_GPU = AMD_GPUS[0] if AMD_GPUS else None
+        return AMD_GPU is not None
 
 
 class Memory(sensors.Memory):
@@ -407,7 +588,8 @@ class Memory(sensors.Memory):
         try:
             # Do not use psutil.virtual_memory().used: from https://psutil.readthedocs.io/en/latest/#memory
             # "It is calculated differently depending on the platform and designed for informational purposes only"
-            return psutil.virtual_memory().total - psutil.virtual_memory().available
+            memory = psutil.virtual_memory()
+            return memory.total - memory.available
         except:
             return -1
 
@@ -420,6 +602,30 @@ class Memory(sensors.Memory):
         except:
             return -1
 
+    @staticmethod
+    def swap_percent() -> float:
+        try:
+            return psutil.swap_memory().percent
+        except:
+            return -1
+
+    @staticmethod
+    def collect() -> sensors.MemoryStats:
+        try:
+            # One query for all fields, see used() and free() for the choice of "available"
+            memory = psutil.virtual_memory()
+            swap = psutil.swap_memory()
+            return sensors.MemoryStats(
+                percentage=memory.percent,
+                used=memory.total - memory.available,
+                free=memory.available,
+                swap_percent=swap.percent,
+                swap_used=swap.used,
+                swap_free=swap.free,
+            )
+        except:
+            return sensors.MemoryStats()
+
 
 class Disk(sensors.Disk):
     @staticmethod
@@ -443,6 +649,32 @@ class Disk(sensors.Disk):
         except:
             return -1
 
+    @staticmethod
+    def collect() -> sensors.DiskStats:
+        try:
+            usage = psutil.disk_usage("/")
+            return sensors.DiskStats(
+                percentage=usage.percent, used=usage.used, free=usage.free
+            )
+        except:
+            return sensors.DiskStats()
+
+
+class DiskIO(sensors.DiskIO):
+    @staticmethod
+    def collect(device_filter: sensors.DeviceFilter = sensors.DEFAULT_DEVICE_FILTER) -> sensors.DiskIOStats:
+        global DISK_IO_BEFORE
+        stats, DISK_IO_BEFORE = sensors.disk_io_from_psutil(DISK_IO_BEFORE, device_filter)
+        return stats
+
+
+# Process table kept across samples, see processes.py
+Processes = processes.Processes
+
+
+# Mounted filesystems, only parsed again when the mounts change, see mounts.py
+Mounts = mounts.Mounts
+
 
 class Net(sensors.Net):
     @staticmethod
@@ -451,37 +683,40 @@ class Net(sensors.Net):
     ) -> Tuple[
         int, int, int, int
     ]:  # up rate (B/s), uploaded (B), dl rate (B/s), downloaded (B)
+        # Rates are computed from the measured time between two samples, interval is kept for compatibility
         global PNIC_BEFORE
         # Get current counters
         pnic_after = psutil.net_io_counters(pernic=True)
+        sampled_at = time.monotonic()
 
         upload_rate = 0
-        uploaded = 0
         download_rate = 0
-        downloaded = 0
-        if not if_name and len(pnic_after) > 0:
-            if_name = list(pnic_after.keys())[0]
+        if not if_name:
+            if_name = sensors.default_interface(list(pnic_after))
         if if_name in pnic_after:
-            try:
-                upload_rate = (
-                    pnic_after[if_name].bytes_sent
-                    - PNIC_BEFORE[if_name].bytes_sent
-                ) / interval
-                uploaded = pnic_after[if_name].bytes_sent
-                download_rate = (
-                    pnic_after[if_name].bytes_recv
-                    - PNIC_BEFORE[if_name].bytes_recv
-                ) / interval
-                downloaded = pnic_after[if_name].bytes_recv
-            except:
-                # Interface might not be in PNIC_BEFORE for now
-                pass
-            PNIC_BEFORE.update({if_name: pnic_after[if_name]})
+            counters = pnic_after[if_name]
+            uploaded = counters.bytes_sent
+            downloaded = counters.bytes_recv
+            # Interface might not be in PNIC_BEFORE for now
+            if if_name in PNIC_BEFORE:
+                counters_before, sampled_before = PNIC_BEFORE[if_name]
+                elapsed = sampled_at - sampled_before
+                if elapsed > 0:
+                    upload_rate = (uploaded - counters_before.bytes_sent) / elapsed
+                    download_rate = (downloaded - counters_before.bytes_recv) / elapsed
+            PNIC_BEFORE[if_name] = counters, sampled_at
             return upload_rate, uploaded, download_rate, downloaded
-        # 
-        logger.warning(
-            "Network interface '%s' not found. Check names in config.yaml."
-            % if_name
-        )
+        sensors.warn_missing_interface(if_name)
         return -1, -1, -1, -1
-            
+
+    @staticmethod
+    def collect(if_name="", interval=1) -> sensors.NetStats:
+        return sensors.NetStats(*Net.stats(if_name, interval))
+
+
+class Interfaces(sensors.Interfaces):
+    @staticmethod
+    def collect(interface_filter: sensors.InterfaceFilter = sensors.DEFAULT_INTERFACE_FILTER) -> sensors.InterfacesStats:
+        global INTERFACES_BEFORE
+        stats, INTERFACES_BEFORE = sensors.interfaces_from_psutil(INTERFACES_BEFORE, interface_filter)
+        return stats
@@ -0,0 +1,205 @@
+# coding:utf-8
+# Output formats of the snapshots. A serializer is created once and reused for every tick.
+import io
+import json
+import re
+import struct
+from typing import Any, Dict, List, Tuple, Union
+
+import ruamel.yaml
+
+
+def flatten(data: Dict[str, Any], prefix: str = "") -> List[Tuple[str, Any]]:
+    # {"Cpu": {"percentage": 1.0}} -> [("Cpu.percentage", 1.0)], lists are indexed: "Gpu.devices.0.load"
+    items = []
+    for key, value in data.items() if isinstance(data, dict) else enumerate(data):
+        path = "%s%s" % (prefix, key)
+        if isinstance(value, (dict, list, tuple)):
+            items.extend(flatten(value, path + "."))
+        else:
+            items.append((path, value))
+    return items
+
+
+class Serializer:
+    name = ""
+    extension = ""
+    # Text serializers return str (written in text mode, like before), binary ones return bytes
+    binary = False
+
+    def dumps(self, data: Dict[str, Any]) -> Union[str, bytes]:
+        raise NotImplementedError
+
+
+class YamlSerializer(Serializer):
+    name = "yaml"
+    extension = ".yaml"
+
+    def __init__(self):
+        # Built once, with the C emitter when ruamel.yaml.clib is available, and configured to write the same
+        # bytes as the round-trip ruamel.yaml.YAML().dump(): block style, keys in insertion order, None written
+        # as an empty value (libyaml adds a trailing space after the key, it still loads as None)
+        self.yaml = ruamel.yaml.YAML(typ="safe", pure=False)
+        self.yaml.default_flow_style = False
+        self.yaml.sort_base_mapping_type_on_output = False
+        self.yaml.representer.add_representer(
+            type(None),
+            lambda representer, data: representer.represent_scalar("tag:yaml.org,2002:null", ""),
+        )
+        self.stream = io.StringIO()
+
+    def dumps(self, data: Dict[str, Any]) -> str:
+        self.stream.seek(0)
+        self.stream.truncate()
+        self.yaml.dump(data, self.stream)
+        return self.stream.getvalue()
+
+
+class JsonSerializer(Serializer):
+    # One compact line per snapshot: also usable as NDJSON when appended to a stream
+    name = "json"
+    extension = ".json"
+
+    def __init__(self):
+        # No indent: the C encoder of the json module is used
+        self.encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+
+    def dumps(self, data: Dict[str, Any]) -> str:
+        return self.encoder.encode(data) + "\n"
+
+
+class PrometheusSerializer(Serializer):
+    # Prometheus text exposition format, e.g. hardware_stats_cpu_percentage 12.5
+    # Sections of named sub-records are labels: hardware_stats_collectors_age{collector="Cpu"} 0.001,
+    # and so are list indexes: hardware_stats_gpu_devices_load{device="0"} 35.0, or the identifying field of
+    # the items of LABELED_LISTS: hardware_stats_interfaces_interfaces_rx_rate{interface="eth0"} 1024.0.
+    # Strings are left out
+    name = "prometheus"
+    extension = ".prom"
+    PREFIX = "hardware_stats"
+    LABELED_SECTIONS = {"Collectors": "collector"}
+    # Items identified by a field rather than by their position, which changes when items come and go:
+    # (section, list) -> (label, identifying field, not exported as a metric)
+    LABELED_LISTS = {
+        ("Interfaces", "interfaces"): ("interface", "name"),
+        ("DiskIO", "devices"): ("device", "name"),
+        ("Processes", "processes"): ("process", "pid"),
+    }
+    INVALID_CHARACTERS = re.compile(r"[^a-zA-Z0-9_]")
+
+    def __init__(self):
+        self.metric_names = {}
+
+    def metric_name(self, path: Tuple[str, ...]) -> str:
+        name = self.metric_names.get(path)
+        if name is None:
+            name = self.INVALID_CHARACTERS.sub("_", "_".join((self.PREFIX,) + path)).lower()
+            self.metric_names[path] = name
+        return name
+
+    def samples(self, data: Any, path: Tuple[str, ...], labels: str, out: Dict[str, List[str]]):
+        for key, value in data.items():
+            if path == () and key in self.LABELED_SECTIONS and isinstance(value, dict):
+                label = self.LABELED_SECTIONS[key]
+                for name, record in value.items():
+                    self.samples(record, (key,), '%s%s="%s",' % (labels, label, name), out)
+            elif isinstance(value, dict):
+                self.samples(value, path + (key,), labels, out)
+            elif isinstance(value, (list, tuple)):
+                label = key[:-1] if key.endswith("s") else key
+                field = None
+                if path + (key,) in self.LABELED_LISTS:
+                    label, field = self.LABELED_LISTS[path + (key,)]
+                for index, item in enumerate(value):
+                    if field is not None and isinstance(item, dict) and field in item:
+                        item_labels = '%s%s="%s",' % (labels, label, item[field])
+                        item = {name: item_value for name, item_value in item.items() if name != field}
+                    else:
+                        item_labels = '%s%s="%d",' % (labels, label, index)
+                    if isinstance(item, dict):
+                        self.samples(item, path + (key,), item_labels, out)
+                    elif isinstance(item, (int, float)):
+                        self.sample(path + (key,), item_labels, item, out)
+            elif isinstance(value, (int, float)):
+                self.sample(path + (key,), labels, value, out)
+
+    def sample(self, path: Tuple[str, ...], labels: str, value: Any, out: Dict[str, List[str]]):
+        name = self.metric_name(path)
+        if labels:
+            line = "%s{%s} %r\n" % (name, labels[:-1], float(value))
+        else:
+            line = "%s %r\n" % (name, float(value))
+        out.setdefault(name, []).append(line)
+
+    def dumps(self, data: Dict[str, Any]) -> str:
+        # Samples grouped by metric, each group announced by its type
+        out = {}
+        self.samples(data, (), "", out)
+        lines = []
+        for name, samples in out.items():
+            lines.append("# TYPE %s gauge\n" % name)
+            lines.extend(samples)
+        return "".join(lines)
+
+
+class BinarySerializer(Serializer):
+    # Compact binary format:
+    #   magic "HWS1" | schema length (uint32) | schema | values
+    # schema is the struct codes of the values, a new line, then the new line separated names of the
+    # flattened fields. Values are packed little-endian: "?" for booleans, "q" for integers, "d" for floats,
+    # strings and None are skipped
+    name = "binary"
+    extension = ".bin"
+    binary = True
+    MAGIC = b"HWS1"
+
+    def __init__(self):
+        self.fields = None
+        self.header = b""
+        self.struct = None
+        self.buffer = bytearray()
+
+    @staticmethod
+    def code(value: Any) -> str:
+        if isinstance(value, bool):
+            return "?"
+        if isinstance(value, int):
+            return "q"
+        if isinstance(value, float):
+            return "d"
+        return ""
+
+    def dumps(self, data: Dict[str, Any]) -> bytes:
+        items = [(name, value) for name, value in flatten(data) if self.code(value)]
+        fields = [(name, self.code(value)) for name, value in items]
+        if fields != self.fields:
+            # Schema changed (first tick, new field or type change): build header, struct and buffer again
+            codes = "".join(code for _, code in fields)
+            schema = (codes + "\n" + "\n".join(name for name, _ in fields)).encode()
+            self.fields = fields
+            self.header = self.MAGIC + struct.pack("<I", len(schema)) + schema
+            self.struct = struct.Struct("<" + codes)
+            self.buffer = bytearray(len(self.header) + self.struct.size)
+            self.buffer[: len(self.header)] = self.header
+        self.struct.pack_into(self.buffer, len(self.header), *[value for _, value in items])
+        return bytes(self.buffer)
+
+    @classmethod
+    def loads(cls, payload: bytes) -> Dict[str, Any]:
+        # Decode to a flat {name: value} dict
+        if payload[:4] != cls.MAGIC:
+            raise ValueError("Not a hardware-stats binary snapshot")
+        (schema_length,) = struct.unpack_from("<I", payload, 4)
+        codes, *names = bytes(payload[8 : 8 + schema_length]).decode().split("\n")
+        values = struct.unpack_from("<" + codes, payload, 8 + schema_length)
+        return dict(zip(names, values))
+
+
+SERIALIZERS = {
+    serializer.name: serializer
+    for serializer in [YamlSerializer, JsonSerializer, PrometheusSerializer, BinarySerializer]
+}
+
+
+def get_serializer(name: str) -> Serializer:
+    return SERIALIZERS[name]()
@@ -0,0 +1,200 @@
+# coding:utf-8
+# Shared memory snapshots: the latest snapshot is published in a memory-mapped file (e.g. under /dev/shm) with a
+# fixed layout, so readers get the values without opening, reading or parsing a file at each poll.
+# Only depends on the standard library: readers can copy this file in their own programs.
+#
+# Layout (little-endian):
+#   header    64 bytes: magic "HWSM", version (uint32), generation (uint64), layout (uint64), size (uint32),
+#             schema offset (uint32), schema length (uint32), data offset (uint32), field count (uint32)
+#   schema    field codes, a new line, then the new line separated field names (UTF-8)
+#   data      one 8-byte slot per field: "d" float64, "q" int64, "?" boolean stored as int64
+#
+# The generation is a seqlock: odd while the writer updates the region, incremented again when done.
+# A reader copies the values between two reads of an even and unchanged generation, so it never returns
+# a half-written snapshot. layout changes when the schema changes, size when the region grows.
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Tuple, Union
+
+MAGIC = b"HWSM"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQIIIII")
+HEADER_SIZE = 64
+# Index of the generation and of the layout in the header seen as uint64
+GENERATION_INDEX = 1
+LAYOUT_INDEX = 2
+PAGE_SIZE = mmap.PAGESIZE
+
+Value = Union[float, int, bool]
+
+
+def slot_format(codes: str) -> str:
+    return "<" + codes.replace("?", "q")
+
+
+class ShmWriter:
+    def __init__(self, path: str, size: int = 4 * PAGE_SIZE):
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self.size = 0
+        self.mm = None
+        self.generation = 0
+        self.layout = 0
+        self.fields = None
+        self.struct = None
+        self.data_offset = HEADER_SIZE
+        self.map(size)
+        self.write_header(0, 0, 0)
+
+    def map(self, size: int):
+        # (Re)map the region with the given size, readers remap when they see the new size
+        self.release()
+        os.ftruncate(self.fd, size)
+        self.size = size
+        self.mm = mmap.mmap(self.fd, size)
+        self.header = memoryview(self.mm)[:HEADER_SIZE].cast("Q")
+
+    def release(self):
+        if self.mm is not None:
+            self.header.release()
+            self.mm.close()
+            self.mm = None
+
+    def write_header(self, schema_length: int, data_offset: int, field_count: int):
+        HEADER.pack_into(
+            self.mm, 0, MAGIC, VERSION, self.generation, self.layout, self.size,
+            HEADER_SIZE, schema_length, data_offset, field_count,
+        )
+
+    def write(self, fields: List[Tuple[str, str]], values: List[Value]):
+        # fields: (name, code) of every value, the schema is only written again when it changes
+        self.generation += 1
+        self.header[GENERATION_INDEX] = self.generation
+        if fields != self.fields:
+            codes = "".join(code for _, code in fields)
+            schema = (codes + "\n" + "\n".join(name for name, _ in fields)).encode()
+            # Values are 8-byte aligned after the schema
+            data_offset = (HEADER_SIZE + len(schema) + 7) // 8 * 8
+            needed = data_offset + 8 * len(fields)
+            if needed > self.size:
+                size = self.size
+                while size < needed:
+                    size *= 2
+                self.map(size)
+                self.header[GENERATION_INDEX] = self.generation
+            self.layout += 1
+            self.mm[HEADER_SIZE : HEADER_SIZE + len(schema)] = schema
+            self.fields = fields
+            self.struct = struct.Struct(slot_format(codes))
+            self.data_offset = data_offset
+            self.write_header(len(schema), data_offset, len(fields))
+        self.struct.pack_into(self.mm, self.data_offset, *values)
+        # x86 keeps the order of the stores; the even generation is written last
+        self.generation += 1
+        self.header[GENERATION_INDEX] = self.generation
+
+    def close(self, remove: bool = True):
+        self.release()
+        os.close(self.fd)
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class ShmReader:
+    # Tries to get a consistent copy before giving up, when the writer is stuck in the middle of an update
+    MAX_RETRIES = 10000
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mm = None
+        self.header = None
+        self.size = 0
+        # Layout of the loaded schema, -1 until it is loaded
+        self.layout = -1
+        self.names = []
+        self.booleans = []
+        self.struct = None
+        self.data_offset = HEADER_SIZE
+        self.fd = os.open(path, os.O_RDONLY)
+        self.map()
+
+    def map(self):
+        self.release()
+        self.mm = mmap.mmap(self.fd, 0, access=mmap.ACCESS_READ)
+        self.header = memoryview(self.mm)[:HEADER_SIZE].cast("Q")
+        magic, version = struct.unpack_from("<4sI", self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a hardware-stats shared memory snapshot: %s" % self.path)
+        self.size = len(self.mm)
+        self.layout = -1
+
+    def release(self):
+        if self.mm is not None:
+            self.header.release()
+            self.mm.close()
+            self.mm = None
+
+    @property
+    def generation(self) -> int:
+        # Changes with every snapshot, cheap way to know whether there is anything new
+        return self.header[GENERATION_INDEX]
+
+    def load_layout(self):
+        (_, _, _, layout, size, schema_offset, schema_length, data_offset, _) = HEADER.unpack_from(self.mm, 0)
+        if size > self.size:
+            # Region grown by the writer, only case of a system call after the initial map
+            self.map()
+            return self.load_layout()
+        codes, *names = bytes(self.mm[schema_offset : schema_offset + schema_length]).decode().split("\n")
+        if not codes:
+            names = []
+        self.layout = layout
+        self.names = names
+        self.booleans = [index for index, code in enumerate(codes) if code == "?"]
+        self.struct = struct.Struct(slot_format(codes))
+        self.data_offset = data_offset
+
+    def read_values(self) -> Tuple[int, tuple]:
+        # Generation and values of a consistent snapshot
+        header = self.header
+        for retry in range(self.MAX_RETRIES):
+            if retry and retry % 64 == 0:
+                # The writer is in the middle of an update: let it run instead of spinning
+                time.sleep(0)
+            before = header[GENERATION_INDEX]
+            if before & 1:
+                continue
+            if header[LAYOUT_INDEX] != self.layout:
+                try:
+                    self.load_layout()
+                    header = self.header
+                    values = self.struct.unpack_from(self.mm, self.data_offset)
+                except (ValueError, UnicodeDecodeError, struct.error):
+                    values = None
+                if values is None or header[GENERATION_INDEX] != before:
+                    # Torn schema read: load it again at the next try
+                    self.layout = -1
+                    continue
+                return before, values
+            values = self.struct.unpack_from(self.mm, self.data_offset)
+            if header[GENERATION_INDEX] == before:
+                return before, values
+        raise TimeoutError("Shared memory snapshot is still being written: %s" % self.path)
+
+    def read(self) -> Dict[str, Value]:
+        # Flat {"Cpu.percentage": 12.5, ...} dict of the latest snapshot, empty before the first one
+        _, values = self.read_values()
+        if self.booleans:
+            values = list(values)
+            for index in self.booleans:
+                values[index] = bool(values[index])
+        return dict(zip(self.names, values))
+
+    def close(self):
+        self.release()
+        os.close(self.fd)
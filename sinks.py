@@ -0,0 +1,466 @@
+# coding:utf-8
+# Output sinks: every snapshot built by the main loop is published to each enabled sink
+import os
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs
+
+from log import logger
+from serializers import BinarySerializer, JsonSerializer, PrometheusSerializer, Serializer, flatten
+from history import History
+from rollup import Rollups
+from shm import ShmWriter
+
+
+class Sink:
+    name = ""
+
+    def publish(self, data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileSink(Sink):
+    # State file read by the other programs, written in a sibling file then renamed over it with os.replace:
+    # same file system, so the rename is atomic and never a copy, readers see the old or the new file
+    name = "file"
+    # A reader holding the state file open on Windows makes the rename fail for a moment
+    REPLACE_RETRIES = 3
+
+    def __init__(
+        self,
+        path: str,
+        serializer: Serializer,
+        fsync_every: int = 0,
+        fsync_on_close: bool = False,
+    ):
+        self.path = path
+        self.serializer = serializer
+        # fsync the file and its directory every N publications (0: never), and/or when closed
+        self.fsync_every = fsync_every
+        self.fsync_on_close = fsync_on_close
+        directory, name = os.path.split(os.path.abspath(path))
+        self.temp_path = os.path.join(directory, "." + name + ".tmp")
+        self.flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+        # Text written like a file opened in text mode: with the platform line endings
+        self.newline = os.linesep.encode() if os.linesep != "\n" else None
+        # Directory kept open for fsync, not possible on Windows
+        self.dir_fd = None
+        if (fsync_every or fsync_on_close) and hasattr(os, "O_DIRECTORY"):
+            self.dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        self.published = 0
+        self.replace_failed = False
+
+    def publish(self, data: Dict[str, Any]):
+        payload = self.serializer.dumps(data)
+        if not self.serializer.binary:
+            payload = payload.encode("utf-8")
+            if self.newline:
+                payload = payload.replace(b"\n", self.newline)
+        self.published += 1
+        sync = self.fsync_every and self.published % self.fsync_every == 0
+        fd = os.open(self.temp_path, self.flags, 0o644)
+        try:
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(fd, view) :]
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.replace()
+        if sync:
+            self.sync_directory()
+
+    def replace(self):
+        for retry in range(self.REPLACE_RETRIES):
+            try:
+                os.replace(self.temp_path, self.path)
+                self.replace_failed = False
+                return
+            except PermissionError as e:
+                if retry + 1 < self.REPLACE_RETRIES:
+                    time.sleep(0.01)
+                elif not self.replace_failed:
+                    # Published again at the next tick, only log once in a row
+                    self.replace_failed = True
+                    logger.warning("Cannot replace %s: %s" % (self.path, e))
+
+    def sync_directory(self):
+        # Makes the rename itself durable
+        if self.dir_fd is not None:
+            os.fsync(self.dir_fd)
+
+    def close(self):
+        if self.fsync_on_close and os.path.exists(self.path):
+            # Opened for writing: Windows cannot flush a read-only handle
+            fd = os.open(self.path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.sync_directory()
+        if self.dir_fd is not None:
+            os.close(self.dir_fd)
+            self.dir_fd = None
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class SharedMemorySink(Sink):
+    # Fixed layout memory-mapped snapshot, read with shm.ShmReader. Strings are left out, like in the binary format
+    name = "shm"
+
+    def __init__(self, path: str):
+        self.writer = ShmWriter(path)
+        logger.info("Publishing snapshots in shared memory: %s" % path)
+
+    def publish(self, data: Dict[str, Any]):
+        fields = []
+        values = []
+        for name, value in flatten(data):
+            code = BinarySerializer.code(value)
+            if code:
+                fields.append((name, code))
+                values.append(value)
+        self.writer.write(fields, values)
+
+    def close(self):
+        self.writer.close()
+
+
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1: connections are kept alive between the requests of a scraper
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path, _, query = self.path.partition("?")
+        if path == "/history":
+            self.history(parse_qs(query))
+            return
+        if path == "/rollups":
+            self.rollups(parse_qs(query))
+            return
+        body = self.server.sink.body(path)
+        if body is None:
+            self.send_error(404)
+            return
+        payload, etag, content_type = body
+        if etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def history(self, query: Dict[str, list]):
+        # /history: recorded fields, /history?field=Cpu.percentage&seconds=60&last=100: samples and statistics
+        history = self.server.sink.history
+        if history is None:
+            self.send_error(404, "History is not enabled")
+            return
+        try:
+            if "field" not in query:
+                result = history.fields()
+            else:
+                since = None
+                if "seconds" in query:
+                    since = time.time() - float(query["seconds"][0])
+                last = int(query["last"][0]) if "last" in query else None
+                result = history.query(query["field"][0], since, last)
+        except KeyError:
+            self.send_error(404, "Unknown field")
+            return
+        except ValueError:
+            self.send_error(400, "Invalid seconds or last")
+            return
+        self.send_json(result)
+
+    def rollups(self, query: Dict[str, list]):
+        # /rollups: resolutions, /rollups?resolution=60&field=Cpu.percentage&seconds=3600: closed buckets of a field
+        rollups = self.server.sink.rollups
+        if rollups is None:
+            self.send_error(404, "Rollups are not enabled")
+            return
+        try:
+            if "field" not in query or "resolution" not in query:
+                result = [
+                    {"resolution": tier.resolution, "retention": tier.retention} for tier in rollups.tiers
+                ]
+            else:
+                since = None
+                if "seconds" in query:
+                    since = time.time() - float(query["seconds"][0])
+                result = rollups.query(float(query["resolution"][0]), query["field"][0], since)
+        except KeyError:
+            self.send_error(404, "Unknown resolution")
+            return
+        except ValueError:
+            self.send_error(400, "Invalid resolution or seconds")
+            return
+        self.send_json(result)
+
+    def send_json(self, result: Any):
+        payload = self.server.sink.query_serializer.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # One line per request would flood the log
+        pass
+
+
+class HttpSink(Sink):
+    # Latest snapshot served on /metrics (Prometheus text format) and /snapshot (JSON), and history queries on
+    # /history and /rollups when a History and Rollups are given.
+    # Bodies are serialized at the first request after each snapshot and shared by all the following ones
+    name = "http"
+    FORMATS = {
+        "/metrics": (PrometheusSerializer, "text/plain; version=0.0.4; charset=utf-8"),
+        "/snapshot": (JsonSerializer, "application/json"),
+    }
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        history: Optional[History] = None,
+        rollups: Optional[Rollups] = None,
+    ):
+        self.serializers = {path: serializer() for path, (serializer, _) in self.FORMATS.items()}
+        self.history = history
+        self.rollups = rollups
+        self.query_serializer = JsonSerializer()
+        self.lock = threading.Lock()
+        self.data = None
+        self.generation = 0
+        # ETag prefix: a new agent process does not reuse the ETags of the previous one
+        self.started_at = "%x" % time.time_ns()
+        # path -> (generation, body, ETag)
+        self.cache = {}
+        self.server = ThreadingHTTPServer((host, port), SnapshotRequestHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.thread = threading.Thread(target=self.server.serve_forever, name="http-sink", daemon=True)
+        self.thread.start()
+        logger.info("Serving snapshots on http://%s:%s/metrics and /snapshot" % (host, port))
+
+    def publish(self, data: Dict[str, Any]):
+        # The main loop builds a new dict at every tick: the previous one is kept as is by the requests using it
+        with self.lock:
+            self.data = data
+            self.generation += 1
+
+    def body(self, path: str):
+        # (payload, ETag, content type) of the latest snapshot, None for an unknown path
+        if path not in self.FORMATS:
+            return None
+        with self.lock:
+            cached = self.cache.get(path)
+            if cached is None or cached[0] != self.generation:
+                if self.data is None:
+                    payload = b""
+                else:
+                    payload = self.serializers[path].dumps(self.data).encode("utf-8")
+                etag = '"%s-%x"' % (self.started_at, self.generation)
+                cached = self.cache[path] = (self.generation, payload, etag)
+        return cached[1], cached[2], self.FORMATS[path][1]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StreamClient:
+    def __init__(self, sock: socket.socket, max_queue: int):
+        self.sock = sock
+        self.request = b""
+        # Subscribed sections, empty for all of them. None until the subscription line is received
+        self.sections = None
+        # Messages waiting to be sent: the oldest ones are dropped when a slow client lets it fill up
+        self.queue = deque(maxlen=max_queue)
+        # Rest of the message being sent, never dropped so the stream stays framed
+        self.pending = b""
+        self.dropped = 0
+
+    def push(self, message: bytes):
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(message)
+
+    def flush(self) -> bool:
+        # Send as much as possible without blocking, True when everything was sent
+        while True:
+            if not self.pending:
+                if not self.queue:
+                    return True
+                self.pending = memoryview(self.queue.popleft())
+            try:
+                sent = self.sock.send(self.pending)
+            except BlockingIOError:
+                return False
+            self.pending = self.pending[sent:]
+
+
+class StreamSink(Sink):
+    # Push stream of the snapshots on a Unix domain socket, one JSON line per snapshot (NDJSON).
+    # A client first sends a line with the sections it wants, comma separated (e.g. "Net,Cpu"), or an empty line
+    # for all of them; Tick is always sent. A socket thread does all the (non-blocking) I/O: the main loop only
+    # queues the messages, and a slow client only loses its own oldest messages
+    name = "stream"
+    MAX_REQUEST = 1024
+
+    def __init__(self, path: str, max_queue: int = 16):
+        self.path = path
+        self.max_queue = max_queue
+        self.serializer = JsonSerializer()
+        self.clients: Dict[socket.socket, StreamClient] = {}
+        if os.path.exists(path):
+            # Left by a previous run
+            os.remove(path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(path)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        # Wakes up the socket thread when new messages are queued
+        self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+        self.wakeup_reader.setblocking(False)
+        self.wakeup_writer.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.selector.register(self.wakeup_reader, selectors.EVENT_READ)
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, name="stream-sink", daemon=True)
+        self.thread.start()
+        logger.info("Streaming snapshots on %s" % path)
+
+    def publish(self, data: Dict[str, Any]):
+        # Serialized once per distinct subscription
+        messages = {}
+        for client in list(self.clients.values()):
+            if client.sections is None:
+                continue
+            message = messages.get(client.sections)
+            if message is None:
+                subset = data
+                if client.sections:
+                    subset = {
+                        name: value
+                        for name, value in data.items()
+                        if name in client.sections or name == "Tick"
+                    }
+                message = messages[client.sections] = self.serializer.dumps(subset).encode("utf-8")
+            client.push(message)
+        if messages:
+            self.wake()
+
+    def wake(self):
+        try:
+            self.wakeup_writer.send(b"\0")
+        except BlockingIOError:
+            # Already woken up
+            pass
+
+    def serve(self):
+        while self.running:
+            for key, events in self.selector.select():
+                if key.fileobj is self.listener:
+                    self.accept()
+                elif key.fileobj is self.wakeup_reader:
+                    try:
+                        while self.wakeup_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    client = self.clients.get(key.fileobj)
+                    if client is None:
+                        continue
+                    if events & selectors.EVENT_READ:
+                        self.receive(client)
+            for client in list(self.clients.values()):
+                self.flush(client)
+
+    def accept(self):
+        try:
+            sock, _ = self.listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        self.clients[sock] = StreamClient(sock, self.max_queue)
+        self.selector.register(sock, selectors.EVENT_READ)
+
+    def receive(self, client: StreamClient):
+        try:
+            received = client.sock.recv(self.MAX_REQUEST)
+        except BlockingIOError:
+            return
+        except OSError:
+            received = b""
+        if not received:
+            self.disconnect(client)
+            return
+        if client.sections is not None:
+            # Nothing more is expected from a subscribed client
+            return
+        client.request += received
+        if b"\n" not in client.request:
+            if len(client.request) > self.MAX_REQUEST:
+                self.disconnect(client)
+            return
+        line = client.request.split(b"\n", 1)[0].decode("utf-8", "replace")
+        client.sections = frozenset(name.strip() for name in line.split(",") if name.strip())
+
+    def flush(self, client: StreamClient):
+        if client.sock not in self.clients:
+            return
+        try:
+            done = client.flush()
+        except OSError:
+            self.disconnect(client)
+            return
+        # Wait for the socket to be writable again only while something is left to send
+        events = selectors.EVENT_READ if done else selectors.EVENT_READ | selectors.EVENT_WRITE
+        if self.selector.get_key(client.sock).events != events:
+            self.selector.modify(client.sock, events)
+
+    def disconnect(self, client: StreamClient):
+        if client.dropped:
+            logger.info("Stream client disconnected, %d snapshots dropped" % client.dropped)
+        self.clients.pop(client.sock, None)
+        self.selector.unregister(client.sock)
+        client.sock.close()
+
+    def close(self):
+        self.running = False
+        self.wake()
+        self.thread.join(timeout=1)
+        for client in list(self.clients.values()):
+            self.disconnect(client)
+        self.selector.close()
+        self.listener.close()
+        self.wakeup_reader.close()
+        self.wakeup_writer.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,133 @@
+# coding:utf-8
+# Out-of-process collectors: a risky collector (native GPU or LHM calls that can hang in a driver) runs in a
+# child process, and the supervisor talks to it over a pipe. A child that misses its heartbeat is killed and
+# restarted with backoff: no Python-level timeout can get a thread back from a hung native call, a process can.
+import multiprocessing
+import signal
+import time
+from typing import Callable, Dict
+
+from log import logger
+from sensors import Stats
+
+# Spawn the workers in all platforms: forking a process running collector threads is not safe
+CONTEXT = multiprocessing.get_context("spawn")
+
+
+def worker_main(conn, factory: Callable[[], Dict[str, tuple]], name: str):
+    # Child process: build the collector, then answer each request with a record (or an error)
+    # Ctrl+C is sent to the whole process group: let the supervisor stop the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    collect = factory()[name][0]
+    conn.send(("ready", None))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            # Supervisor is gone
+            break
+        if request is None:
+            break
+        try:
+            conn.send(("ok", collect()))
+        except Exception as e:
+            conn.send(("error", "%s: %s" % (type(e).__name__, e)))
+
+
+class WorkerProcess:
+    # Delay before restarting a killed or dead worker, doubled after each failure in a row
+    MIN_RESTART_DELAY = 1
+    MAX_RESTART_DELAY = 60
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Dict[str, tuple]],
+        heartbeat: float,
+        startup_timeout: float = 30,
+    ):
+        # factory() must be picklable: it is called again in the child to build the collector by name
+        self.name = name
+        self.factory = factory
+        self.heartbeat = heartbeat  # Maximal time to answer a request, in seconds
+        self.startup_timeout = startup_timeout
+        self.restarts = 0
+        self.process = None
+        self.conn = None
+        self._restart_delay = self.MIN_RESTART_DELAY
+        self._restart_at = 0
+
+    def start(self):
+        parent_conn, child_conn = CONTEXT.Pipe()
+        self.process = CONTEXT.Process(
+            target=worker_main,
+            args=(child_conn, self.factory, self.name),
+            name="collector-%s" % self.name,
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.receive(self.startup_timeout)
+        logger.info("%s collector worker started (PID %s)" % (self.name, self.process.pid))
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout=1)
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+    def receive(self, timeout: float):
+        if not self.conn.poll(timeout):
+            raise TimeoutError("no answer after %ss" % timeout)
+        status, payload = self.conn.recv()
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def failed(self, error: Exception):
+        # Kill the worker, and wait longer before each restart while it keeps failing
+        self.kill()
+        self._restart_at = time.monotonic() + self._restart_delay
+        logger.warning(
+            "%s collector worker killed (%s), restarting in %ss"
+            % (self.name, error, self._restart_delay)
+        )
+        self._restart_delay = min(self._restart_delay * 2, self.MAX_RESTART_DELAY)
+        self.restarts += 1
+
+    def collect(self) -> Stats:
+        # Called from the collector thread: it never blocks longer than the startup timeout or the heartbeat
+        if self.process is None:
+            if time.monotonic() < self._restart_at:
+                raise RuntimeError("worker is waiting for restart")
+            try:
+                self.start()
+            except (TimeoutError, EOFError, OSError, RuntimeError) as e:
+                self.failed(e)
+                raise
+        try:
+            self.conn.send("collect")
+            record = self.receive(self.heartbeat)
+        except RuntimeError:
+            # The collector raised in the worker: the worker itself is fine
+            raise
+        except (TimeoutError, EOFError, OSError) as e:
+            # Missed heartbeat or dead worker
+            self.failed(e)
+            raise
+        self._restart_delay = self.MIN_RESTART_DELAY
+        return record
@@ -0,0 +1,40 @@
+# coding:utf-8
+import unittest
+
+import sensors
+
+
+class CounterDeltasTest(unittest.TestCase):
+    def test_increase(self):
+        self.assertEqual(sensors.counter_deltas([15, 7], [10, 7], 1.0), [5, 0])
+
+    def test_wrap_near_32_bit_limit(self):
+        self.assertEqual(sensors.counter_deltas([5], [2**32 - 10], 1.0), [15])
+
+    def test_reset_far_from_32_bit_limit(self):
+        # 3.3 GB through a wrap in 1 s is not plausible: the counter counts again from 0
+        self.assertEqual(sensors.counter_deltas([5], [10**9], 1.0), [5])
+
+    def test_reset_too_fast_for_a_wrap(self):
+        # Near the limit, but 1.3 GB in 10 ms is not plausible either
+        self.assertEqual(sensors.counter_deltas([5], [3 * 10**9], 0.01), [5])
+
+    def test_reset_of_64_bit_counter(self):
+        self.assertEqual(sensors.counter_deltas([5, 20], [2**40, 10], 1.0), [5, 10])
+
+
+class DiskIORatesTest(unittest.TestCase):
+    def test_sector_counter_wrap(self):
+        # reads, writes, sectors read, sectors written, read ms, write ms
+        before = [[100], [0], [2**32 - 1000], [0], [50], [0]]
+        after = [[110], [0], [1000], [0], [70], [0]]
+        state = sensors.disk_io_rates(("sda",), before, 10.0, None, sensors.DeviceFilter(), 512)[1]
+        stats = sensors.disk_io_rates(("sda",), after, 11.0, state, sensors.DeviceFilter(), 512)[0]
+        device = stats.devices[0]
+        self.assertEqual(device.read_rate, 2000 * 512)
+        self.assertEqual(device.read_iops, 10)
+        self.assertEqual(device.read_await, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
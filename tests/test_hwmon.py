@@ -0,0 +1,138 @@
+# coding:utf-8
+# A hwmon tree in a temporary directory: regular files stand for the sysfs attributes
+import errno
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import hwmon
+import sensors_python
+from hwmon import HwmonIndex
+
+
+def write_chip(root: str, directory: str, files: dict):
+    path = os.path.join(root, directory)
+    for name, value in files.items():
+        os.makedirs(os.path.dirname(os.path.join(path, name)), exist_ok=True)
+        with open(os.path.join(path, name), "w") as f:
+            f.write("%s\n" % value)
+
+
+class HwmonIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+        write_chip(
+            self.root,
+            "hwmon0",
+            {
+                "name": "nct6775",
+                "fan1_input": 1200,
+                "fan1_label": "CPU Fan",
+                "fan1_min": 300,
+                "fan1_max": 2000,
+                "fan1_alarm": 0,
+                "fan2_input": 800,
+                "in0_input": 1104,
+                # Only an averaged power
+                "power1_average": 12500000,
+                # Both: the instant value wins
+                "power2_input": 5000000,
+                "power2_average": 6000000,
+            },
+        )
+        # Channels under the intermediate device directory, listed out of order
+        write_chip(
+            self.root,
+            "hwmon1",
+            {"name": "coretemp", "device/temp2_input": 50000, "device/temp1_input": 48500, "device/temp1_crit": 100000},
+        )
+        self.index = HwmonIndex(self.root, check_interval=0)
+        self.addCleanup(self.index.close)
+
+    def test_channels(self):
+        fans = self.index.channels("fan")
+        self.assertEqual([(fan.chip.name, fan.number) for fan in fans], [("nct6775", 1), ("nct6775", 2)])
+        self.assertEqual([channel.number for channel in self.index.channels("temp")], [1, 2])
+        self.assertEqual([channel.number for channel in self.index.channels("in")], [0])
+        self.assertEqual(self.index.channels("curr"), [])
+
+    def test_input_or_average(self):
+        power = {channel.number: channel for channel in self.index.channels("power")}
+        self.assertEqual(power[1].read(), 12.5)
+        self.assertEqual(power[2].read(), 5.0)
+
+    def test_static_attributes(self):
+        fan1, fan2 = self.index.channels("fan")
+        self.assertEqual((fan1.label, fan1.min, fan1.max), ("CPU Fan", 300, 2000))
+        # No label: the channel name, no limits
+        self.assertEqual((fan2.label, fan2.min, fan2.max), ("fan2", None, None))
+        self.assertEqual(self.index.first_channel("coretemp", "temp").label, "temp1")
+        self.assertIsNone(self.index.first_channel("coretemp", "fan"))
+        self.assertIsNone(self.index.first_channel("k10temp", "temp"))
+
+    def test_scaling(self):
+        fan = self.index.first_channel("nct6775", "fan")
+        self.assertEqual(fan.read(), 1200)
+        self.assertIsInstance(fan.read(), int)
+        self.assertEqual(self.index.first_channel("coretemp", "temp").read(), 48.5)
+        self.assertEqual(self.index.first_channel("nct6775", "in").read(), 1.104)
+
+    def test_reads_cached_file(self):
+        fan = self.index.first_channel("nct6775", "fan")
+        fd = fan.fd
+        write_chip(self.root, "hwmon0", {"fan1_input": 950})
+        # Same file descriptor, current value
+        self.assertEqual(fan.read(), 950)
+        self.assertEqual(fan.fd, fd)
+        write_chip(self.root, "hwmon0", {"fan1_input": "N/A"})
+        self.assertIsNone(fan.read())
+        self.assertFalse(fan.gone)
+
+    def test_rebuilt_on_new_directory(self):
+        channels = self.index.channels("fan")
+        # Not rebuilt while the directories are the same
+        self.assertIs(self.index.channels("fan")[0], channels[0])
+        write_chip(self.root, "hwmon10", {"name": "amdgpu", "fan1_input": 1500})
+        write_chip(self.root, "hwmon2", {"name": "nvme", "temp1_input": 40000})
+        fans = self.index.channels("fan")
+        self.assertIsNot(fans[0], channels[0])
+        self.assertEqual([chip.name for chip in self.index.chips], ["nct6775", "coretemp", "nvme", "amdgpu"])
+        self.assertEqual([fan.chip.name for fan in fans], ["nct6775", "nct6775", "amdgpu"])
+        self.assertEqual(self.index.first_channel("amdgpu", "fan").read(), 1500)
+
+    def test_check_interval(self):
+        index = HwmonIndex(self.root, check_interval=60)
+        self.addCleanup(index.close)
+        self.assertEqual(len(index.channels("fan")), 2)
+        write_chip(self.root, "hwmon2", {"name": "amdgpu", "fan1_input": 1500})
+        self.assertEqual(len(index.channels("fan")), 2)
+        index._checked_at -= 60
+        self.assertEqual(len(index.channels("fan")), 3)
+
+    def test_invalidated_after_gone_read(self):
+        fan = self.index.first_channel("nct6775", "fan")
+        # Driver reloaded under the same hwmonN name: the cached file descriptor reads ENODEV
+        with mock.patch.object(hwmon.os, "pread", side_effect=OSError(errno.ENODEV, "No such device")):
+            with mock.patch.object(sensors_python, "HWMON", self.index):
+                self.assertIsNone(sensors_python.read_channel(fan))
+        self.assertTrue(fan.gone)
+        # Same directories, but rebuilt on the next check
+        renewed = self.index.first_channel("nct6775", "fan")
+        self.assertIsNot(renewed, fan)
+        self.assertFalse(renewed.gone)
+        self.assertEqual(renewed.read(), 1200)
+
+    def test_other_read_error_not_gone(self):
+        fan = self.index.first_channel("nct6775", "fan")
+        with mock.patch.object(hwmon.os, "pread", side_effect=OSError(errno.EIO, "Input/output error")):
+            with mock.patch.object(sensors_python, "HWMON", self.index):
+                self.assertIsNone(sensors_python.read_channel(fan))
+        self.assertFalse(fan.gone)
+        self.assertIs(self.index.first_channel("nct6775", "fan"), fan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+# coding:utf-8
+# The sensor index only relies on duck typing: plain objects stand for the LibreHardwareMonitor ones
+import unittest
+
+from lhm_index import Metric, Rule, SensorIndex
+
+
+class Sensor:
+    def __init__(self, sensor_type: str, name: str, value=None):
+        self.SensorType = sensor_type
+        self.Name = name
+        self.Value = value
+
+
+class Hardware:
+    def __init__(self, identifier: str, sensors: list, sub_hardware: list = ()):
+        self.Identifier = identifier
+        self.Sensors = sensors
+        self.SubHardware = list(sub_hardware)
+
+
+class Wrapper(Hardware):
+    # Another Python object for the same hardware, equal to it like pythonnet wrappers of one .NET object
+    def __init__(self, hardware: Hardware):
+        super().__init__(hardware.Identifier, hardware.Sensors, hardware.SubHardware)
+        self.target = getattr(hardware, "target", hardware)
+
+    def __eq__(self, other):
+        return self.target is getattr(other, "target", other)
+
+
+TEMPERATURE = Metric(
+    [
+        Rule("Temperature", prefix="Core Average"),
+        Rule("Temperature", prefix="CPU Package"),
+        Rule("Temperature", prefix="Core"),
+    ]
+)
+
+
+class RuleTest(unittest.TestCase):
+    def test_matches(self):
+        rule = Rule("Clock", prefix="Core", contains="#", excludes="Effective")
+        self.assertTrue(rule.matches("Clock", "Core #1"))
+        self.assertFalse(rule.matches("Clock", "Core #1 (Effective)"))
+        self.assertFalse(rule.matches("Load", "Core #1"))
+        self.assertFalse(rule.matches("Clock", "Bus Speed"))
+
+    def test_suffix(self):
+        rule = Rule("SmallData", prefix="D3D", suffix="Memory Used")
+        self.assertTrue(rule.matches("SmallData", "D3D Dedicated Memory Used"))
+        self.assertFalse(rule.matches("SmallData", "D3D Dedicated Memory Free"))
+
+
+class ValueTest(unittest.TestCase):
+    def test_fallback_order(self):
+        package = Sensor("Temperature", "CPU Package", 60)
+        core = Sensor("Temperature", "Core #1", 50)
+        resolved = SensorIndex({"temperature": TEMPERATURE}).resolve(Hardware("/cpu/0", [core, package]))
+        # CPU Package comes before Core in the chain, whatever the order of the sensors
+        self.assertEqual(resolved.value("temperature"), 60.0)
+        package.Value = None
+        self.assertEqual(resolved.value("temperature"), 50.0)
+        core.Value = None
+        self.assertEqual(resolved.value("temperature"), -1)
+
+    def test_zero_falls_back(self):
+        metric = Metric(
+            [Rule("Load", prefix="GPU Core"), Rule("Load", prefix="D3D 3D")], default=0, zero_falls_back=True
+        )
+        core = Sensor("Load", "GPU Core", 0)
+        d3d = Sensor("Load", "D3D 3D", 33)
+        resolved = SensorIndex({"load": metric}).resolve(Hardware("/gpu/0", [core, d3d]))
+        self.assertEqual(resolved.value("load"), 33.0)
+        d3d.Value = None
+        # Only zeros: the value is 0, not the default
+        self.assertEqual(resolved.value("load"), 0.0)
+        core.Value = None
+        self.assertEqual(resolved.value("load"), 0)
+        core.Value = 12
+        self.assertEqual(resolved.value("load"), 12.0)
+
+    def test_zero_without_fall_back(self):
+        metric = Metric([Rule("Load", prefix="GPU Core"), Rule("Load", prefix="D3D 3D")])
+        resolved = SensorIndex({"load": metric}).resolve(
+            Hardware("/gpu/0", [Sensor("Load", "GPU Core", 0), Sensor("Load", "D3D 3D", 33)])
+        )
+        self.assertEqual(resolved.value("load"), 0.0)
+
+    def test_average(self):
+        metric = Metric([Rule("Clock", contains="Core #", excludes="Effective")], average=True)
+        sensors = [
+            Sensor("Clock", "Core #1", 3000),
+            Sensor("Clock", "Core #2", 4000),
+            Sensor("Clock", "Core #3", None),
+            Sensor("Clock", "Core #1 (Effective)", 1000),
+        ]
+        resolved = SensorIndex({"frequency": metric}).resolve(Hardware("/cpu/0", sensors))
+        self.assertEqual(resolved.value("frequency"), 3500.0)
+
+    def test_sub_hardware(self):
+        fan = Sensor("Fan", "Fan #2", 900)
+        index = SensorIndex({"cpu_fan_rpm": Metric([Rule("Fan", contains="#2")])})
+        resolved = index.resolve(Hardware("/motherboard", [], [Hardware("/lpc/nct6798d", [fan])]))
+        self.assertTrue(resolved.has("cpu_fan_rpm"))
+        self.assertEqual(resolved.value("cpu_fan_rpm"), 900.0)
+
+
+class SensorIndexTest(unittest.TestCase):
+    def test_resolved_once(self):
+        index = SensorIndex({"temperature": TEMPERATURE})
+        hardware = Hardware("/cpu/0", [Sensor("Temperature", "Core #1", 50)])
+        resolved = index.resolve(hardware)
+        hardware.Sensors.append(Sensor("Temperature", "CPU Package", 60))
+        # Sensors added later are only seen after a rebuild
+        self.assertIs(index.resolve(hardware), resolved)
+        self.assertEqual(index.resolve(hardware).value("temperature"), 50.0)
+
+    def test_rebuilt_after_invalidate(self):
+        index = SensorIndex({"temperature": TEMPERATURE})
+        hardware = Hardware("/cpu/0", [Sensor("Temperature", "Core #1", 50)])
+        resolved = index.resolve(hardware)
+        hardware.Sensors.append(Sensor("Temperature", "CPU Package", 60))
+        index.invalidate(hardware)
+        self.assertIsNot(index.resolve(hardware), resolved)
+        self.assertEqual(index.resolve(hardware).value("temperature"), 60.0)
+        index.invalidate()
+        self.assertEqual(index.resolved, {})
+        self.assertEqual(index.by_object, {})
+
+    def test_rebuilt_when_too_old(self):
+        index = SensorIndex({"temperature": TEMPERATURE}, rebuild_interval=60)
+        hardware = Hardware("/cpu/0", [Sensor("Temperature", "Core #1", 50)])
+        resolved = index.resolve(hardware)
+        resolved.built_at -= 60
+        self.assertIsNot(index.resolve(hardware), resolved)
+
+    def test_new_wrapper_same_hardware(self):
+        index = SensorIndex({"temperature": TEMPERATURE})
+        hardware = Hardware("/cpu/0", [Sensor("Temperature", "Core #1", 50)])
+        resolved = index.resolve(Wrapper(hardware))
+        wrapper = Wrapper(hardware)
+        self.assertIs(index.resolve(wrapper), resolved)
+        # The latest wrapper is then found without the Identifier lookup
+        self.assertIs(index.by_object[id(wrapper)], resolved)
+        self.assertEqual(len(index.by_object), 1)
+
+    def test_same_identifier_other_hardware(self):
+        index = SensorIndex({"temperature": TEMPERATURE})
+        first = index.resolve(Hardware("/cpu/0", [Sensor("Temperature", "Core #1", 50)]))
+        # Not equal to the indexed object (another hardware now reported under this identifier): indexed again
+        second = index.resolve(Hardware("/cpu/0", [Sensor("Temperature", "Core #1", 70)]))
+        self.assertIsNot(second, first)
+        self.assertEqual(second.value("temperature"), 70.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
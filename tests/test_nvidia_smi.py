@@ -0,0 +1,126 @@
+# coding:utf-8
+import os
+import stat
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from nvidia_smi import NvidiaSmiStream, find_nvidia_smi
+
+GPU0 = "0, NVIDIA GeForce RTX 3080, GPU-aaaa, 35, 2048, 10240, 61, 40, 1710"
+GPU1 = "1, NVIDIA GeForce RTX 3070, GPU-bbbb, [N/A], 512, 8192, 48, [Not Supported], 1500"
+
+# Two samples of two GPUs, then exits like nvidia-smi losing the driver. Each run is logged with its arguments
+FAKE_NVIDIA_SMI = """#!/bin/sh
+echo "$@" >> "%s"
+printf '%%s\\n' "%s" "%s"
+printf '%%s\\n' "%s" "%s"
+"""
+
+
+class FastRestartStream(NvidiaSmiStream):
+    MIN_RESTART_DELAY = 0.05
+    MAX_RESTART_DELAY = 0.1
+
+
+class ParseLineTest(unittest.TestCase):
+    def setUp(self):
+        self.stream = NvidiaSmiStream(executable="nvidia-smi")
+
+    def test_batches(self):
+        self.stream._parse_line(GPU0)
+        self.stream._parse_line(GPU1)
+        # GPU count not known yet: the first sample ends with the next one
+        self.assertEqual(self.stream.gpus, [])
+        self.stream._parse_line(GPU0)
+        self.assertEqual([gpu.index for gpu in self.stream.gpus], [0, 1])
+        self.assertEqual(self.stream._gpu_count, 2)
+        first = self.stream.gpus
+        self.stream._parse_line(GPU1)
+        # Then published as soon as complete, as a new list
+        self.assertIsNot(self.stream.gpus, first)
+        self.assertEqual([gpu.index for gpu in self.stream.gpus], [0, 1])
+        self.assertTrue(self.stream.wait_ready(0))
+
+    def test_values(self):
+        self.stream._parse_line(GPU1)
+        self.stream._parse_line(GPU1)
+        gpu = self.stream.gpus[0]
+        self.assertEqual(gpu.name, "NVIDIA GeForce RTX 3070")
+        self.assertEqual(gpu.load, -1)
+        self.assertEqual(gpu.memory_used, 512.0)
+        self.assertEqual(gpu.fan_speed, -1)
+
+    def test_unexpected_lines(self):
+        self.stream._parse_line("")
+        self.stream._parse_line("Failed to initialize NVML: Driver/library version mismatch")
+        self.stream._parse_line(GPU0)
+        self.assertEqual(len(self.stream._batch), 1)
+
+    def test_latest_staleness(self):
+        self.assertEqual(self.stream.latest(), [])
+        self.stream._parse_line(GPU0)
+        self.stream._parse_line(GPU0)
+        self.assertEqual(len(self.stream.latest()), 1)
+        # 5 s at least, or 10 intervals
+        self.stream.updated_at -= 4
+        self.assertEqual(len(self.stream.latest()), 1)
+        self.stream.updated_at -= 2
+        self.assertEqual(self.stream.latest(), [])
+
+
+@unittest.skipIf(os.name == "nt", "fake nvidia-smi is a shell script")
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.runs = os.path.join(directory.name, "runs.txt")
+        script = os.path.join(directory.name, "nvidia-smi")
+        with open(script, "w") as f:
+            f.write(FAKE_NVIDIA_SMI % (self.runs, GPU0, GPU1, GPU0, GPU1))
+        os.chmod(script, os.stat(script).st_mode | stat.S_IXUSR)
+        path = mock.patch.dict(os.environ, {"PATH": directory.name + os.pathsep + os.environ.get("PATH", "")})
+        path.start()
+        self.addCleanup(path.stop)
+        self.script = script
+
+    def read_runs(self):
+        try:
+            with open(self.runs) as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def test_found_on_path(self):
+        self.assertEqual(find_nvidia_smi(), self.script)
+
+    def test_samples_and_respawn(self):
+        stream = FastRestartStream(interval=0.2)
+        self.addCleanup(stream.stop)
+        stream.start()
+        self.assertTrue(stream.wait_ready(5))
+        deadline = time.monotonic() + 5
+        while stream.restarts < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # The child exited after its samples and was started again
+        self.assertGreaterEqual(stream.restarts, 2)
+        self.assertGreaterEqual(len(self.read_runs()), 2)
+        self.assertTrue(stream.is_running())
+        self.assertEqual([gpu.uuid for gpu in stream.latest()], ["GPU-aaaa", "GPU-bbbb"])
+        self.assertEqual(
+            self.read_runs()[0].split(),
+            [
+                "--query-gpu=index,name,uuid,utilization.gpu,memory.used,memory.total,temperature.gpu,fan.speed,"
+                "clocks.gr",
+                "--format=csv,noheader,nounits",
+                "-lms",
+                "200",
+            ],
+        )
+        stream.stop()
+        self.assertFalse(stream.is_running())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# coding:utf-8
+# Real worker processes (spawned): the collector factories are module-level functions, picklable for the child
+import time
+import unittest
+
+from supervisor import WorkerProcess
+
+
+def block_forever():
+    # Like a native call hung in a driver: never returns
+    while True:
+        time.sleep(3600)
+
+
+def blocking_collectors():
+    return {"Blocking": (block_forever, None)}
+
+
+def answering_collectors():
+    return {"Answering": (lambda: "record", None)}
+
+
+class FastRestartWorker(WorkerProcess):
+    MIN_RESTART_DELAY = 0.1
+    MAX_RESTART_DELAY = 0.3
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.killed = []
+
+    def kill(self):
+        if self.process is not None:
+            self.killed.append(self.process)
+        super().kill()
+
+
+class WorkerProcessTest(unittest.TestCase):
+    def make_worker(self, name: str, factory) -> WorkerProcess:
+        worker = FastRestartWorker(name, factory, heartbeat=0.3)
+        self.addCleanup(worker.stop)
+        return worker
+
+    def test_missed_heartbeat_kills_and_restarts(self):
+        worker = self.make_worker("Blocking", blocking_collectors)
+        delays = []
+        for restarts in range(1, 4):
+            # Wait for the restart time of the previous failure
+            time.sleep(max(worker._restart_at - time.monotonic(), 0))
+            with self.assertRaises(TimeoutError):
+                worker.collect()
+            delays.append(worker._restart_at - time.monotonic())
+            self.assertEqual(worker.restarts, restarts)
+            self.assertIsNone(worker.process)
+            # The child blocked in the collector was killed
+            self.assertEqual(len(worker.killed), restarts)
+            self.assertFalse(worker.killed[-1].is_alive())
+            self.assertIsNotNone(worker.killed[-1].exitcode)
+        # A new child each time
+        self.assertEqual(len({process.pid for process in worker.killed}), 3)
+        # 0.1, 0.2, then capped at 0.3
+        self.assertLess(delays[0], delays[1])
+        self.assertLess(delays[1], delays[2])
+        self.assertAlmostEqual(delays[2], 0.3, delta=0.1)
+
+    def test_waiting_for_restart(self):
+        worker = self.make_worker("Blocking", blocking_collectors)
+        with self.assertRaises(TimeoutError):
+            worker.collect()
+        # No new child before the restart delay
+        with self.assertRaises(RuntimeError):
+            worker.collect()
+        self.assertIsNone(worker.process)
+        self.assertEqual(worker.restarts, 1)
+
+    def test_answer_resets_backoff(self):
+        worker = self.make_worker("Answering", answering_collectors)
+        worker._restart_delay = FastRestartWorker.MAX_RESTART_DELAY
+        self.assertEqual(worker.collect(), "record")
+        self.assertEqual(worker.collect(), "record")
+        self.assertEqual(worker._restart_delay, FastRestartWorker.MIN_RESTART_DELAY)
+        self.assertEqual(worker.restarts, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+# coding:utf-8
+# Append-only time-series log: every snapshot is appended as a fixed-width record (timestamp and one float64
+# per numeric field) to segment files, read back with mmap and a binary search on the timestamps.
+#
+# Segment file "<first timestamp in ms>.hsl" (little-endian):
+#   magic "HWSL" | header length (uint32) | field count (uint32) | new line separated field names, padded to 8 bytes
+#   records: timestamp (float64) then the values (float64, NaN when missing), one record per snapshot
+# A new segment starts when the current one is too big or too old, or when the fields change.
+#
+# Query: python tslog.py DIRECTORY [--start TIME] [--end TIME] [--fields NAME,...] [--format csv|json]
+import argparse
+import bisect
+import csv
+import datetime
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from serializers import flatten
+
+MAGIC = b"HWSL"
+PREAMBLE = struct.Struct("<4sII")
+EXTENSION = ".hsl"
+
+
+class TimeSeriesLog:
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 64 * 1024 * 1024,
+        segment_seconds: float = 3600,
+        batch: int = 20,
+        keep: int = 0,
+    ):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        # Records buffered before a write: a crash loses at most one batch
+        self.batch = batch
+        # Number of segments kept, the oldest ones are removed (0 to keep all)
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        self.fields = None
+        self.record = None
+        self.buffer = bytearray()
+        self.buffered = 0
+        self.fd = None
+        self.segment_size = 0
+        self.segment_started = 0
+
+    def append(self, timestamp: float, data: Dict[str, Any]):
+        values = {
+            name: value for name, value in flatten(data) if isinstance(value, (int, float))
+        }
+        if (
+            self.fields is None
+            or list(values) != self.fields
+            or self.segment_size >= self.segment_bytes
+            or timestamp - self.segment_started >= self.segment_seconds
+        ):
+            self.rotate(timestamp, values)
+        # Only a copy into the batch buffer, the write happens once the batch is full
+        self.record.pack_into(
+            self.buffer, self.buffered * self.record.size, timestamp, *values.values()
+        )
+        self.buffered += 1
+        if self.buffered == self.batch:
+            self.flush()
+
+    def rotate(self, timestamp: float, values: Dict[str, Any]):
+        self.close()
+        self.fields = list(values)
+        self.record = struct.Struct("<%dd" % (len(values) + 1))
+        self.buffer = bytearray(self.record.size * self.batch)
+        names = "\n".join(values).encode("utf-8")
+        header_length = (PREAMBLE.size + len(names) + 7) // 8 * 8
+        header = PREAMBLE.pack(MAGIC, header_length, len(values)) + names
+        header += b"\0" * (header_length - len(header))
+        first_ms = int(timestamp * 1000)
+        while os.path.exists(os.path.join(self.directory, "%d%s" % (first_ms, EXTENSION))):
+            first_ms += 1
+        path = os.path.join(self.directory, "%d%s" % (first_ms, EXTENSION))
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0), 0o644)
+        os.write(self.fd, header)
+        self.segment_size = len(header)
+        self.segment_started = timestamp
+        self.remove_old_segments()
+
+    def flush(self):
+        if self.buffered:
+            length = self.buffered * self.record.size
+            os.write(self.fd, memoryview(self.buffer)[:length])
+            self.segment_size += length
+            self.buffered = 0
+
+    def remove_old_segments(self):
+        if self.keep:
+            for path in segment_paths(self.directory)[: -self.keep]:
+                os.remove(path)
+
+    def close(self):
+        if self.fd is not None:
+            self.flush()
+            os.close(self.fd)
+            self.fd = None
+
+
+class Segment:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length, field_count = PREAMBLE.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a hardware-stats log segment: %s" % path)
+        names = self.mm[PREAMBLE.size : header_length].rstrip(b"\0").decode("utf-8")
+        self.fields = names.split("\n") if field_count else []
+        self.header_length = header_length
+        self.record = struct.Struct("<%dd" % (field_count + 1))
+        # A record cut by a crash is ignored
+        self.count = (len(self.mm) - header_length) // self.record.size
+
+    def time_at(self, index: int) -> float:
+        return struct.unpack_from("<d", self.mm, self.header_length + index * self.record.size)[0]
+
+    def records(self, start: float, end: float) -> Iterator[Tuple[float, tuple]]:
+        # Records with start <= timestamp < end, found by binary search
+        first = bisect.bisect_left(range(self.count), start, key=self.time_at)
+        for index in range(first, self.count):
+            values = self.record.unpack_from(self.mm, self.header_length + index * self.record.size)
+            if values[0] >= end:
+                break
+            yield values[0], values[1:]
+
+    def close(self):
+        self.mm.close()
+
+
+def segment_paths(directory: str) -> List[str]:
+    # Oldest first: names are the timestamps of the first records
+    names = [name for name in os.listdir(directory) if name.endswith(EXTENSION)]
+    names.sort(key=lambda name: int(name[: -len(EXTENSION)]))
+    return [os.path.join(directory, name) for name in names]
+
+
+def query(
+    directory: str, start: float, end: float, fields: Optional[List[str]] = None
+) -> Iterator[Dict[str, Any]]:
+    # {"time": timestamp, field: value...} of the records in [start, end), NaN values left out
+    paths = segment_paths(directory)
+    for position, path in enumerate(paths):
+        if position + 1 < len(paths):
+            # Skip the segments ending before start without opening them
+            next_start = int(os.path.basename(paths[position + 1])[: -len(EXTENSION)]) / 1000
+            if next_start <= start:
+                continue
+        if int(os.path.basename(path)[: -len(EXTENSION)]) / 1000 >= end:
+            break
+        segment = Segment(path)
+        try:
+            wanted = [
+                (index, name)
+                for index, name in enumerate(segment.fields)
+                if fields is None or name in fields
+            ]
+            for timestamp, values in segment.records(start, end):
+                row = {"time": timestamp}
+                for index, name in wanted:
+                    if not math.isnan(values[index]):
+                        row[name] = values[index]
+                yield row
+        finally:
+            segment.close()
+
+
+def parse_time(value: str) -> float:
+    # Unix timestamp, or ISO 8601 date in local time
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dump records of a hardware-stats time-series log")
+    parser.add_argument("directory", help="Directory of the log segments")
+    parser.add_argument("--start", type=parse_time, default=0, help="Unix timestamp or ISO date")
+    parser.add_argument("--end", type=parse_time, default=None, help="Unix timestamp or ISO date")
+    parser.add_argument("--fields", type=str, default="", help="Comma separated field names (default: all)")
+    parser.add_argument("--format", type=str, default="csv", choices=["csv", "json"])
+    args = parser.parse_args()
+    end = args.end if args.end is not None else time.time() + 1
+    fields = args.fields.split(",") if args.fields else None
+    rows = query(args.directory, args.start, end, fields)
+    if args.format == "json":
+        # One JSON object per line
+        for row in rows:
+            sys.stdout.write(json.dumps(row) + "\n")
+    else:
+        writer = None
+        for row in rows:
+            if writer is None:
+                # Columns of the first record, or the requested ones
+                columns = ["time"] + (fields or [name for name in row if name != "time"])
+                writer = csv.DictWriter(sys.stdout, columns, extrasaction="ignore")
+                writer.writeheader()
+            writer.writerow(row)